@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,6 +40,7 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "django_json_widget",
     "core.tenant",
+    "core.k8sop",
 ]
 
 MIDDLEWARE = [
@@ -75,12 +77,56 @@ WSGI_APPLICATION = "config.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# SQLite by default, Postgres when DB_ENGINE=postgres. With DB_POOL (default on)
+# connections come from psycopg's pool, otherwise they are kept open for
+# DB_CONN_MAX_AGE seconds and health checked before reuse.
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+SQLITE_PATH = os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3")
+
+if DB_ENGINE == "postgres":
+    DB_POOL = os.environ.get("DB_POOL", "true").lower() in ("1", "true", "yes")
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DB_NAME", "control_plane"),
+            "USER": os.environ.get("DB_USER", "postgres"),
+            "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+            "HOST": os.environ.get("DB_HOST", "localhost"),
+            "PORT": os.environ.get("DB_PORT", "5432"),
+            # the pool manages connection lifetime itself
+            "CONN_MAX_AGE": 0 if DB_POOL else int(os.environ.get("DB_CONN_MAX_AGE", 60)),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                "connect_timeout": int(os.environ.get("DB_CONNECT_TIMEOUT", 5)),
+            },
+        }
+    }
+    if DB_POOL:
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+            "timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        }
+    # source for moving an existing SQLite control plane over, see the README
+    if os.environ.get("LEGACY_SQLITE_PATH"):
+        DATABASES["legacy"] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ["LEGACY_SQLITE_PATH"],
+        }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": SQLITE_PATH,
+            # WAL lets readers run next to the single writer, writers wait
+            # for the lock instead of failing with "database is locked"
+            "OPTIONS": {
+                "timeout": 20,
+                "transaction_mode": "IMMEDIATE",
+                "init_command": "PRAGMA journal_mode=WAL;",
+            },
+        }
     }
-}
 
 
 # Password validation
@@ -123,3 +169,17 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Provisioning outbox worker (`manage.py opertator worker`)
+# jobs run at once, jobs claimed per round trip, attempts before a job is
+# marked failed, retry backoff bounds and idle poll interval in seconds, and
+# how long a running job stays locked before another worker may take it over.
+# Updates queued by tenant saves wait OUTBOX_DEBOUNCE_SECONDS so edits coalesce
+OUTBOX_WORKERS = int(os.environ.get("OUTBOX_WORKERS", 16))
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", 50))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 8))
+OUTBOX_RETRY_BASE_DELAY = float(os.environ.get("OUTBOX_RETRY_BASE_DELAY", 2))
+OUTBOX_RETRY_MAX_DELAY = float(os.environ.get("OUTBOX_RETRY_MAX_DELAY", 300))
+OUTBOX_POLL_INTERVAL = float(os.environ.get("OUTBOX_POLL_INTERVAL", 1))
+OUTBOX_LEASE_SECONDS = int(os.environ.get("OUTBOX_LEASE_SECONDS", 300))
+OUTBOX_DEBOUNCE_SECONDS = float(os.environ.get("OUTBOX_DEBOUNCE_SECONDS", 2))
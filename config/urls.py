@@ -17,6 +17,9 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 
+from core.k8sop import views as k8sop_views
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", k8sop_views.metrics, name="metrics"),
 ]
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+
+import aiohttp
+from aiohttp import web
+from kubernetes_asyncio.client.rest import ApiException
+
+from core.k8sop.cache import cache
+from core.k8sop.conf import settings
+from core.k8sop.idle import IdleScaler, min_replicas
+
+logger = logging.getLogger(__name__)
+
+# not forwarded by proxies (RFC 9110), aiohttp sets its own framing headers
+HOP_BY_HOP = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+    "content-length",
+}
+
+
+def forwarded_headers(headers) -> dict:
+    return {
+        name: value for name, value in headers.items() if name.lower() not in HOP_BY_HOP
+    }
+
+
+class Activator:
+    """
+    Default backend of scaled to zero tenants (see `idle.py`): ingress-nginx
+    sends a tenant's requests here while its service has no endpoints. The
+    request is held until the tenant is back up, then proxied to its service,
+    or redirected to the same url when OPERATOR_ACTIVATOR_UPSTREAM is empty.
+    """
+
+    def __init__(self, scaler: IdleScaler):
+        self.scaler = scaler
+        self.runner: web.AppRunner | None = None
+        self.session: aiohttp.ClientSession | None = None
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        domain = request.host.rsplit(":", 1)[0]
+        helmreleases = cache.helmreleases.by_index("domain", domain)
+        if not helmreleases:
+            return web.Response(status=404, text=f"unknown tenant {domain}")
+        helmrelease = helmreleases[0]
+        release = helmrelease["spec"]["releaseName"]
+        key = (helmrelease["metadata"]["namespace"], release)
+        try:
+            await self.scaler.wake(key, min_replicas(helmrelease))
+        except TimeoutError:
+            logger.warning("Tenant %s/%s not ready in time", *key)
+            return web.Response(
+                status=503, text="tenant is starting", headers={"Retry-After": "5"}
+            )
+        except ApiException as e:
+            logger.error("Failed to wake tenant %s/%s: %s", *key, e)
+            return web.Response(status=502, text="tenant unavailable")
+        if not settings.activator_upstream:
+            # ingress-nginx routes to the service again once it has endpoints
+            raise web.HTTPTemporaryRedirect(request.path_qs)
+        return await self.proxy(request, key)
+
+    async def proxy(self, request: web.Request, key: tuple[str, str]) -> web.Response:
+        namespace, release = key
+        upstream = settings.activator_upstream.format(
+            namespace=namespace, release=release
+        )
+        try:
+            async with self.session.request(
+                request.method,
+                upstream + request.path_qs,
+                headers=forwarded_headers(request.headers),
+                data=await request.read(),
+                allow_redirects=False,
+            ) as response:
+                body = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error("Proxying to tenant %s/%s failed: %s", namespace, release, e)
+            return web.Response(status=502, text="tenant unavailable")
+        return web.Response(
+            status=response.status,
+            headers=forwarded_headers(response.headers),
+            body=body,
+        )
+
+    async def start(self):
+        # bodies are passed through as they are, compressed or not
+        self.session = aiohttp.ClientSession(
+            auto_decompress=False,
+            timeout=aiohttp.ClientTimeout(total=settings.activator_wake_timeout),
+        )
+        app = web.Application()
+        app.router.add_route("*", "/{path:.*}", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, port=settings.activator_port).start()
+        logger.info("Activator listening on :%s", settings.activator_port)
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
@@ -1,3 +1,32 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.utils import timezone
 
-# Register your models here.
+from .models import ProvisioningJob
+
+
+@admin.register(ProvisioningJob)
+class ProvisioningJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "tenant_name",
+        "action",
+        "status",
+        "attempts",
+        "run_after",
+        "locked_by",
+        "last_error",
+        "created_at",
+    )
+    list_filter = ("status", "action")
+    search_fields = ("tenant_name",)
+    list_select_related = ("tenant",)
+    readonly_fields = ("locked_by", "locked_at", "attempts", "created_at", "updated_at")
+    actions = ["retry"]
+
+    def retry(self, request, queryset):
+        retried = queryset.filter(status=ProvisioningJob.Status.FAILED).update(
+            status=ProvisioningJob.Status.PENDING,
+            attempts=0,
+            run_after=timezone.now(),
+            last_error="",
+        )
+        self.message_user(request, f"{retried} job(s) queued again.", messages.SUCCESS)
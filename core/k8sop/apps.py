@@ -3,4 +3,4 @@ from django.apps import AppConfig
 
 class K8SopConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
-    name = "k8sop"
+    name = "core.k8sop"
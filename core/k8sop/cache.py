@@ -0,0 +1,320 @@
+import asyncio
+import logging
+from functools import partial
+from typing import Awaitable, Callable
+
+from kubernetes_asyncio import watch
+from kubernetes_asyncio.client.rest import ApiException
+
+from core.k8sop.conf import settings
+from core.k8sop.ops.constants import (
+    HELMRELEASE_GROUP,
+    HELMRELEASE_PLURAL,
+    HELMRELEASE_VERSION,
+    PVC_NAME,
+)
+from shared.k8sclient import AsyncClient
+
+logger = logging.getLogger(__name__)
+
+Indexer = Callable[[dict], str | None]
+# called with the watch event type and object, or ("RELISTED", None) after a relist
+Listener = Callable[[str, dict | None], None]
+
+
+def object_key(namespace: str | None, name: str) -> str:
+    return f"{namespace}/{name}" if namespace else name
+
+
+def is_older(obj: dict, existing: dict) -> bool:
+    """
+    Whether `obj` is an older version of `existing`. resourceVersions are
+    opaque to clients, but the api server hands out increasing etcd revisions;
+    anything else is never treated as older.
+    """
+    version = obj["metadata"].get("resourceVersion", "")
+    current = existing["metadata"].get("resourceVersion", "")
+    if not (version.isdigit() and current.isdigit()):
+        return False
+    return int(version) < int(current)
+
+
+def by_namespace(obj: dict) -> str | None:
+    return obj["metadata"].get("namespace")
+
+
+def by_domain(helmrelease: dict) -> str | None:
+    values = helmrelease.get("spec", {}).get("values", {})
+    return values.get("tenantIngress", {}).get("domain")
+
+
+class Informer:
+    """
+    In-memory copy of one kind of resource kept up to date by a list + watch loop.
+    Lists once, then follows a resourceVersion based watch (with bookmarks) and
+    only relists when the api server reports the version as expired (410).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        list_call: Callable[..., Awaitable],
+        indexers: dict[str, Indexer] | None = None,
+        **list_kwargs,
+    ):
+        self.name = name
+        self.list_call = list_call
+        self.list_kwargs = list_kwargs
+        self.indexers = indexers or {}
+        self.store: dict[str, dict] = {}
+        self.indices: dict[str, dict[str, set[str]]] = {
+            index: {} for index in self.indexers
+        }
+        self.resource_version: str | None = None
+        self.synced = asyncio.Event()
+        self.removal_waiters: dict[str, list[asyncio.Future]] = {}
+        self.listeners: list[Listener] = []
+
+    def add_listener(self, listener: Listener):
+        self.listeners.append(listener)
+
+    def notify(self, event_type: str, obj: dict | None):
+        for listener in self.listeners:
+            listener(event_type, obj)
+
+    def get(self, namespace: str | None, name: str) -> dict | None:
+        return self.store.get(object_key(namespace, name))
+
+    def by_index(self, index: str, value: str) -> list[dict]:
+        keys = self.indices[index].get(value, ())
+        return [self.store[key] for key in keys]
+
+    def items(self) -> list[dict]:
+        return list(self.store.values())
+
+    async def wait_removed(self, namespace: str | None, name: str, timeout: float):
+        """
+        Wait until the object is gone from the store, raises TimeoutError.
+        Only meaningful once the informer is synced.
+        """
+        key = object_key(namespace, name)
+        if key not in self.store:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.removal_waiters.setdefault(key, []).append(future)
+        try:
+            await asyncio.wait_for(future, timeout)
+        finally:
+            waiters = self.removal_waiters.get(key)
+            if waiters and future in waiters:
+                waiters.remove(future)
+                if not waiters:
+                    del self.removal_waiters[key]
+
+    def upsert(self, obj: dict):
+        metadata = obj["metadata"]
+        key = object_key(metadata.get("namespace"), metadata["name"])
+        existing = self.store.get(key)
+        # a watch event can trail a write-through of the newer object
+        if existing is not None and is_older(obj, existing):
+            return
+        self.__unindex(key)
+        self.store[key] = obj
+        for index, indexer in self.indexers.items():
+            value = indexer(obj)
+            if value is not None:
+                self.indices[index].setdefault(value, set()).add(key)
+
+    def remove(self, obj: dict):
+        metadata = obj["metadata"]
+        key = object_key(metadata.get("namespace"), metadata["name"])
+        self.__unindex(key)
+        self.store.pop(key, None)
+        self.__wake_removed(key)
+
+    def __wake_removed(self, key: str):
+        for future in self.removal_waiters.pop(key, ()):
+            if not future.done():
+                future.set_result(None)
+
+    def __unindex(self, key: str):
+        existing = self.store.get(key)
+        if existing is None:
+            return
+        for index, indexer in self.indexers.items():
+            value = indexer(existing)
+            keys = self.indices[index].get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.indices[index][value]
+
+    async def relist(self):
+        objects: list[dict] = []
+        continue_token = None
+        while True:
+            # raw json: skips deserializing every item into a model
+            response = await self.list_call(
+                limit=settings.cache_list_page_size,
+                _continue=continue_token,
+                _preload_content=False,
+                **self.list_kwargs,
+            )
+            async with response:
+                if response.status != 200:
+                    raise ApiException(status=response.status, reason=response.reason)
+                page = await response.json()
+            objects.extend(page.get("items") or [])
+            continue_token = page["metadata"].get("continue")
+            if not continue_token:
+                break
+        self.store.clear()
+        for index in self.indices.values():
+            index.clear()
+        for obj in objects:
+            self.upsert(obj)
+        for key in [key for key in self.removal_waiters if key not in self.store]:
+            self.__wake_removed(key)
+        self.resource_version = page["metadata"]["resourceVersion"]
+        self.synced.set()
+        self.notify("RELISTED", None)
+        logger.info("Cache %s synced with %d objects", self.name, len(self.store))
+
+    async def follow(self):
+        stream = watch.Watch(return_type="object")
+        async with stream:
+            async for event in stream.stream(
+                self.list_call,
+                resource_version=self.resource_version,
+                allow_watch_bookmarks=True,
+                timeout_seconds=settings.watch_timeout,
+                _request_timeout=(
+                    settings.watch_timeout,
+                    settings.watch_timeout + settings.watch_timeout_slack,
+                ),
+                **self.list_kwargs,
+            ):
+                event_type = event["type"]
+                obj = event["raw_object"]
+                if event_type == "DELETED":
+                    self.remove(obj)
+                elif event_type in ("ADDED", "MODIFIED"):
+                    self.upsert(obj)
+                self.resource_version = obj["metadata"]["resourceVersion"]
+                if event_type != "BOOKMARK":
+                    self.notify(event_type, obj)
+
+    async def run(self):
+        backoff = settings.retry_base_delay
+        while True:
+            try:
+                if self.resource_version is None:
+                    await self.relist()
+                await self.follow()
+                backoff = settings.retry_base_delay
+            except asyncio.CancelledError:
+                raise
+            except ApiException as e:
+                if e.status == 410:
+                    logger.info("Cache %s resourceVersion expired, relisting", self.name)
+                    self.resource_version = None
+                    continue
+                logger.error("Cache %s watch failed: %s", self.name, e)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            except Exception as e:
+                logger.error("Cache %s watch failed: %s", self.name, e)
+                self.resource_version = None
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+
+class TenantStateCache:
+    """
+    Watch-fed store of the cluster state the operator reconciles against:
+    HelmReleases, namespaces and the tenants' `pg-storage` PVCs.
+    """
+
+    helmreleases: Informer
+    namespaces: Informer
+    pvcs: Informer
+
+    def __init__(self):
+        self.tasks: list[asyncio.Task] = []
+
+    def setup(self, client: AsyncClient):
+        self.helmreleases = Informer(
+            "helmreleases",
+            partial(
+                client.crd.list_cluster_custom_object,
+                HELMRELEASE_GROUP,
+                HELMRELEASE_VERSION,
+                HELMRELEASE_PLURAL,
+            ),
+            indexers={
+                "namespace": by_namespace,
+                "tenant": lambda obj: obj.get("spec", {}).get("releaseName"),
+                # the activator finds the tenant of a request by its host
+                "domain": by_domain,
+            },
+        )
+        self.namespaces = Informer("namespaces", client.k8s.list_namespace)
+        self.pvcs = Informer(
+            "pvcs",
+            client.k8s.list_persistent_volume_claim_for_all_namespaces,
+            indexers={"namespace": by_namespace},
+            field_selector=f"metadata.name={PVC_NAME}",
+        )
+
+    @property
+    def informers(self) -> list[Informer]:
+        return [self.helmreleases, self.namespaces, self.pvcs]
+
+    @property
+    def synced(self) -> bool:
+        return bool(self.tasks) and all(
+            informer.synced.is_set() for informer in self.informers
+        )
+
+    async def start(self, client: AsyncClient):
+        self.setup(client)
+        self.tasks = [
+            asyncio.create_task(informer.run(), name=f"cache-{informer.name}")
+            for informer in self.informers
+        ]
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(informer.synced.wait() for informer in self.informers)),
+                timeout=settings.cache_sync_timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Cache not synced after %ss, reading from the api until it is",
+                settings.cache_sync_timeout,
+            )
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def namespace_exists(self, namespace: str) -> bool | None:
+        """None when the cache can't answer yet."""
+        if not self.tasks or not self.namespaces.synced.is_set():
+            return None
+        return self.namespaces.get(None, namespace) is not None
+
+    def pvc_exists(self, namespace: str) -> bool | None:
+        if not self.tasks or not self.pvcs.synced.is_set():
+            return None
+        return self.pvcs.get(namespace, PVC_NAME) is not None
+
+    def helmrelease(self, namespace: str, name: str) -> tuple[bool, dict | None]:
+        """(answered, object) - answered is False when the cache can't answer yet."""
+        if not self.tasks or not self.helmreleases.synced.is_set():
+            return False, None
+        return True, self.helmreleases.get(namespace, name)
+
+
+cache: TenantStateCache = TenantStateCache()
@@ -0,0 +1,98 @@
+from shared.settings import EnvSettings
+
+
+class OperatorSettings(EnvSettings):
+    """
+    Tunables for the tenant operator process.
+    Every field can be overridden with an ``OPERATOR_<FIELD_NAME>`` env var.
+    """
+
+    env_prefix = "OPERATOR_"
+
+    # max number of tenant reconciles running at the same time
+    max_concurrency: int = 50
+    # attempts and base backoff (seconds) for conflicting / throttled api writes
+    apply_retries: int = 5
+    retry_base_delay: float = 0.2
+    # seconds before kopf retries a tenant whose provisioning failed
+    provision_retry_delay: float = 10.0
+    # watch cache: seconds per watch request, extra read slack, list page size
+    # and how long startup waits for the initial list
+    watch_timeout: int = 300
+    watch_timeout_slack: int = 30
+    cache_list_page_size: int = 500
+    cache_sync_timeout: float = 30.0
+    # update work queue: global reconciles per second (<= 0 disables), burst size
+    # and per-tenant retry backoff bounds in seconds
+    reconcile_rate: float = 20.0
+    reconcile_burst: int = 50
+    reconcile_backoff_base: float = 1.0
+    reconcile_backoff_max: float = 300.0
+    # teardown: namespaces deleted at once, tenants per wave, pause between waves,
+    # seconds to wait for a namespace to finish terminating, the poll interval
+    # used when the watch cache is not running and seconds before kopf retries
+    # a tenant whose teardown failed
+    teardown_concurrency: int = 10
+    teardown_wave_size: int = 50
+    teardown_wave_pause: float = 0.0
+    teardown_timeout: float = 600.0
+    teardown_poll_interval: float = 2.0
+    teardown_retry_delay: float = 30.0
+    # rollouts (`manage.py opertator rollout`): wave sizes (the last one repeats),
+    # tenants upgrading at once, failed tenants tolerated before the rollout
+    # halts, seconds a HelmRelease gets to become Ready and the poll interval
+    rollout_waves: str = "1,10,50"
+    rollout_concurrency: int = 20
+    rollout_max_failures: int = 0
+    rollout_timeout: float = 600.0
+    rollout_poll_interval: float = 2.0
+    # status sync: seconds between database flushes, rows per bulk_update and
+    # seconds between full passes over every tenant
+    sync_flush_interval: float = 2.0
+    sync_batch_size: int = 500
+    sync_resync_interval: float = 600.0
+    # sharding: split tenants between replicas by a hash of the tenant name.
+    # identity defaults to the hostname (the pod name), leases live in
+    # shard_namespace and a replica is dropped when its lease is not renewed
+    # for shard_lease_duration seconds
+    shard_enabled: bool = False
+    shard_identity: str = ""
+    shard_namespace: str = "tenant-system"
+    shard_lease_duration: int = 15
+    shard_renew_interval: float = 5.0
+    # turn on the backend readiness probe (/readyz) of the tenant chart, for
+    # backend images that serve it
+    readiness_probe: bool = False
+    # shared postgres for tenants with dbMode `shared`: admin connection used to
+    # create databases and roles, the pooler (pgbouncer) the backends connect to
+    # and the key tenant passwords are derived from. the admin password goes
+    # in the url or in PGPASSWORD
+    shared_db_admin_url: str = (
+        "postgresql://postgres@shared-postgresql.shared-db.svc:5432/postgres"
+    )
+    shared_db_host: str = "pgbouncer.shared-db.svc"
+    shared_db_port: int = 6432
+    shared_db_password_key: str = ""
+    shared_db_connect_timeout: int = 5
+    # scale to zero: tenant backends without ingress requests for idle_timeout
+    # seconds are scaled down (0 disables it), checked every idle_check_interval
+    # against the ingress-nginx metrics endpoints in idle_metrics_urls (comma
+    # separated). their requests go to the activator on activator_port, reached
+    # from the tenant namespaces at activator_host, which scales the backend up,
+    # holds the request up to activator_wake_timeout seconds and proxies it to
+    # activator_upstream (redirects back to the ingress when empty)
+    idle_timeout: float = 0.0
+    idle_check_interval: float = 30.0
+    idle_metrics_urls: str = (
+        "http://ingress-nginx-controller-metrics.ingress-nginx.svc:10254/metrics"
+    )
+    activator_host: str = "tenant-activator.tenant-system.svc.cluster.local"
+    activator_port: int = 8081
+    activator_upstream: str = "http://{release}-service.{namespace}.svc"
+    activator_wake_timeout: float = 45.0
+    activator_poll_interval: float = 0.5
+    # port serving prometheus metrics, 0 disables it
+    metrics_port: int = 9090
+
+
+settings: OperatorSettings = OperatorSettings.from_env()
@@ -0,0 +1,222 @@
+import logging
+from typing import Callable, Iterable, Iterator, TextIO
+
+from pydantic import BaseModel
+
+from core.k8sop.conf import settings
+from core.k8sop.ops import release
+from core.k8sop.ops.constants import (
+    CHART_NAME,
+    HELMRELEASE_GROUP,
+    HELMRELEASE_PLURAL,
+    HELMRELEASE_VERSION,
+    TENANT_GROUP,
+    TENANT_PLURAL,
+    TENANT_VERSION,
+)
+from core.k8sop.render import tenant_spec
+from core.tenant.dto import TenantCrd
+from core.tenant.models import Tenant
+from shared.k8sclient import Client
+
+logger = logging.getLogger(__name__)
+
+# drift kinds, in report order
+MISSING_CR = "missing_cr"  # provisioned in the database, no Tenant CR
+SPEC_MISMATCH = "spec_mismatch"  # Tenant CR spec differs from the database
+MISSING_RELEASE = "missing_release"  # Tenant CR without its HelmRelease
+STALE_IMAGE = "stale_image"  # HelmRelease runs another backend image
+STALE_CHART = "stale_chart"  # HelmRelease on another chart version
+STALE_RELEASE = "stale_release"  # flux hasn't reconciled the latest HelmRelease spec
+ORPHANED_CR = "orphaned_cr"  # Tenant CR without a database row
+ORPHANED_RELEASE = "orphaned_release"  # tenant HelmRelease without a database row
+RENDER_ERROR = "render_error"  # the database row can't be rendered
+
+
+class ReleaseSummary(BaseModel):
+    """The parts of a HelmRelease the report compares, not the whole object."""
+
+    namespace: str
+    name: str
+    chart_version: str | None = None
+    image: str | None = None
+    generation: int = 0
+    observed_generation: int = 0
+
+
+class TenantDrift(BaseModel):
+    tenant: str
+    namespace: str | None = None
+    drift: list[str] = []
+    # field -> {"db": ..., "cluster": ...}
+    diffs: dict[str, dict] = {}
+
+    def differ(self, kind: str, field: str, db, cluster):
+        if kind not in self.drift:
+            self.drift.append(kind)
+        self.diffs[field] = {"db": db, "cluster": cluster}
+
+
+def list_all(list_call: Callable, on_page: Callable[[], None]) -> Iterator[dict]:
+    """Every object of a cluster wide LIST, one page at a time."""
+    continue_token = None
+    while True:
+        page = list_call(limit=settings.cache_list_page_size, _continue=continue_token)
+        on_page()
+        yield from page.get("items") or []
+        continue_token = page["metadata"].get("continue")
+        if not continue_token:
+            return
+
+
+def without_nulls(value):
+    # the api server prunes nulls the admin sends, both sides compare without them
+    if isinstance(value, dict):
+        return {k: without_nulls(v) for k, v in value.items() if v is not None}
+    return value
+
+
+def summarize(helmrelease: dict) -> ReleaseSummary:
+    metadata = helmrelease["metadata"]
+    chart_version, image = release.helmrelease_target(helmrelease)
+    return ReleaseSummary(
+        namespace=metadata["namespace"],
+        name=metadata["name"],
+        chart_version=chart_version,
+        image=image,
+        generation=metadata.get("generation", 0),
+        observed_generation=(helmrelease.get("status") or {}).get(
+            "observedGeneration", 0
+        ),
+    )
+
+
+class DriftReport:
+    """
+    Compares the database with the cluster: one paginated LIST of the Tenant
+    CRs and one of the HelmReleases are kept in memory (specs and release
+    summaries only), then the tenants are streamed from the database and
+    joined against them. Whatever is left over has no database row.
+    """
+
+    def __init__(self, client: Client):
+        self.client = client
+        self.api_calls = 0
+        self.specs: dict[str, dict] = {}
+        self.releases: dict[tuple[str, str], ReleaseSummary] = {}
+
+    def count_call(self):
+        self.api_calls += 1
+
+    def load(self):
+        crd = self.client.crd
+        for tenant_cr in list_all(
+            lambda **page: crd.list_cluster_custom_object(
+                TENANT_GROUP, TENANT_VERSION, TENANT_PLURAL, **page
+            ),
+            self.count_call,
+        ):
+            self.specs[tenant_cr["metadata"]["name"]] = without_nulls(
+                tenant_cr.get("spec") or {}
+            )
+        for helmrelease in list_all(
+            lambda **page: crd.list_cluster_custom_object(
+                HELMRELEASE_GROUP, HELMRELEASE_VERSION, HELMRELEASE_PLURAL, **page
+            ),
+            self.count_call,
+        ):
+            chart = helmrelease.get("spec", {}).get("chart", {}).get("spec", {})
+            # flux also runs other releases, e.g. the shared postgres
+            if chart.get("chart") != CHART_NAME:
+                continue
+            summary = summarize(helmrelease)
+            self.releases[(summary.namespace, summary.name)] = summary
+
+    def compare(self, tenant: Tenant) -> TenantDrift:
+        report = TenantDrift(tenant=tenant.name, namespace=tenant.tenant_namespace)
+        cr_spec = self.specs.pop(tenant.name, None)
+        provisioned = tenant.resource_status != Tenant.ResourceStatus.NOT_CREATED
+        try:
+            spec = tenant_spec(tenant)
+            desired = without_nulls(
+                TenantCrd.create_from_model(tenant).spec.model_dump()
+            )
+        # pydantic's ValidationError included
+        except ValueError as e:
+            report.differ(RENDER_ERROR, "render", str(e), None)
+            return report
+        summary = self.releases.pop((spec.namespace, release.release_name(spec)), None)
+
+        if cr_spec is None:
+            if provisioned:
+                report.differ(MISSING_CR, "cr", "present", None)
+            return report
+        # fields only on the CR are CRD defaults
+        for field in sorted(desired):
+            if desired[field] != cr_spec.get(field):
+                report.differ(SPEC_MISMATCH, field, desired[field], cr_spec.get(field))
+
+        if summary is None:
+            report.differ(MISSING_RELEASE, "helmrelease", "present", None)
+            return report
+        # the rest of the rendered values depends on the operator's settings,
+        # comparing a hash rendered here would flag every tenant
+        chart_version, image = release.release_target(spec)
+        if summary.image != image:
+            report.differ(STALE_IMAGE, "image", image, summary.image)
+        if summary.chart_version != chart_version:
+            report.differ(
+                STALE_CHART, "chartVersion", chart_version, summary.chart_version
+            )
+        if summary.observed_generation < summary.generation:
+            report.differ(
+                STALE_RELEASE,
+                "observedGeneration",
+                summary.generation,
+                summary.observed_generation,
+            )
+        return report
+
+    def orphans(self) -> Iterator[TenantDrift]:
+        for name, cr_spec in sorted(self.specs.items()):
+            report = TenantDrift(tenant=name, namespace=cr_spec.get("tenantNamespace"))
+            report.differ(ORPHANED_CR, "cr", None, "present")
+            yield report
+        for (namespace, name), summary in sorted(self.releases.items()):
+            report = TenantDrift(
+                tenant=name.removesuffix("-release"), namespace=namespace
+            )
+            report.differ(ORPHANED_RELEASE, "helmrelease", None, summary.name)
+            yield report
+
+    def run(
+        self,
+        tenants: Iterable[Tenant],
+        out: TextIO,
+        in_sync: bool = False,
+        orphans: bool = True,
+    ) -> dict[str, int]:
+        """
+        Write one JSON line per drifting tenant (every tenant with `in_sync`)
+        and return the number of tenants per drift kind. Pass `orphans=False`
+        when `tenants` is not every tenant.
+        """
+        self.load()
+        counts: dict[str, int] = {"tenants": 0, "in_sync": 0}
+
+        def write(report: TenantDrift):
+            for kind in report.drift:
+                counts[kind] = counts.get(kind, 0) + 1
+            if report.drift or in_sync:
+                out.write(report.model_dump_json())
+                out.write("\n")
+
+        for tenant in tenants:
+            report = self.compare(tenant)
+            counts["tenants"] += 1
+            counts["in_sync"] += not report.drift
+            write(report)
+        if orphans:
+            for report in self.orphans():
+                write(report)
+        return counts
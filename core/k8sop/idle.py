@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import time
+from typing import Callable
+
+import aiohttp
+from prometheus_client.parser import text_string_to_metric_families
+
+from core.k8sop.cache import cache
+from core.k8sop.conf import settings
+from core.k8sop.ops.charts import supports
+from core.k8sop.ops.retry import with_retries
+from shared import metrics
+from shared.k8sclient import AsyncClient
+
+logger = logging.getLogger(__name__)
+
+# per ingress request counter of the ingress-nginx controller
+INGRESS_REQUESTS = "nginx_ingress_controller_requests"
+
+# (namespace, chart release name)
+TenantKey = tuple[str, str]
+
+
+def deployment_name(release: str) -> str:
+    return f"{release}-app"  # backendApp in tenant-stack
+
+
+def ingress_name(release: str) -> str:
+    return f"{release}-ingress"
+
+
+def scale_to_zero_releases() -> list[dict]:
+    """
+    HelmReleases rendered with the activator as ingress default backend, on
+    a chart that has one: nothing would wake a tenant on an older chart.
+    """
+    releases = []
+    for helmrelease in cache.helmreleases.items():
+        spec = helmrelease.get("spec", {})
+        chart_version = spec.get("chart", {}).get("spec", {}).get("version", "")
+        enabled = spec.get("values", {}).get("scaleToZero", {}).get("enabled")
+        if enabled and supports(chart_version, "scale_to_zero"):
+            releases.append(helmrelease)
+    return releases
+
+
+def min_replicas(helmrelease: dict) -> int:
+    backend = helmrelease["spec"].get("values", {}).get("backendApp", {})
+    autoscaling = backend.get("autoscaling") or {}
+    if autoscaling.get("enabled"):
+        return max(1, autoscaling.get("minReplicas", 1))
+    return max(1, backend.get("replicaCount", 1))
+
+
+async def ingress_request_counts(session: aiohttp.ClientSession) -> dict:
+    """
+    Requests served per (namespace, ingress), summed over every controller
+    replica in OPERATOR_IDLE_METRICS_URLS.
+    """
+    counts: dict[tuple[str, str], float] = {}
+    for url in settings.idle_metrics_urls.split(","):
+        async with session.get(url.strip()) as response:
+            response.raise_for_status()
+            text = await response.text()
+        for family in text_string_to_metric_families(text):
+            for sample in family.samples:
+                if sample.name not in (INGRESS_REQUESTS, f"{INGRESS_REQUESTS}_total"):
+                    continue
+                key = (sample.labels.get("namespace"), sample.labels.get("ingress"))
+                counts[key] = counts.get(key, 0.0) + sample.value
+    return counts
+
+
+class IdleScaler:
+    """
+    Scales tenant backends without ingress traffic for OPERATOR_IDLE_TIMEOUT
+    seconds down to zero replicas, and back up on `wake`.
+    A tenant counts as active whenever its request counter changed between two
+    scrapes; counters seen for the first time (operator or controller restart)
+    also count as activity, so nothing is scaled down without a full window.
+    """
+
+    def __init__(self, client: AsyncClient, owns: Callable[[str], bool]):
+        self.client = client
+        self.owns = owns
+        self.counts: dict[TenantKey, float] = {}
+        self.last_active: dict[TenantKey, float] = {}
+        # when we scaled the tenant down, re-applied every window in case
+        # something (a helm upgrade) scaled it back up without traffic
+        self.idle: dict[TenantKey, float] = {}
+        self.wakes: dict[TenantKey, asyncio.Task] = {}
+        self.task: asyncio.Task | None = None
+        self.session: aiohttp.ClientSession | None = None
+
+    def touch(self, key: TenantKey):
+        self.last_active[key] = time.monotonic()
+        self.idle.pop(key, None)
+
+    async def scale(self, key: TenantKey, replicas: int):
+        namespace, release = key
+        await with_retries(
+            lambda: self.client.apps.patch_namespaced_deployment_scale(
+                name=deployment_name(release),
+                namespace=namespace,
+                body={"spec": {"replicas": replicas}},
+                _content_type="application/merge-patch+json",
+            ),
+            attempts=settings.apply_retries,
+            base_delay=settings.retry_base_delay,
+        )
+
+    async def scale_down(self, key: TenantKey):
+        try:
+            await self.scale(key, 0)
+        except Exception as e:
+            logger.error("Failed to scale idle tenant %s/%s down: %s", *key, e)
+            return
+        self.idle[key] = time.monotonic()
+        logger.info("Scaled idle tenant %s/%s to zero", *key)
+
+    async def scan(self):
+        if not cache.helmreleases.synced.is_set():
+            return
+        try:
+            counts = await ingress_request_counts(self.session)
+        except Exception as e:
+            # no traffic data, no scale downs
+            logger.error("Failed to read ingress metrics: %s", e)
+            return
+        now = time.monotonic()
+        seen = set()
+        idle = []
+        for helmrelease in scale_to_zero_releases():
+            release = helmrelease["spec"].get("releaseName")
+            key = (helmrelease["metadata"]["namespace"], release)
+            if not self.owns(release):
+                continue
+            seen.add(key)
+            count = counts.get((key[0], ingress_name(release)), 0.0)
+            if self.counts.get(key) != count:
+                self.counts[key] = count
+                self.touch(key)
+                continue
+            if now - self.last_active[key] < settings.idle_timeout:
+                continue
+            if key in self.idle and now - self.idle[key] < settings.idle_timeout:
+                continue
+            idle.append(key)
+        for state in (self.counts, self.last_active, self.idle):
+            for key in state.keys() - seen:
+                del state[key]
+        await asyncio.gather(*(self.scale_down(key) for key in idle))
+
+    async def run(self):
+        while True:
+            try:
+                await self.scan()
+            except Exception as e:
+                logger.error("Idle scan failed: %s", e)
+            await asyncio.sleep(settings.idle_check_interval)
+
+    async def start(self):
+        timeout = aiohttp.ClientTimeout(total=settings.idle_check_interval)
+        self.session = aiohttp.ClientSession(timeout=timeout)
+        self.task = asyncio.create_task(self.run(), name="idle-scaler")
+
+    async def stop(self):
+        tasks = [*self.wakes.values(), *([self.task] if self.task else [])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.task = None
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def wait_ready(self, key: TenantKey):
+        namespace, release = key
+        while True:
+            deployment = await self.client.apps.read_namespaced_deployment_status(
+                name=deployment_name(release), namespace=namespace
+            )
+            if (deployment.status.ready_replicas or 0) > 0:
+                return
+            await asyncio.sleep(settings.activator_poll_interval)
+
+    @metrics.track("activator", "wake")
+    async def scale_up(self, key: TenantKey, replicas: int):
+        namespace, release = key
+        deployment = await self.client.apps.read_namespaced_deployment(
+            name=deployment_name(release), namespace=namespace
+        )
+        if not deployment.spec.replicas:
+            logger.info("Waking tenant %s/%s", namespace, release)
+            await self.scale(key, replicas)
+        started = time.monotonic()
+        async with asyncio.timeout(settings.activator_wake_timeout):
+            await self.wait_ready(key)
+        logger.info(
+            "Tenant %s/%s ready after %.1fs",
+            namespace,
+            release,
+            time.monotonic() - started,
+        )
+
+    async def wake(self, key: TenantKey, replicas: int = 1):
+        """
+        Scale the tenant back up and wait until a backend pod is ready, raises
+        TimeoutError after OPERATOR_ACTIVATOR_WAKE_TIMEOUT. Concurrent wakes of
+        one tenant share a single scale up.
+        """
+        self.touch(key)
+        task = self.wakes.get(key)
+        if task is None:
+            task = asyncio.create_task(self.scale_up(key, replicas))
+            self.wakes[key] = task
+            task.add_done_callback(lambda _: self.wakes.pop(key, None))
+        # shielded: a client giving up must not cancel the others' wake
+        await asyncio.wait_for(
+            asyncio.shield(task), timeout=settings.activator_wake_timeout
+        )
@@ -1,5 +1,423 @@
-from django.core.management.base import BaseCommand
+import asyncio
+import os
+import signal
+import socket
+import sys
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from kubernetes_asyncio.client.rest import ApiException
+
+from core.k8sop import outbox
+from core.k8sop.cache import cache
+from core.k8sop.conf import settings
+from core.k8sop.drift import DriftReport
+from core.k8sop.ops import release
+from core.k8sop.ops.charts import check_features, resolve_chart_version
+from core.k8sop.ops.constants import TENANT_GROUP, TENANT_PLURAL, TENANT_VERSION
+from core.k8sop.ops.teardown import TeardownProgress, teardown_tenants
+from core.k8sop.render import FORMATS, render_tenants
+from core.k8sop.rollout import (
+    Rollout,
+    RolloutProgress,
+    wave_sizes,
+    waves,
+)
+from core.k8sop.sync import StatusSync
+from core.tenant.dto import TenantMeta
+from core.tenant.models import Tenant
+from shared.k8sclient import get_client
+
 
 class Command(BaseCommand):
+    help = "Tenant operator tooling"
+
+    def add_arguments(self, parser):
+        subcommands = parser.add_subparsers(dest="subcommand", required=True)
+
+        render = subcommands.add_parser(
+            "render",
+            help="Render the manifests of every tenant without a cluster",
+        )
+        render.add_argument("--format", choices=FORMATS, default="jsonl")
+        render.add_argument(
+            "--tenant",
+            action="append",
+            dest="tenants",
+            help="Only render the given tenant name (repeatable)",
+        )
+        render.add_argument(
+            "--helmrelease-only",
+            action="store_true",
+            help="Skip the namespace and PVC manifests",
+        )
+        render.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows fetched from the database per round trip",
+        )
+        render.add_argument("--output", "-o", help="Write to a file instead of stdout")
+
+        teardown = subcommands.add_parser(
+            "teardown",
+            help="Delete tenant namespaces in waves and wait until they are gone",
+        )
+        selection = teardown.add_mutually_exclusive_group(required=True)
+        selection.add_argument(
+            "--tenant",
+            action="append",
+            dest="tenants",
+            help="Tenant name to tear down (repeatable)",
+        )
+        selection.add_argument(
+            "--all", action="store_true", help="Tear down every tenant"
+        )
+        teardown.add_argument(
+            "--concurrency", type=int, help="Namespaces terminating at once"
+        )
+        teardown.add_argument("--wave-size", type=int, help="Tenants per wave")
+        teardown.add_argument(
+            "--wave-pause", type=float, help="Seconds to pause between waves"
+        )
+        teardown.add_argument(
+            "--timeout", type=float, help="Seconds to wait for each namespace"
+        )
+        teardown.add_argument(
+            "--keep-cr",
+            action="store_true",
+            help="Leave the Tenant CRs in place",
+        )
+
+        rollout = subcommands.add_parser(
+            "rollout",
+            help="Move tenants to a chart version and / or backend image in health gated waves",
+        )
+        selection = rollout.add_mutually_exclusive_group(required=True)
+        selection.add_argument(
+            "--tenant",
+            action="append",
+            dest="tenants",
+            help="Tenant name to move (repeatable)",
+        )
+        selection.add_argument(
+            "--from-chart-version",
+            help="Move the tenants on this chart version (empty for the default)",
+        )
+        selection.add_argument("--all", action="store_true", help="Move every tenant")
+        rollout.add_argument(
+            "--chart-version",
+            help="tenant-stack version from index.yaml, or `latest`",
+        )
+        rollout.add_argument("--image", help="Backend image")
+        rollout.add_argument(
+            "--waves", help="Tenants per wave, e.g. 1,10,50 (the last size repeats)"
+        )
+        rollout.add_argument(
+            "--concurrency", type=int, help="Tenants upgrading at once"
+        )
+        rollout.add_argument(
+            "--max-failures",
+            type=int,
+            help="Failed tenants tolerated before the rollout halts",
+        )
+        rollout.add_argument(
+            "--timeout", type=float, help="Seconds for each tenant to become Ready"
+        )
+        rollout.add_argument(
+            "--no-rollback",
+            dest="rollback",
+            action="store_false",
+            help="Leave moved tenants in place when the rollout halts",
+        )
+        rollout.add_argument(
+            "--dry-run", action="store_true", help="Print the waves and exit"
+        )
+
+        drift = subcommands.add_parser(
+            "drift",
+            help="Compare the database with the Tenant CRs and HelmReleases in the cluster",
+        )
+        drift.add_argument(
+            "--tenant",
+            action="append",
+            dest="tenants",
+            help="Only check the given tenant name (repeatable), skips orphans",
+        )
+        drift.add_argument(
+            "--in-sync",
+            action="store_true",
+            help="Also write the tenants without drift",
+        )
+        drift.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows fetched from the database per round trip",
+        )
+        drift.add_argument("--output", "-o", help="Write to a file instead of stdout")
+
+        subcommands.add_parser(
+            "sync",
+            help="Watch Tenant CRs and HelmReleases and keep the tenant status in the database",
+        )
+
+        worker = subcommands.add_parser(
+            "worker",
+            help="Run queued tenant provisioning jobs",
+        )
+        worker.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no job is due instead of polling",
+        )
+        worker.add_argument(
+            "--id",
+            dest="worker_id",
+            default=f"{socket.gethostname()}-{os.getpid()}",
+            help="Name recorded on the jobs this worker holds",
+        )
+
     def handle(self, *args, **options):
-        ...
\ No newline at end of file
+        getattr(self, f"handle_{options['subcommand']}")(**options)
+
+    def handle_render(self, **options):
+        queryset = Tenant.objects.order_by("pk")
+        if options["tenants"]:
+            queryset = queryset.filter(name__in=options["tenants"])
+        tenants = queryset.iterator(chunk_size=options["chunk_size"])
+
+        if options["output"]:
+            with open(options["output"], "w") as out:
+                rendered, failed = render_tenants(
+                    tenants, out, options["format"], options["helmrelease_only"]
+                )
+        else:
+            rendered, failed = render_tenants(
+                tenants, sys.stdout, options["format"], options["helmrelease_only"]
+            )
+
+        self.stderr.write(f"Rendered {rendered} tenant(s)")
+        if failed:
+            raise CommandError(f"{failed} tenant(s) could not be rendered")
+
+    def handle_teardown(self, **options):
+        queryset = Tenant.objects.order_by("pk")
+        if options["tenants"]:
+            queryset = queryset.filter(name__in=options["tenants"])
+        tenants = list(queryset)
+
+        results = asyncio.run(self.teardown(tenants, options))
+        deleted = [
+            tenant.pk for tenant, progress in zip(tenants, results) if progress.ok
+        ]
+        Tenant.objects.filter(pk__in=deleted).update(
+            resource_status=Tenant.ResourceStatus.NOT_CREATED
+        )
+
+        self.stderr.write(f"Tore down {len(deleted)} tenant(s)")
+        if len(deleted) < len(results):
+            raise CommandError(
+                f"{len(results) - len(deleted)} tenant(s) could not be torn down"
+            )
+
+    async def teardown(self, tenants: list[Tenant], options) -> list[TeardownProgress]:
+        # only the name, namespace and db mode are needed, the rest may be stale
+        specs = [
+            release.Tenant.model_construct(
+                tenantName=tenant.name,
+                namespace=tenant.tenant_namespace,
+                dbMode=tenant.db_mode,
+            )
+            for tenant in tenants
+        ]
+        done = 0
+
+        def report(progress: TeardownProgress):
+            nonlocal done
+            if progress.phase in ("deleted", "failed"):
+                done += 1
+            self.stdout.write(progress.model_dump_json())
+            self.stderr.write(
+                f"[{done}/{len(specs)}] {progress.tenant}: {progress.phase}"
+                f" ({progress.elapsed}s)"
+                + (f" {progress.error}" if progress.error else "")
+            )
+
+        client = release.client
+        await client.connect()
+        await cache.start(client)
+        try:
+            results = await teardown_tenants(
+                specs,
+                on_progress=report,
+                concurrency=options["concurrency"],
+                wave_size=options["wave_size"],
+                wave_pause=options["wave_pause"],
+                timeout=options["timeout"],
+            )
+            if not options["keep_cr"]:
+                await asyncio.gather(
+                    *(
+                        self.delete_tenant_cr(tenant)
+                        for tenant, progress in zip(tenants, results)
+                        if progress.ok
+                    )
+                )
+            return results
+        finally:
+            await cache.stop()
+            await client.close()
+
+    async def delete_tenant_cr(self, tenant: Tenant):
+        # the namespace is already gone, the operator's delete handler is a no-op
+        try:
+            await release.client.crd.delete_namespaced_custom_object(
+                group=TENANT_GROUP,
+                version=TENANT_VERSION,
+                namespace=TenantMeta(name=tenant.name).namespace,
+                plural=TENANT_PLURAL,
+                name=tenant.name,
+            )
+        except ApiException as e:
+            if e.status != 404:
+                self.stderr.write(f"Can't delete Tenant CR '{tenant.name}': {e.reason}")
+
+    def handle_rollout(self, **options):
+        if not options["chart_version"] and not options["image"]:
+            raise CommandError("Pass --chart-version and / or --image")
+        try:
+            chart_version = options["chart_version"] and resolve_chart_version(
+                options["chart_version"]
+            )
+            sizes = options["waves"] or settings.rollout_waves
+            next(wave_sizes(sizes))
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        queryset = Tenant.objects.order_by("pk")
+        if options["tenants"]:
+            queryset = queryset.filter(name__in=options["tenants"])
+        elif options["from_chart_version"] is not None:
+            queryset = queryset.filter(chart_version=options["from_chart_version"])
+        changes = {"chart_version": chart_version, "backend_image": options["image"]}
+        changes = {field: value for field, value in changes.items() if value}
+        # nothing deployed yet, they get the new values once the rollout went through
+        not_created = queryset.filter(resource_status=Tenant.ResourceStatus.NOT_CREATED)
+        tenants = list(queryset.exclude(pk__in=not_created.values("pk")))
+
+        if options["dry_run"]:
+            for number, wave in enumerate(waves(tenants, wave_sizes(sizes)), start=1):
+                for tenant in wave:
+                    self.stdout.write(
+                        RolloutProgress(
+                            tenant=tenant.name,
+                            wave=number,
+                            chartVersion=chart_version or tenant.chart_version,
+                            backendImage=options["image"] or tenant.backend_image,
+                        ).model_dump_json()
+                    )
+            self.stderr.write(f"{len(tenants)} tenant(s) would be moved")
+            return
+
+        results = asyncio.run(self.rollout(tenants, chart_version, sizes, options))
+        moved = sum(progress.phase == "ready" for progress in results)
+        failed = [progress for progress in results if not progress.ok]
+        updated = 0 if failed else self.update_not_created(not_created, changes)
+        self.stderr.write(
+            f"Moved {moved} tenant(s), updated {updated} not created tenant(s)"
+        )
+        if failed:
+            raise CommandError(
+                f"{len(failed)} tenant(s) were not moved: "
+                + ", ".join(sorted({progress.phase for progress in failed}))
+            )
+
+    def update_not_created(self, not_created, changes: dict) -> int:
+        # the same check a rollout runs, tenants the chart can't carry keep theirs
+        skipped = []
+        if "chart_version" in changes:
+            for tenant in not_created:
+                try:
+                    check_features(changes["chart_version"], tenant.chart_features())
+                except ValueError as e:
+                    self.stderr.write(f"Not updating '{tenant.name}': {e}")
+                    skipped.append(tenant.pk)
+        return not_created.exclude(pk__in=skipped).update(**changes)
+
+    async def rollout(
+        self, tenants: list[Tenant], chart_version, sizes, options
+    ) -> list[RolloutProgress]:
+        def report(progress: RolloutProgress):
+            self.stdout.write(progress.model_dump_json())
+            self.stderr.write(
+                f"[wave {progress.wave}] {progress.tenant}: {progress.phase}"
+                f" ({progress.elapsed}s)"
+                + (f" {progress.error}" if progress.error else "")
+            )
+
+        client = release.client
+        await client.connect()
+        await cache.start(client)
+        try:
+            return await Rollout(
+                chart_version=chart_version,
+                image=options["image"],
+                on_progress=report,
+                concurrency=options["concurrency"],
+                sizes=sizes,
+                max_failures=options["max_failures"],
+                rollback=options["rollback"],
+                timeout=options["timeout"],
+            ).run(tenants)
+        finally:
+            await cache.stop()
+            await client.close()
+
+    def handle_drift(self, **options):
+        queryset = Tenant.objects.order_by("pk")
+        if options["tenants"]:
+            queryset = queryset.filter(name__in=options["tenants"])
+        tenants = queryset.iterator(chunk_size=options["chunk_size"])
+        report = DriftReport(get_client())
+        run_options = {
+            "in_sync": options["in_sync"],
+            "orphans": not options["tenants"],
+        }
+
+        if options["output"]:
+            with open(options["output"], "w") as out:
+                counts = report.run(tenants, out, **run_options)
+        else:
+            counts = report.run(tenants, sys.stdout, **run_options)
+
+        self.stderr.write(
+            f"Checked {counts.pop('tenants')} tenant(s) with {report.api_calls}"
+            f" api call(s), {counts.pop('in_sync')} in sync"
+        )
+        for kind, count in counts.items():
+            self.stderr.write(f"  {kind}: {count}")
+
+    def handle_sync(self, **options):
+        try:
+            asyncio.run(self.sync())
+        except KeyboardInterrupt:
+            pass
+
+    async def sync(self):
+        client = release.client
+        await client.connect()
+        try:
+            await StatusSync(client).run()
+        finally:
+            await client.close()
+
+    def handle_worker(self, **options):
+        stop = threading.Event()
+        # finish the current batch on SIGTERM, the lease covers anything else
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        self.stderr.write(f"Worker {options['worker_id']} started")
+        try:
+            outbox.run_worker(options["worker_id"], stop, once=options["once"])
+        except KeyboardInterrupt:
+            pass
@@ -1,3 +1,54 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class ProvisioningJob(models.Model):
+    """
+    Outbox row: a Tenant CR change to push to the cluster.
+    Written in the same transaction as the tenant change, picked up by
+    `manage.py opertator worker`. Jobs are deleted once they succeed.
+    """
+
+    class Action(models.TextChoices):
+        CREATE = "create"
+        UPDATE = "update"
+        DELETE = "delete"
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        FAILED = "failed"
+
+    tenant = models.ForeignKey(
+        "tenant.Tenant",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="provisioning_jobs",
+    )
+    # the CR name, kept when the tenant row is deleted
+    tenant_name = models.CharField(max_length=255)
+    action = models.CharField(max_length=10, choices=Action.choices)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=255, blank=True, default="")
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "run_after"], name="job_status_run_after_idx"
+            ),
+            models.Index(
+                fields=["tenant_name", "status"], name="job_tenant_status_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.tenant_name} ({self.status})"
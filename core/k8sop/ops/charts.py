@@ -0,0 +1,71 @@
+import re
+from pathlib import Path
+from typing import Iterable
+
+import yaml
+from django.conf import settings as django_settings
+
+from core.k8sop.ops.constants import CHART_NAME, LEGACY_CHART_VERSION
+
+# first tenant-stack version that renders each feature, older charts ignore
+# its values
+FEATURE_CHART_VERSIONS = {
+    # backend and postgres resources, the backend HPA
+    "sizing": "1.1.0",
+    # postgresql.enabled and db.host, for the shared postgres
+    "shared_db": "1.3.0",
+    # activator Service and the ingress default backend
+    "scale_to_zero": "1.4.0",
+}
+
+
+def version_key(version: str) -> tuple[int, ...]:
+    return tuple(int(part) for part in re.findall(r"\d+", version))
+
+
+def chart_versions() -> list[str]:
+    """
+    Versions of the tenant chart in the local index.yaml that are packaged in
+    chart-release/, newest first.
+    """
+    base_dir = Path(django_settings.BASE_DIR)
+    index = yaml.safe_load((base_dir / "index.yaml").read_text())
+    versions = [
+        entry["version"]
+        for entry in index.get("entries", {}).get(CHART_NAME, [])
+        if all((base_dir / url).exists() for url in entry.get("urls", []))
+    ]
+    return sorted(versions, key=version_key, reverse=True)
+
+
+def resolve_chart_version(version: str) -> str:
+    """A version from `chart_versions()`, `latest` is the newest one."""
+    versions = chart_versions()
+    if version == "latest" and versions:
+        return versions[0]
+    if version not in versions:
+        raise ValueError(
+            f"{CHART_NAME} {version} is not in index.yaml / chart-release/,"
+            f" available: {', '.join(versions) or 'none'}"
+        )
+    return version
+
+
+def supports(chart_version: str, feature: str) -> bool:
+    """Whether the chart version renders `feature`, blank is the legacy version."""
+    minimum = FEATURE_CHART_VERSIONS[feature]
+    return version_key(chart_version or LEGACY_CHART_VERSION) >= version_key(minimum)
+
+
+def check_features(chart_version: str, features: Iterable[str]):
+    """Raises ValueError when the chart version can't render one of `features`."""
+    missing = [
+        f"{feature} needs {FEATURE_CHART_VERSIONS[feature]} or later"
+        for feature in sorted(features)
+        if not supports(chart_version, feature)
+    ]
+    if missing:
+        raise ValueError(
+            f"{CHART_NAME} {chart_version or LEGACY_CHART_VERSION} can't run this"
+            f" tenant: {', '.join(missing)}"
+        )
@@ -0,0 +1,20 @@
+# These values should match your Helm Operator's CRD.
+HELMRELEASE_GROUP = "helm.toolkit.fluxcd.io"  # adjust if your operator uses a different group
+HELMRELEASE_VERSION = "v2"
+HELMRELEASE_PLURAL = "helmreleases"
+# the Tenant CRD (crds/03-tenant-crd.yaml)
+TENANT_GROUP = "saas.com"
+TENANT_VERSION = "v1"
+TENANT_PLURAL = "tenants"  # Must match the `plural` defined in CRD
+# the tenant chart in the flux HelmRepository `tenant-charts` (index.yaml),
+# the version new tenants are created with (existing ones only move through
+# `manage.py opertator rollout`) and the version Tenant CRs without a
+# chartVersion keep running, the one every tenant ran before versions were pinned
+CHART_NAME = "tenant-stack"
+DEFAULT_CHART_VERSION = "1.4.1"
+LEGACY_CHART_VERSION = "1.0.2"
+# tenant database modes: the chart's own postgres, or a database in the shared cluster
+DB_MODE_DEDICATED = "dedicated"
+DB_MODE_SHARED = "shared"
+# claim the chart's postgres uses as `existingClaim`
+PVC_NAME = "pg-storage"
@@ -1,14 +1,33 @@
 # myapp/k8s.py
+import asyncio
+import hashlib
 import json
 import logging
+from typing import Awaitable, Callable, Iterable, Literal
 
-from kubernetes import client as kube
+from kubernetes_asyncio.client.rest import ApiException
 from pydantic import AliasChoices, BaseModel, Field
 
-from shared.k8sclient import Client
+from core.k8sop.cache import cache
+from core.k8sop.conf import settings
+from core.k8sop.ops import shared_db
+from core.k8sop.ops.charts import supports
+from core.k8sop.ops.constants import (
+    CHART_NAME,
+    DB_MODE_DEDICATED,
+    DB_MODE_SHARED,
+    LEGACY_CHART_VERSION,
+    HELMRELEASE_GROUP,
+    HELMRELEASE_PLURAL,
+    HELMRELEASE_VERSION,
+    PVC_NAME,
+)
+from core.k8sop.ops.retry import with_retries
+from core.k8sop.ops.sizing import TenantSizing
+from shared.k8sclient import AsyncClient, get_async_client
 
 logger = logging.getLogger(__name__)
-client: Client = Client()
+client: AsyncClient = get_async_client()
 
 
 class Tenant(BaseModel):
@@ -25,6 +44,10 @@ class Tenant(BaseModel):
     )
     domain: str
     backendImage: str
+    # CRs created before sizing profiles get the defaults
+    sizing: TenantSizing = TenantSizing()
+    dbMode: Literal["dedicated", "shared"] = DB_MODE_DEDICATED
+    chartVersion: str = ""
 
     def get_config_ref(self) -> dict:
         if self.config is None:
@@ -72,113 +95,49 @@ class TenantDbSetup(BaseModel):
     postgresql: PostgresConfig
 
 
-def create_tenant(tenant: Tenant):
-    """
-    Create a HelmRelease custom resource for the given tenant.
-    This CR will instruct the Helm Operator to deploy the tenant stack.
-    """
+# owner of the HelmRelease fields written with server-side apply
+FIELD_MANAGER = "tenant-operator"
+# hash of the rendered spec, used to skip writes that would change nothing
+SPEC_HASH_ANNOTATION = "saas.com/spec-hash"
 
-    logger.info("Creating namespace for tenant")
-    client.k8s.create_namespace(
-        body=kube.V1Namespace(metadata=kube.V1ObjectMeta(name=tenant.namespace))
-    )
-    client.k8s.create_namespaced_persistent_volume_claim(
-        namespace=tenant.namespace,
-        body=kube.V1PersistentVolumeClaim(
-            metadata=kube.V1ObjectMeta(name="pg-storage"),
-            spec=kube.V1PersistentVolumeClaimSpec(
-                access_modes=["ReadWriteOnce"],
-                resources=kube.V1ResourceRequirements(
-                    requests={"storage": tenant.dbVolumeSize}
-                ),
-            ),
-        ),
-    )
-    logger.info(f"Namespace {tenant.namespace} created")
 
-    # These values should match your Helm Operator's CRD.
-    group = "helm.toolkit.fluxcd.io"  # adjust if your operator uses a different group
-    version = "v2"
-    # Build the HelmRelease custom resource.
-    tenant_db_detail = TenantDbDetail()
-    tenant_db = TenantDbSetup(
-        db=tenant_db_detail,
-        postgresql=PostgresConfig(
-            auth=TenantPostgresAuth.from_tenant_db(tenant_db_detail),
-            primary=TenantDbPersistence(size=tenant.dbVolumeSize),
-        ),
-    )
-    helmrelease_cr = {
-        "apiVersion": f"{group}/{version}",
-        "kind": "HelmRelease",
-        "metadata": {
-            "name": f"{tenant.tenantName}-release",  # ensure this is unique
-            "namespace": tenant.namespace,  # or use a dedicated namespace per tenant if desired
-        },
-        "spec": {
-            "releaseName": f"{tenant.tenantName}",
-            "interval": "1m",
-            "timeout": "5m",
-            "chart": {
-                "spec": {
-                    "chart": "tenant-stack",  # Name of your Helm chart
-                    "version": "1.0.2",
-                    "sourceRef": {
-                        "kind": "HelmRepository",  # This must match your repository CRD kind
-                        "name": "tenant-charts",  # Name of the HelmRepository containing your chart
-                        "namespace": "flux-system",  # Namespace where the HelmRepository exists
-                    },
-                }
-            },
-            "values": {
-                **tenant_db.model_dump(),
-                "backendApp": {
-                    "image": tenant.backendImage,
-                    "replicaCount": 1,
-                    "port": 8000,
-                },
-                "tenantIngress": {
-                    "domain": tenant.domain  # used by the chart's ingress template
-                },
-            },
-        },
-    }
-    if tenant.get_config_ref():
-        helmrelease_cr["spec"]["values"]["backendApp"].update(tenant.get_config_ref())
-    logger.info(json.dumps(helmrelease_cr, indent=2))
+def release_name(tenant: Tenant) -> str:
+    return f"{tenant.tenantName}-release"  # ensure this is unique
 
-    try:
-        client.crd.create_namespaced_custom_object(
-            group=group,
-            version=version,
-            namespace=tenant.namespace,
-            plural="helmreleases",
-            body=helmrelease_cr,
-        )
-        logger.info("HelmRelease CR created for tenant '%s'", tenant.domain)
-    except client.rest.ApiException as e:
-        logger.error(
-            "Error creating HelmRelease CR for tenant '%s': %s", tenant.domain, e
-        )
-        client.k8s.delete_namespace(name=tenant.namespace)
+
+def build_namespace(tenant: Tenant) -> dict:
+    return {
+        "apiVersion": "v1",
+        "kind": "Namespace",
+        "metadata": {"name": tenant.namespace},
+    }
 
 
-def delete_tenant_ns(tenant: Tenant):
+def build_pvc(tenant: Tenant) -> dict:
     """
-    Delete the namespace for the given tenant.
+    Claim for the tenant's postgres data, used by the chart as `existingClaim`.
     """
-    try:
-        client.k8s.delete_namespace(name=tenant.namespace)
-        logger.info("Namespace '%s' deleted", tenant.namespace)
-    except kube.rest.ApiException as e:
-        logger.error("Error deleting namespace '%s': %s", tenant.namespace, e)
+    return {
+        "apiVersion": "v1",
+        "kind": "PersistentVolumeClaim",
+        "metadata": {"name": PVC_NAME, "namespace": tenant.namespace},
+        "spec": {
+            "accessModes": ["ReadWriteOnce"],
+            "resources": {"requests": {"storage": tenant.dbVolumeSize}},
+        },
+    }
 
 
-def update_tenant_release(tenant: Tenant):
-    # These values should match your Helm Operator's CRD.
-    group = "helm.toolkit.fluxcd.io"  # adjust if your operator uses a different group
-    version = "v2"
-    # Build the HelmRelease custom resource.
+def build_db_values(tenant: Tenant) -> dict:
+    """
+    The `db` values the backend connects with and the `postgresql` subchart values.
+    Shared mode tenants get a database behind the shared pooler and no postgres.
+    """
+    if tenant.dbMode == DB_MODE_SHARED:
+        return {
+            "db": shared_db.db_values(tenant.tenantName),
+            "postgresql": {"enabled": False},
+        }
     tenant_db_detail = TenantDbDetail()
     tenant_db = TenantDbSetup(
         db=tenant_db_detail,
@@ -187,14 +146,21 @@ def update_tenant_release(tenant: Tenant):
             primary=TenantDbPersistence(size=tenant.dbVolumeSize),
         ),
     )
-    release_name = f"{tenant.tenantName}-release"
+    values = tenant_db.model_dump()
+    values["postgresql"]["primary"].update(tenant.sizing.postgres_values())
+    return values
 
+
+def build_values(tenant: Tenant) -> dict:
+    """
+    Render the chart values for the given tenant.
+    """
     values = {
-        **tenant_db.model_dump(),
+        **build_db_values(tenant),
         "backendApp": {
             "image": tenant.backendImage,
-            "replicaCount": 1,
             "port": 8000,
+            **tenant.sizing.backend_values(),
         },
         "tenantIngress": {
             "domain": tenant.domain  # used by the chart's ingress template
@@ -202,31 +168,300 @@ def update_tenant_release(tenant: Tenant):
     }
     if tenant.get_config_ref():
         values["backendApp"].update(tenant.get_config_ref())
+    if settings.readiness_probe:
+        values["backendApp"]["readinessProbe"] = {"enabled": True}
+    # older charts have no activator to wake the tenant back up
+    if settings.idle_timeout > 0 and supports(tenant.chartVersion, "scale_to_zero"):
+        values["scaleToZero"] = {
+            "enabled": True,
+            "activatorHost": settings.activator_host,
+            "activatorPort": settings.activator_port,
+        }
+    return values
+
+
+def build_helmrelease_spec(tenant: Tenant) -> dict:
+    """
+    Render the HelmRelease spec (chart reference and values) for the given tenant.
+    """
+    return {
+        "releaseName": f"{tenant.tenantName}",
+        "interval": "1m",
+        "timeout": "5m",
+        "chart": {
+            "spec": {
+                "chart": CHART_NAME,
+                "version": tenant.chartVersion or LEGACY_CHART_VERSION,
+                "sourceRef": {
+                    "kind": "HelmRepository",  # This must match your repository CRD kind
+                    "name": "tenant-charts",  # Name of the HelmRepository containing your chart
+                    "namespace": "flux-system",  # Namespace where the HelmRepository exists
+                },
+            }
+        },
+        "values": build_values(tenant),
+    }
+
+
+def release_target(tenant: Tenant) -> tuple[str, str]:
+    """
+    Chart version and backend image the tenant's HelmRelease runs once applied.
+    Unlike the spec hash they don't depend on the operator's own settings.
+    """
+    return tenant.chartVersion or LEGACY_CHART_VERSION, tenant.backendImage
+
+
+def helmrelease_target(helmrelease: dict) -> tuple[str | None, str | None]:
+    """Chart version and backend image of a live HelmRelease."""
+    spec = helmrelease.get("spec") or {}
+    return (
+        spec.get("chart", {}).get("spec", {}).get("version"),
+        spec.get("values", {}).get("backendApp", {}).get("image"),
+    )
+
+
+def spec_hash(spec: dict) -> str:
+    """
+    Stable hash of a rendered HelmRelease spec (key order independent).
+    """
+    canonical = json.dumps(spec, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def build_helmrelease(tenant: Tenant) -> dict:
+    """
+    Render the full HelmRelease custom resource for the given tenant.
+    """
+    spec = build_helmrelease_spec(tenant)
+    return {
+        "apiVersion": f"{HELMRELEASE_GROUP}/{HELMRELEASE_VERSION}",
+        "kind": "HelmRelease",
+        "metadata": {
+            "name": release_name(tenant),
+            "namespace": tenant.namespace,  # or use a dedicated namespace per tenant if desired
+            "annotations": {SPEC_HASH_ANNOTATION: spec_hash(spec)},
+        },
+        "spec": spec,
+    }
+
+
+def build_manifests(tenant: Tenant) -> list[dict]:
+    """
+    Every object the operator creates for a tenant, in creation order.
+    """
+    if tenant.dbMode == DB_MODE_SHARED:
+        return [build_namespace(tenant), build_helmrelease(tenant)]
+    return [build_namespace(tenant), build_pvc(tenant), build_helmrelease(tenant)]
+
+
+async def ignore_conflict(call: Awaitable):
+    """
+    Await a create call, treating "already exists" as success.
+    """
     try:
-        # Fetch the existing HelmRelease
-        existing_helmrelease = client.crd.get_namespaced_custom_object(
-            group=group,
-            version=version,
-            namespace=tenant.namespace,
-            plural="helmreleases",
-            name=release_name,
+        return await call
+    except ApiException as e:
+        if e.status != 409:
+            raise
+        logger.info("Resource already exists: %s", e.reason)
+
+
+async def apply_helmrelease(helmrelease_cr: dict) -> dict:
+    """
+    Server-side apply the rendered HelmRelease in a single call.
+    Creates the release when missing; fields owned by other managers
+    (e.g. the status written by flux) are left alone, so there is no
+    read-modify-write race to lose.
+    """
+    metadata = helmrelease_cr["metadata"]
+    applied = await with_retries(
+        lambda: client.crd.patch_namespaced_custom_object(
+            group=HELMRELEASE_GROUP,
+            version=HELMRELEASE_VERSION,
+            namespace=metadata["namespace"],
+            plural=HELMRELEASE_PLURAL,
+            name=metadata["name"],
+            body=helmrelease_cr,
+            field_manager=FIELD_MANAGER,
+            force=True,
+            _content_type="application/apply-patch+yaml",
+        ),
+        attempts=settings.apply_retries,
+        base_delay=settings.retry_base_delay,
+    )
+    # write through so a follow-up event sees the new hash before the watch does;
+    # the client only decodes 200 bodies, an apply that creates (201) returns None
+    if cache.synced and applied is not None:
+        cache.helmreleases.upsert(applied)
+    return applied
+
+
+async def ensure_namespace(tenant: Tenant):
+    if cache.namespace_exists(tenant.namespace):
+        return
+    logger.info("Creating namespace '%s'", tenant.namespace)
+    await with_retries(
+        lambda: ignore_conflict(
+            client.k8s.create_namespace(body=build_namespace(tenant))
+        ),
+        attempts=settings.apply_retries,
+        base_delay=settings.retry_base_delay,
+    )
+
+
+async def ensure_pvc(tenant: Tenant):
+    if cache.pvc_exists(tenant.namespace):
+        return
+    await with_retries(
+        lambda: ignore_conflict(
+            client.k8s.create_namespaced_persistent_volume_claim(
+                namespace=tenant.namespace, body=build_pvc(tenant)
+            )
+        ),
+        attempts=settings.apply_retries,
+        base_delay=settings.retry_base_delay,
+    )
+
+
+async def ensure_helmrelease(tenant: Tenant):
+    helmrelease_cr = build_helmrelease(tenant)
+    desired_hash = helmrelease_cr["metadata"]["annotations"][SPEC_HASH_ANNOTATION]
+    if await current_spec_hash(tenant) == desired_hash:
+        return
+    await apply_helmrelease(helmrelease_cr)
+    logger.info("HelmRelease CR created for tenant '%s'", tenant.domain)
+
+
+async def ensure_shared_database(tenant: Tenant):
+    await shared_db.ensure_database(tenant.tenantName)
+
+
+Steps = dict[str, tuple[tuple[str, ...], Callable[[Tenant], Awaitable]]]
+# step name -> (steps it depends on, idempotent step)
+PROVISION_STEPS: Steps = {
+    "namespace": ((), ensure_namespace),
+    "pvc": (("namespace",), ensure_pvc),
+    "helmrelease": (("namespace",), ensure_helmrelease),
+}
+# the backend must not start before its database exists
+SHARED_PROVISION_STEPS: Steps = {
+    "namespace": ((), ensure_namespace),
+    "database": ((), ensure_shared_database),
+    "helmrelease": (("namespace", "database"), ensure_helmrelease),
+}
+
+
+def provision_steps(tenant: Tenant) -> Steps:
+    if tenant.dbMode == DB_MODE_SHARED:
+        return SHARED_PROVISION_STEPS
+    return PROVISION_STEPS
+
+
+class ProvisioningError(Exception):
+    def __init__(self, completed: set[str], failed: dict[str, BaseException]):
+        self.completed = completed
+        self.failed = failed
+        super().__init__(
+            ", ".join(f"{step}: {error}" for step, error in failed.items())
         )
 
-        # Keep metadata, but update `spec`
-        existing_helmrelease["spec"]["values"] = values
-
-        # Update the HelmRelease with the new values
-        updated_helmrelease = client.crd.replace_namespaced_custom_object(
-            group=group,
-            version=version,
-            namespace=tenant.namespace,
-            plural="helmreleases",
-            name=release_name,
-            body=existing_helmrelease,
+
+async def create_tenant(tenant: Tenant, completed: Iterable[str] = ()) -> set[str]:
+    """
+    Provision the namespace, PVC (or shared database) and HelmRelease of a tenant.
+    Steps whose dependencies are done run concurrently, steps in `completed`
+    (from an earlier attempt) are skipped. Returns the completed steps,
+    raises ProvisioningError with the progress made when a step fails;
+    nothing that was created is rolled back, a retry resumes from there.
+    """
+    steps = provision_steps(tenant)
+    done = set(completed) & steps.keys()
+    failed: dict[str, BaseException] = {}
+    pending = {step: steps[step] for step in steps.keys() - done}
+    while ready := [step for step, (needs, _) in pending.items() if done >= set(needs)]:
+        results = await asyncio.gather(
+            *(pending.pop(step)[1](tenant) for step in ready), return_exceptions=True
         )
+        for step, result in zip(ready, results):
+            if isinstance(result, Exception):
+                logger.error(
+                    "Provisioning step '%s' failed for tenant '%s': %s",
+                    step,
+                    tenant.tenantName,
+                    result,
+                )
+                failed[step] = result
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                done.add(step)
+    if failed:
+        raise ProvisioningError(done, failed)
+    return done
+
+
+async def delete_tenant_ns(tenant: Tenant) -> bool:
+    """
+    Start deleting the namespace for the given tenant, dependents first (foreground).
+    Returns False when the namespace is already gone.
+    See `core/k8sop/ops/teardown.py` to wait for the deletion to finish.
+    """
+    try:
+        await with_retries(
+            lambda: client.k8s.delete_namespace(
+                name=tenant.namespace, propagation_policy="Foreground"
+            ),
+            attempts=settings.apply_retries,
+            base_delay=settings.retry_base_delay,
+        )
+    except ApiException as e:
+        if e.status == 404:
+            logger.info("Namespace '%s' already deleted", tenant.namespace)
+            return False
+        logger.error("Error deleting namespace '%s': %s", tenant.namespace, e)
+        raise
+    logger.info("Namespace '%s' deleting", tenant.namespace)
+    return True
+
+
+async def current_spec_hash(tenant: Tenant) -> str | None:
+    """
+    Spec hash annotation of the live HelmRelease, None when it does not exist.
+    Served from the watch cache, falls back to a GET until the cache is synced.
+    """
+    answered, existing_helmrelease = cache.helmrelease(
+        tenant.namespace, release_name(tenant)
+    )
+    if not answered:
+        try:
+            existing_helmrelease = await client.crd.get_namespaced_custom_object(
+                group=HELMRELEASE_GROUP,
+                version=HELMRELEASE_VERSION,
+                namespace=tenant.namespace,
+                plural=HELMRELEASE_PLURAL,
+                name=release_name(tenant),
+            )
+        except ApiException as e:
+            if e.status != 404:
+                raise
+    if existing_helmrelease is None:
+        return None
+    annotations = existing_helmrelease["metadata"].get("annotations") or {}
+    return annotations.get(SPEC_HASH_ANNOTATION)
+
+
+async def update_tenant_release(tenant: Tenant):
+    helmrelease_cr = build_helmrelease(tenant)
+    desired_hash = helmrelease_cr["metadata"]["annotations"][SPEC_HASH_ANNOTATION]
+    try:
+        if await current_spec_hash(tenant) == desired_hash:
+            logger.info(f"HelmRelease CR unchanged for tenant {tenant.domain}, skipping")
+            return None
 
+        updated_helmrelease = await apply_helmrelease(helmrelease_cr)
         logger.info(f"HelmRelease CR updated for tenant {tenant.domain}")
         return updated_helmrelease
 
-    except client.rest.ApiException as e:
+    except ApiException as e:
         logger.error(f"Error updating HelmRelease CR for tenant {tenant.domain}: {e}")
+        raise
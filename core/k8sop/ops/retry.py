@@ -0,0 +1,41 @@
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, TypeVar
+
+from kubernetes_asyncio.client.rest import ApiException
+
+logger = logging.getLogger(__name__)
+T = TypeVar("T")
+
+# conflicts, throttling and transient api server errors
+RETRYABLE_STATUSES = {409, 429, 500, 502, 503, 504}
+
+
+async def with_retries(
+    call: Callable[[], Awaitable[T]],
+    *,
+    attempts: int,
+    base_delay: float,
+    max_delay: float = 10.0,
+) -> T:
+    """
+    Await `call()` and retry it on retryable api errors.
+    Backoff is exponential with full jitter so a fleet of tenants
+    hitting the same error does not retry in lockstep.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return await call()
+        except ApiException as e:
+            if e.status not in RETRYABLE_STATUSES or attempt == attempts:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+            logger.warning(
+                "Retrying api call after %s (attempt %d/%d, sleeping %.2fs)",
+                e.status,
+                attempt,
+                attempts,
+                delay,
+            )
+            await asyncio.sleep(delay)
@@ -0,0 +1,103 @@
+import hashlib
+import hmac
+import logging
+import re
+
+from psycopg import AsyncConnection, errors, sql
+
+from core.k8sop.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def database_name(tenant_name: str) -> str:
+    """
+    Database and role of a tenant in the shared cluster (63 chars max), the hash
+    keeps names that only differ in case or punctuation apart.
+    """
+    slug = re.sub(r"[^a-z0-9_]", "_", tenant_name.lower())[:46]
+    suffix = hashlib.sha256(tenant_name.encode()).hexdigest()[:8]
+    return f"tenant_{slug}_{suffix}"
+
+
+def password(tenant_name: str) -> str:
+    """
+    Derived from the tenant name and OPERATOR_SHARED_DB_PASSWORD_KEY, so it is
+    stable across reconciles and replicas without being stored anywhere.
+    """
+    if not settings.shared_db_password_key:
+        raise ValueError("OPERATOR_SHARED_DB_PASSWORD_KEY is not set")
+    return hmac.new(
+        settings.shared_db_password_key.encode(), tenant_name.encode(), hashlib.sha256
+    ).hexdigest()[:32]
+
+
+def db_values(tenant_name: str) -> dict:
+    """Chart `db` values pointing the backend at the pooler."""
+    name = database_name(tenant_name)
+    return {
+        "host": settings.shared_db_host,
+        "port": settings.shared_db_port,
+        "username": name,
+        "password": password(tenant_name),
+        "database": name,
+    }
+
+
+async def connect() -> AsyncConnection:
+    # CREATE / DROP DATABASE can't run inside a transaction
+    return await AsyncConnection.connect(
+        settings.shared_db_admin_url,
+        autocommit=True,
+        connect_timeout=settings.shared_db_connect_timeout,
+    )
+
+
+async def ensure_database(tenant_name: str):
+    """
+    Create the tenant role and database in the shared cluster, or reset the
+    role password when they exist. Only the tenant role may connect to it.
+    """
+    name = database_name(tenant_name)
+    identifier = sql.Identifier(name)
+    async with await connect() as conn:
+        role = await conn.execute("SELECT 1 FROM pg_roles WHERE rolname = %s", [name])
+        statement = "ALTER ROLE {} LOGIN PASSWORD {}"
+        if await role.fetchone() is None:
+            statement = "CREATE ROLE {} LOGIN PASSWORD {}"
+        try:
+            await conn.execute(
+                sql.SQL(statement).format(
+                    identifier, sql.Literal(password(tenant_name))
+                )
+            )
+        except errors.DuplicateObject:
+            pass  # created concurrently
+        database = await conn.execute(
+            "SELECT 1 FROM pg_database WHERE datname = %s", [name]
+        )
+        if await database.fetchone() is None:
+            logger.info("Creating shared database '%s'", name)
+            try:
+                await conn.execute(
+                    sql.SQL("CREATE DATABASE {} OWNER {}").format(
+                        identifier, identifier
+                    )
+                )
+            except errors.DuplicateDatabase:
+                pass
+        await conn.execute(
+            sql.SQL("REVOKE CONNECT ON DATABASE {} FROM PUBLIC").format(identifier)
+        )
+
+
+async def drop_database(tenant_name: str):
+    """Drop the tenant database (closing leftover sessions) and role."""
+    name = database_name(tenant_name)
+    identifier = sql.Identifier(name)
+    async with await connect() as conn:
+        await conn.execute(
+            sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(identifier)
+        )
+        await conn.execute(sql.SQL("DROP ROLE IF EXISTS {}").format(identifier))
+    logger.info("Dropped shared database '%s'", name)
@@ -0,0 +1,58 @@
+from pydantic import BaseModel, Field, model_validator
+
+
+class ComputeResources(BaseModel):
+    cpu: str = "250m"
+    memory: str = "256Mi"
+
+    def render(self) -> dict:
+        """
+        Kubernetes resources block. The memory limit equals the request so a
+        tenant can't take memory from its neighbours, cpu is left unlimited
+        so short bursts can use idle capacity.
+        """
+        return {
+            "requests": {"cpu": self.cpu, "memory": self.memory},
+            "limits": {"memory": self.memory},
+        }
+
+
+class TenantSizing(BaseModel):
+    """
+    Sizing profile of a tenant, the `sizing` field of the Tenant CR spec.
+    The backend is autoscaled between minReplicas and maxReplicas when they
+    differ, utilization targets are percentages of the backend requests.
+    """
+
+    minReplicas: int = Field(default=1, ge=1)
+    maxReplicas: int = Field(default=1, ge=1)
+    targetCPUUtilization: int = Field(default=80, ge=1, le=100)
+    targetMemoryUtilization: int | None = Field(default=None, ge=1, le=100)
+    backend: ComputeResources = ComputeResources()
+    postgres: ComputeResources = ComputeResources(memory="512Mi")
+
+    @model_validator(mode="after")
+    def check_replicas(self):
+        if self.maxReplicas < self.minReplicas:
+            raise ValueError("maxReplicas must not be lower than minReplicas")
+        return self
+
+    @property
+    def autoscaling(self) -> bool:
+        return self.maxReplicas > self.minReplicas
+
+    def backend_values(self) -> dict:
+        return {
+            "replicaCount": self.minReplicas,
+            "resources": self.backend.render(),
+            "autoscaling": {
+                "enabled": self.autoscaling,
+                "minReplicas": self.minReplicas,
+                "maxReplicas": self.maxReplicas,
+                "targetCPUUtilizationPercentage": self.targetCPUUtilization,
+                "targetMemoryUtilizationPercentage": self.targetMemoryUtilization,
+            },
+        }
+
+    def postgres_values(self) -> dict:
+        return {"resources": self.postgres.render()}
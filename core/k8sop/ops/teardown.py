@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+from itertools import islice
+from typing import Awaitable, Callable, Iterable
+
+from kubernetes_asyncio.client.rest import ApiException
+from psycopg import Error as DatabaseError
+from pydantic import BaseModel
+
+from core.k8sop.cache import cache
+from core.k8sop.conf import settings
+from core.k8sop.ops import release, shared_db
+from core.k8sop.ops.constants import DB_MODE_SHARED, PVC_NAME
+
+logger = logging.getLogger(__name__)
+
+
+class TeardownProgress(BaseModel):
+    tenant: str
+    namespace: str
+    # pending -> deleting -> terminating -> storage_released -> deleted, or failed
+    phase: str = "pending"
+    error: str | None = None
+    # seconds since the teardown of this tenant started
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.phase == "deleted"
+
+
+ProgressCallback = Callable[[TeardownProgress], None]
+
+
+async def wait_gone(
+    informer_name: str,
+    read_call: Callable[[], Awaitable],
+    namespace: str | None,
+    name: str,
+    timeout: float,
+):
+    """
+    Wait until an object is deleted, raises TimeoutError.
+    Follows the watch cache when it runs, otherwise polls the api server.
+    """
+    informer = getattr(cache, informer_name, None) if cache.tasks else None
+    if informer is not None and informer.synced.is_set():
+        await informer.wait_removed(namespace, name, timeout)
+        return
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await read_call()
+        except ApiException as e:
+            if e.status == 404:
+                return
+            raise
+        if time.monotonic() >= deadline:
+            raise TimeoutError
+        await asyncio.sleep(settings.teardown_poll_interval)
+
+
+async def teardown_tenant(
+    tenant: release.Tenant,
+    on_progress: ProgressCallback | None = None,
+    timeout: float | None = None,
+) -> TeardownProgress:
+    """
+    Delete the tenant namespace and wait until its PVC and then the namespace
+    itself are gone. Shared mode tenants have no PVC, their database is dropped
+    once the namespace (and every backend connected to it) is gone.
+    Errors end up in the returned progress instead of raising.
+    """
+    shared = tenant.dbMode == DB_MODE_SHARED
+    timeout = timeout or settings.teardown_timeout
+    progress = TeardownProgress(tenant=tenant.tenantName, namespace=tenant.namespace)
+    started = time.monotonic()
+
+    def advance(phase: str, error: str | None = None):
+        progress.phase = phase
+        progress.error = error
+        progress.elapsed = round(time.monotonic() - started, 3)
+        if on_progress is not None:
+            on_progress(progress)
+
+    def remaining() -> float:
+        return max(timeout - (time.monotonic() - started), 0)
+
+    advance("deleting")
+    # what a timeout was waiting for
+    waiting_for = f"PVC {PVC_NAME}"
+    try:
+        if await release.delete_tenant_ns(tenant):
+            advance("terminating")
+            if not shared:
+                await wait_gone(
+                    "pvcs",
+                    lambda: release.client.k8s.read_namespaced_persistent_volume_claim(
+                        name=PVC_NAME, namespace=tenant.namespace
+                    ),
+                    tenant.namespace,
+                    PVC_NAME,
+                    remaining(),
+                )
+                advance("storage_released")
+            waiting_for = "namespace"
+            await wait_gone(
+                "namespaces",
+                lambda: release.client.k8s.read_namespace(name=tenant.namespace),
+                None,
+                tenant.namespace,
+                remaining(),
+            )
+        if shared:
+            await shared_db.drop_database(tenant.tenantName)
+            advance("storage_released")
+        advance("deleted")
+    except ApiException as e:
+        advance("failed", f"{e.status} {e.reason}")
+    except DatabaseError as e:
+        advance("failed", f"dropping the shared database failed: {e}")
+    except TimeoutError:
+        advance("failed", f"{waiting_for} not gone after {timeout}s")
+    return progress
+
+
+def waves(items: Iterable, size: int):
+    iterator = iter(items)
+    while wave := list(islice(iterator, size)):
+        yield wave
+
+
+async def teardown_tenants(
+    tenants: Iterable[release.Tenant],
+    on_progress: ProgressCallback | None = None,
+    concurrency: int | None = None,
+    wave_size: int | None = None,
+    wave_pause: float | None = None,
+    timeout: float | None = None,
+) -> list[TeardownProgress]:
+    """
+    Tear tenants down in waves of `wave_size`, at most `concurrency` namespaces
+    terminating at once. A wave only starts once every namespace of the previous
+    one is gone, so storage is released at a steady pace.
+    """
+    slots = asyncio.Semaphore(concurrency or settings.teardown_concurrency)
+    wave_size = wave_size or settings.teardown_wave_size
+    wave_pause = settings.teardown_wave_pause if wave_pause is None else wave_pause
+
+    async def run(tenant: release.Tenant) -> TeardownProgress:
+        async with slots:
+            return await teardown_tenant(tenant, on_progress, timeout)
+
+    results: list[TeardownProgress] = []
+    for number, wave in enumerate(waves(tenants, wave_size), start=1):
+        if number > 1 and wave_pause:
+            await asyncio.sleep(wave_pause)
+        logger.info("Teardown wave %d: %d tenant(s)", number, len(wave))
+        results.extend(await asyncio.gather(*(run(tenant) for tenant in wave)))
+    return results
@@ -0,0 +1,216 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from kubernetes import client
+from pydantic import BaseModel
+
+from core.k8sop.models import ProvisioningJob
+from core.tenant.models import Tenant
+from core.tenant.resources import (
+    create_tenant_cr,
+    delete_tenant_cr,
+    describe_error,
+    update_tenant_cr,
+)
+from shared import metrics
+
+logger = logging.getLogger(__name__)
+
+Action = ProvisioningJob.Action
+Status = ProvisioningJob.Status
+
+OPERATIONS: dict[str, Callable[[Tenant], None]] = {
+    action: metrics.track("worker", action)(operation)
+    for action, operation in (
+        (Action.CREATE, create_tenant_cr),
+        (Action.UPDATE, update_tenant_cr),
+        (Action.DELETE, delete_tenant_cr),
+    )
+}
+# the cluster already is in the state the job asked for
+SATISFIED = {Action.CREATE: {409}, Action.DELETE: {404}}
+# retrying won't help
+PERMANENT = {400, 404, 422}
+
+
+class JobResult(BaseModel):
+    job_id: int
+    error: str | None = None
+    permanent: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def enqueue(tenants: Iterable[Tenant], action: str, delay: float = 0) -> int:
+    """
+    Queue `action` for every tenant. Call it inside the transaction that
+    changes the tenants so the job exists if and only if the change commits.
+    A pending job for the same tenant and action is reused, a delete drops
+    pending creates and updates. New jobs are due after `delay` seconds, so
+    changes made in the meantime share the job. Returns the number of new jobs.
+    """
+    tenants = list(tenants)
+    names = [tenant.name for tenant in tenants]
+    pending = ProvisioningJob.objects.filter(
+        tenant_name__in=names, status=Status.PENDING
+    )
+    if action == Action.DELETE:
+        pending.filter(action__in=[Action.CREATE, Action.UPDATE]).delete()
+    queued = set(pending.filter(action=action).values_list("tenant_name", flat=True))
+    run_after = timezone.now() + timedelta(seconds=delay)
+    jobs = [
+        # rows being deleted (no pk) are only referenced by name
+        ProvisioningJob(
+            tenant=tenant if tenant.pk else None,
+            tenant_name=tenant.name,
+            action=action,
+            run_after=run_after,
+        )
+        for tenant in tenants
+        if tenant.name not in queued
+    ]
+    ProvisioningJob.objects.bulk_create(jobs)
+    return len(jobs)
+
+
+def claim(worker_id: str, batch_size: int) -> list[ProvisioningJob]:
+    """
+    Lock and mark up to `batch_size` due jobs as running, at most one per tenant
+    and none for a tenant another worker is busy with. Concurrent workers skip
+    each other's locked rows (FOR UPDATE SKIP LOCKED) instead of waiting.
+    Running jobs whose lease expired (crashed worker) are claimed again.
+    """
+    now = timezone.now()
+    expired = now - timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+    with transaction.atomic():
+        busy = ProvisioningJob.objects.filter(
+            status=Status.RUNNING, locked_at__gte=expired
+        ).values("tenant_name")
+        candidates = (
+            ProvisioningJob.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("tenant")
+            .filter(
+                Q(status=Status.PENDING, run_after__lte=now)
+                | Q(status=Status.RUNNING, locked_at__lt=expired)
+            )
+            .exclude(tenant_name__in=busy)
+            .order_by("pk")[: batch_size * 2]
+        )
+        jobs: dict[str, ProvisioningJob] = {}
+        for job in candidates:
+            # jobs of one tenant run in order, one at a time
+            jobs.setdefault(job.tenant_name, job)
+            if len(jobs) == batch_size:
+                break
+        claimed = list(jobs.values())
+        ProvisioningJob.objects.filter(pk__in=[job.pk for job in claimed]).update(
+            status=Status.RUNNING,
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+        )
+    for job in claimed:
+        job.attempts += 1
+    return claimed
+
+
+def run_job(job: ProvisioningJob) -> JobResult:
+    tenant = job.tenant
+    if tenant is None:
+        if job.action != Action.DELETE:
+            return JobResult(job_id=job.pk, error="tenant was deleted", permanent=True)
+        # the CR can still be deleted by name
+        tenant = Tenant(name=job.tenant_name)
+    try:
+        OPERATIONS[job.action](tenant)
+    except client.rest.ApiException as e:
+        if e.status in SATISFIED.get(job.action, ()):
+            return JobResult(job_id=job.pk)
+        return JobResult(
+            job_id=job.pk, error=describe_error(e), permanent=e.status in PERMANENT
+        )
+    except Exception as e:
+        return JobResult(job_id=job.pk, error=describe_error(e))
+    finally:
+        close_old_connections()
+    return JobResult(job_id=job.pk)
+
+
+def retry_delay(attempts: int) -> float:
+    base = settings.OUTBOX_RETRY_BASE_DELAY * 2 ** (attempts - 1)
+    return random.uniform(0, min(settings.OUTBOX_RETRY_MAX_DELAY, base))
+
+
+def finish(jobs: list[ProvisioningJob], results: list[JobResult]):
+    """
+    Delete succeeded jobs, reschedule failed ones with exponential backoff
+    and give up after OUTBOX_MAX_ATTEMPTS. Tenant status set by the
+    operations is saved in the same transaction.
+    """
+    now = timezone.now()
+    done, retried, tenants = [], [], []
+    for job, result in zip(jobs, results):
+        if result.ok:
+            done.append(job.pk)
+            # create / delete set the resource status, updates leave it alone
+            if job.tenant is not None and job.action != Action.UPDATE:
+                tenants.append(job.tenant)
+            continue
+        job.last_error = result.error
+        job.locked_by = ""
+        job.locked_at = None
+        if result.permanent or job.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            job.status = Status.FAILED
+            logger.error(
+                "Giving up on %s of tenant '%s': %s",
+                job.action,
+                job.tenant_name,
+                job.last_error,
+            )
+        else:
+            job.status = Status.PENDING
+            job.run_after = now + timedelta(seconds=retry_delay(job.attempts))
+        retried.append(job)
+    with transaction.atomic():
+        ProvisioningJob.objects.filter(pk__in=done).delete()
+        ProvisioningJob.objects.bulk_update(
+            retried, ["status", "run_after", "locked_by", "locked_at", "last_error"]
+        )
+        Tenant.objects.bulk_update(tenants, ["resource_status"])
+
+
+def run_worker(worker_id: str, stop: threading.Event, once: bool = False):
+    """
+    Claim and run batches of jobs until `stop` is set, or until the queue is
+    empty when `once`. Jobs of a batch run concurrently on a thread pool.
+    """
+    with ThreadPoolExecutor(max_workers=settings.OUTBOX_WORKERS) as pool:
+        while not stop.is_set():
+            close_old_connections()
+            jobs = claim(worker_id, settings.OUTBOX_BATCH_SIZE)
+            if not jobs:
+                if once:
+                    return
+                stop.wait(settings.OUTBOX_POLL_INTERVAL)
+                continue
+            started = time.monotonic()
+            results = list(pool.map(run_job, jobs))
+            finish(jobs, results)
+            failed = sum(not result.ok for result in results)
+            logger.info(
+                "Ran %d job(s) in %.2fs, %d failed",
+                len(jobs),
+                time.monotonic() - started,
+                failed,
+            )
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Generic, TypeVar
+
+logger = logging.getLogger(__name__)
+T = TypeVar("T")
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every queue worker. A rate <= 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ReconcileQueue(Generic[T]):
+    """
+    Keyed work queue that only keeps the latest item per key.
+    Submitting a key that is already waiting replaces its item, so a burst of
+    events for one tenant costs a single reconcile of the newest spec.
+    A key is never processed by two workers at once; failed keys are retried
+    with per-key exponential backoff unless a newer item arrived meanwhile.
+    """
+
+    def __init__(
+        self,
+        reconcile: Callable[[T], Awaitable],
+        *,
+        workers: int,
+        limiter: RateLimiter,
+        backoff_base: float,
+        backoff_max: float,
+    ):
+        self.reconcile = reconcile
+        self.workers = workers
+        self.limiter = limiter
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pending: dict[str, T] = {}
+        self.failures: dict[str, int] = {}
+        self.processing: set[str] = set()
+        self.forgotten: set[str] = set()
+        self.delayed: dict[str, asyncio.TimerHandle] = {}
+        self.ready: asyncio.Queue[str] = asyncio.Queue()
+        self.queued: set[str] = set()
+        self.tasks: list[asyncio.Task] = []
+
+    @property
+    def depth(self) -> int:
+        """Keys waiting to be reconciled (queued or backing off)."""
+        return len(self.pending)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self.processing)
+
+    def submit(self, key: str, item: T):
+        self.pending[key] = item
+        self.__schedule(key)
+
+    def forget(self, key: str):
+        """Drop any pending work and backoff state for the key."""
+        self.pending.pop(key, None)
+        self.failures.pop(key, None)
+        timer = self.delayed.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        if key in self.processing:
+            self.forgotten.add(key)
+
+    def __schedule(self, key: str):
+        if key in self.queued or key in self.processing or key in self.delayed:
+            return
+        self.queued.add(key)
+        self.ready.put_nowait(key)
+
+    def __retry_later(self, key: str):
+        delay = min(
+            self.backoff_max, self.backoff_base * 2 ** (self.failures[key] - 1)
+        )
+        logger.info("Retrying %s in %.1fs", key, delay)
+        self.delayed[key] = asyncio.get_running_loop().call_later(
+            delay, self.__release_delayed, key
+        )
+
+    def __release_delayed(self, key: str):
+        self.delayed.pop(key, None)
+        if key in self.pending:
+            self.__schedule(key)
+
+    async def __worker(self):
+        while True:
+            key = await self.ready.get()
+            self.queued.discard(key)
+            item = self.pending.pop(key, None)
+            if item is None:
+                # forgotten while queued
+                continue
+            self.processing.add(key)
+            try:
+                await self.limiter.acquire()
+                await self.reconcile(item)
+                self.failures.pop(key, None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Reconcile of %s failed: %s", key, e)
+                if key not in self.forgotten:
+                    self.failures[key] = self.failures.get(key, 0) + 1
+                    # keep a newer item if one arrived while we were working
+                    self.pending.setdefault(key, item)
+                    self.__retry_later(key)
+            finally:
+                self.processing.discard(key)
+                self.forgotten.discard(key)
+            if key in self.pending:
+                self.__schedule(key)
+
+    def start(self):
+        self.tasks = [
+            asyncio.create_task(self.__worker(), name=f"reconcile-worker-{index}")
+            for index in range(self.workers)
+        ]
+
+    async def stop(self):
+        for timer in self.delayed.values():
+            timer.cancel()
+        self.delayed.clear()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
@@ -0,0 +1,62 @@
+import json
+import logging
+from typing import Iterable, TextIO
+
+import yaml
+
+from core.k8sop.ops import release
+from core.tenant.dto import TenantCrd
+from core.tenant.models import Tenant
+
+logger = logging.getLogger(__name__)
+
+YamlDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+FORMATS = ("jsonl", "yaml")
+
+
+def tenant_spec(tenant: Tenant) -> release.Tenant:
+    """
+    The spec the operator would receive for this row, via the same Tenant CR dto the admin posts.
+    """
+    return release.Tenant.model_validate(
+        TenantCrd.create_from_model(tenant).spec.model_dump()
+    )
+
+
+def write_manifest(out: TextIO, manifest: dict, fmt: str):
+    if fmt == "jsonl":
+        out.write(json.dumps(manifest, separators=(",", ":")))
+        out.write("\n")
+    else:
+        out.write("---\n")
+        out.write(yaml.dump(manifest, Dumper=YamlDumper, sort_keys=False))
+
+
+def render_tenants(
+    tenants: Iterable[Tenant],
+    out: TextIO,
+    fmt: str = "jsonl",
+    helmrelease_only: bool = False,
+) -> tuple[int, int]:
+    """
+    Stream the rendered manifests of every tenant to `out`, one document per object.
+    Rows that can't be rendered are logged and skipped.
+    Returns (rendered, failed) tenant counts.
+    """
+    rendered = failed = 0
+    for tenant in tenants:
+        try:
+            spec = tenant_spec(tenant)
+            if helmrelease_only:
+                manifests = [release.build_helmrelease(spec)]
+            else:
+                manifests = release.build_manifests(spec)
+        # pydantic's ValidationError included
+        except ValueError as e:
+            logger.error("Can't render tenant '%s': %s", tenant.name, e)
+            failed += 1
+            continue
+        for manifest in manifests:
+            write_manifest(out, manifest, fmt)
+        rendered += 1
+    return rendered, failed
@@ -0,0 +1,276 @@
+import asyncio
+import logging
+import time
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
+from asgiref.sync import sync_to_async
+from kubernetes_asyncio.client.rest import ApiException
+from pydantic import BaseModel
+
+from core.k8sop.cache import cache
+from core.k8sop.conf import settings
+from core.k8sop.ops import release
+from core.k8sop.ops.charts import check_features
+from core.k8sop.ops.constants import (
+    HELMRELEASE_GROUP,
+    HELMRELEASE_PLURAL,
+    HELMRELEASE_VERSION,
+    TENANT_GROUP,
+    TENANT_PLURAL,
+    TENANT_VERSION,
+)
+from core.k8sop.ops.retry import with_retries
+from core.k8sop.render import tenant_spec
+from core.k8sop.sync import Status, helmrelease_status
+from core.tenant.dto import TenantMeta
+from core.tenant.models import Tenant
+
+logger = logging.getLogger(__name__)
+
+
+def wave_sizes(sizes: str) -> Iterator[int]:
+    """`1,10,50` -> 1, 10, 50, 50, ... the last size repeats."""
+    parsed = [int(size) for size in sizes.split(",")]
+    if min(parsed) < 1:
+        raise ValueError(f"Wave sizes must be positive: {sizes}")
+    yield from parsed
+    while True:
+        yield parsed[-1]
+
+
+def waves(items: Iterable, sizes: Iterator[int]):
+    iterator = iter(items)
+    for size in sizes:
+        wave = list(islice(iterator, size))
+        if not wave:
+            return
+        yield wave
+
+
+class RolloutProgress(BaseModel):
+    tenant: str
+    wave: int = 0
+    # pending -> updating -> waiting -> ready, or unchanged, failed, halted
+    # (never started) and rolled_back
+    phase: str = "pending"
+    chartVersion: str = ""
+    backendImage: str | None = None
+    error: str | None = None
+    # seconds since the rollout started
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.phase in ("ready", "unchanged")
+
+
+ProgressCallback = Callable[[RolloutProgress], None]
+
+
+class RolloutError(Exception):
+    pass
+
+
+class Rollout:
+    """
+    Moves tenants to a chart version and / or backend image in waves.
+    Each tenant is updated in the database and in its Tenant CR (the operator
+    applies the HelmRelease), then gated on the HelmRelease being Ready with
+    the new spec. A wave starts once the previous one settled; when more than
+    `max_failures` tenants failed the rollout halts and, with `rollback`,
+    every tenant it moved goes back to its previous version and image.
+    """
+
+    def __init__(
+        self,
+        chart_version: str | None = None,
+        image: str | None = None,
+        on_progress: ProgressCallback | None = None,
+        concurrency: int | None = None,
+        sizes: str | None = None,
+        max_failures: int | None = None,
+        rollback: bool = True,
+        timeout: float | None = None,
+    ):
+        self.chart_version = chart_version
+        self.image = image
+        self.on_progress = on_progress
+        self.slots = asyncio.Semaphore(concurrency or settings.rollout_concurrency)
+        self.sizes = sizes or settings.rollout_waves
+        self.max_failures = (
+            settings.rollout_max_failures if max_failures is None else max_failures
+        )
+        self.rollback = rollback
+        self.timeout = timeout or settings.rollout_timeout
+        # tenant, its previous (chart version, image) and progress
+        self.moved: list[tuple[Tenant, tuple[str, str | None], RolloutProgress]] = []
+        self.started = time.monotonic()
+
+    def target(self, tenant: Tenant) -> tuple[str, str | None]:
+        return (
+            self.chart_version or tenant.chart_version,
+            self.image or tenant.backend_image,
+        )
+
+    def advance(self, progress: RolloutProgress, phase: str, error: str | None = None):
+        progress.phase = phase
+        progress.error = error
+        progress.elapsed = round(time.monotonic() - self.started, 3)
+        if self.on_progress is not None:
+            self.on_progress(progress)
+
+    async def apply(
+        self, tenant: Tenant, chart_version: str, image: str | None
+    ) -> release.Tenant:
+        """
+        Record the version and image, push them to the Tenant CR and return
+        the spec the operator will render the HelmRelease from.
+        """
+        tenant.chart_version, tenant.backend_image = chart_version, image
+        spec = tenant_spec(tenant)
+        await sync_to_async(Tenant.objects.filter(pk=tenant.pk).update)(
+            chart_version=chart_version, backend_image=image
+        )
+        await with_retries(
+            lambda: release.client.crd.patch_namespaced_custom_object(
+                group=TENANT_GROUP,
+                version=TENANT_VERSION,
+                namespace=TenantMeta(name=tenant.name).namespace,
+                plural=TENANT_PLURAL,
+                name=tenant.name,
+                body={"spec": {"chartVersion": chart_version, "backendImage": image}},
+                _content_type="application/merge-patch+json",
+            ),
+            attempts=settings.apply_retries,
+            base_delay=settings.retry_base_delay,
+        )
+        return spec
+
+    async def get_helmrelease(self, spec: release.Tenant) -> dict | None:
+        answered, helmrelease = cache.helmrelease(
+            spec.namespace, release.release_name(spec)
+        )
+        if answered:
+            return helmrelease
+        try:
+            return await release.client.crd.get_namespaced_custom_object(
+                group=HELMRELEASE_GROUP,
+                version=HELMRELEASE_VERSION,
+                namespace=spec.namespace,
+                plural=HELMRELEASE_PLURAL,
+                name=release.release_name(spec),
+            )
+        except ApiException as e:
+            if e.status != 404:
+                raise
+        return None
+
+    async def wait_ready(self, spec: release.Tenant):
+        """
+        Wait until the HelmRelease runs the chart version and image of `spec`
+        and flux reports its latest generation Ready. The rendered values
+        depend on the operator's settings, so they aren't compared here.
+        Raises RolloutError when the release failed and TimeoutError after
+        the rollout timeout.
+        """
+        deadline = time.monotonic() + self.timeout
+        target = release.release_target(spec)
+        while True:
+            helmrelease = await self.get_helmrelease(spec)
+            if (
+                helmrelease is not None
+                and release.helmrelease_target(helmrelease) == target
+            ):
+                observed = helmrelease_status(helmrelease)
+                current = (helmrelease.get("status") or {}).get(
+                    "observedGeneration", 0
+                ) >= helmrelease["metadata"].get("generation", 0)
+                if observed.status == Status.READY:
+                    return
+                if observed.status == Status.FAILED and current:
+                    raise RolloutError(observed.message or "HelmRelease failed")
+            if time.monotonic() >= deadline:
+                raise TimeoutError
+            await asyncio.sleep(settings.rollout_poll_interval)
+
+    async def move(self, tenant: Tenant, wave: int) -> RolloutProgress:
+        previous = (tenant.chart_version, tenant.backend_image)
+        chart_version, image = self.target(tenant)
+        progress = RolloutProgress(
+            tenant=tenant.name,
+            wave=wave,
+            chartVersion=chart_version,
+            backendImage=image,
+        )
+        if (chart_version, image) == previous:
+            self.advance(progress, "unchanged")
+            return progress
+        try:
+            check_features(chart_version, tenant.chart_features())
+        except ValueError as e:
+            # nothing applied, nothing to roll back
+            self.advance(progress, "failed", str(e))
+            return progress
+        async with self.slots:
+            # before the first write, a half applied move is rolled back as well
+            self.moved.append((tenant, previous, progress))
+            self.advance(progress, "updating")
+            try:
+                spec = await self.apply(tenant, chart_version, image)
+                self.advance(progress, "waiting")
+                await self.wait_ready(spec)
+            except ApiException as e:
+                self.advance(progress, "failed", f"{e.status} {e.reason}")
+            # pydantic's ValidationError included
+            except (RolloutError, ValueError) as e:
+                self.advance(progress, "failed", str(e))
+            except TimeoutError:
+                self.advance(progress, "failed", f"not Ready after {self.timeout}s")
+            else:
+                self.advance(progress, "ready")
+        return progress
+
+    async def revert(
+        self,
+        tenant: Tenant,
+        previous: tuple[str, str | None],
+        progress: RolloutProgress,
+    ):
+        async with self.slots:
+            progress.chartVersion, progress.backendImage = previous
+            try:
+                spec = await self.apply(tenant, *previous)
+                await self.wait_ready(spec)
+            except ApiException as e:
+                self.advance(progress, "failed", f"rollback: {e.status} {e.reason}")
+            except (RolloutError, ValueError) as e:
+                self.advance(progress, "failed", f"rollback: {e}")
+            except TimeoutError:
+                self.advance(
+                    progress, "failed", f"rollback: not Ready after {self.timeout}s"
+                )
+            else:
+                self.advance(progress, "rolled_back")
+
+    async def run(self, tenants: list[Tenant]) -> list[RolloutProgress]:
+        results: list[RolloutProgress] = []
+        for number, wave in enumerate(waves(tenants, wave_sizes(self.sizes)), start=1):
+            logger.info("Rollout wave %d: %d tenant(s)", number, len(wave))
+            results.extend(
+                await asyncio.gather(*(self.move(tenant, number) for tenant in wave))
+            )
+            failed = sum(progress.phase == "failed" for progress in results)
+            if failed <= self.max_failures:
+                continue
+            logger.error(
+                "Rollout halted after wave %d, %d tenant(s) failed", number, failed
+            )
+            for tenant in tenants[len(results) :]:
+                progress = RolloutProgress(tenant=tenant.name)
+                self.advance(progress, "halted")
+                results.append(progress)
+            if self.rollback:
+                await asyncio.gather(*(self.revert(*moved) for moved in self.moved))
+            break
+        return results
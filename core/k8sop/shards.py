@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from kubernetes_asyncio.client.rest import ApiException
+
+from core.k8sop.conf import settings
+from core.k8sop.ops.retry import with_retries
+from shared.k8sclient import AsyncClient
+
+logger = logging.getLogger(__name__)
+
+# label of the member leases, one Lease per operator replica
+SHARD_LABEL = "saas.com/tenant-operator-shard"
+FIELD_MANAGER = "tenant-operator"
+
+# called with the previous and the new member list
+RebalanceCallback = Callable[[list[str], list[str]], Awaitable[None]]
+
+
+def weight(member: str, key: str) -> int:
+    digest = hashlib.blake2b(f"{member}/{key}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def owner(members: list[str], key: str) -> str | None:
+    """
+    Rendezvous (highest random weight) hash: every replica computes the same
+    owner from the same member list, and a join or leave only moves the keys
+    of the replica that joined or left.
+    """
+    if not members:
+        return None
+    return max(members, key=lambda member: weight(member, key))
+
+
+class ShardRing:
+    """
+    Splits tenants between operator replicas.
+    Every replica keeps its own Lease in `namespace` renewed; replicas whose
+    lease expired are dropped from the member list. `on_rebalance` runs after
+    the member list changed.
+    """
+
+    def __init__(
+        self,
+        client: AsyncClient,
+        identity: str,
+        namespace: str,
+        on_rebalance: RebalanceCallback | None = None,
+    ):
+        self.client = client
+        self.identity = identity
+        self.namespace = namespace
+        self.on_rebalance = on_rebalance
+        self.members: list[str] = []
+        self.task: asyncio.Task | None = None
+        self.rebalances: set[asyncio.Task] = set()
+
+    @property
+    def lease_name(self) -> str:
+        return f"tenant-operator-{self.identity}"
+
+    def owns(self, key: str) -> bool:
+        return owner(self.members, key) == self.identity
+
+    def gained(self, previous: list[str], key: str) -> bool:
+        """The key belongs to this replica now but did not under `previous`."""
+        return self.owns(key) and owner(previous, key) != self.identity
+
+    async def renew(self):
+        now = datetime.now(timezone.utc)
+        lease = {
+            "apiVersion": "coordination.k8s.io/v1",
+            "kind": "Lease",
+            "metadata": {
+                "name": self.lease_name,
+                "namespace": self.namespace,
+                "labels": {SHARD_LABEL: "member"},
+            },
+            "spec": {
+                "holderIdentity": self.identity,
+                "leaseDurationSeconds": settings.shard_lease_duration,
+                "renewTime": now.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            },
+        }
+        await with_retries(
+            lambda: self.client.coordination.patch_namespaced_lease(
+                name=self.lease_name,
+                namespace=self.namespace,
+                body=lease,
+                field_manager=FIELD_MANAGER,
+                force=True,
+                _content_type="application/apply-patch+yaml",
+            ),
+            attempts=settings.apply_retries,
+            base_delay=settings.retry_base_delay,
+        )
+
+    async def live_members(self) -> list[str]:
+        leases = await self.client.coordination.list_namespaced_lease(
+            namespace=self.namespace, label_selector=f"{SHARD_LABEL}=member"
+        )
+        now = datetime.now(timezone.utc)
+        members = set()
+        for lease in leases.items:
+            spec = lease.spec
+            if not spec.holder_identity or spec.renew_time is None:
+                continue
+            expires = spec.renew_time + timedelta(seconds=spec.lease_duration_seconds)
+            if expires > now:
+                members.add(spec.holder_identity)
+        # our own lease was just renewed, even if the clocks disagree
+        members.add(self.identity)
+        return sorted(members)
+
+    async def refresh(self):
+        await self.renew()
+        members = await self.live_members()
+        if members == self.members:
+            return
+        previous, self.members = self.members, members
+        logger.info("Shard members changed: %s -> %s", previous, members)
+        if previous and self.on_rebalance is not None:
+            # in the background, renewals must not wait for it
+            task = asyncio.create_task(self.on_rebalance(previous, members))
+            self.rebalances.add(task)
+            task.add_done_callback(self.rebalances.discard)
+
+    async def join(self):
+        """
+        Register this replica and load the member list, then keep both fresh.
+        """
+        await self.refresh()
+        self.task = asyncio.create_task(self.run(), name="shard-ring")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(settings.shard_renew_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                # the lease outlives a few failed renewals
+                logger.error("Shard membership refresh failed: %s", e)
+
+    async def leave(self):
+        """
+        Stop renewing and delete the lease so the others take over right away.
+        """
+        tasks = [*self.rebalances, *([self.task] if self.task else [])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.task = None
+        try:
+            await self.client.coordination.delete_namespaced_lease(
+                name=self.lease_name, namespace=self.namespace
+            )
+        except ApiException as e:
+            if e.status != 404:
+                logger.error("Failed to delete shard lease: %s", e)
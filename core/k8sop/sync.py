@@ -0,0 +1,226 @@
+import asyncio
+import logging
+from datetime import datetime
+from functools import partial
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from pydantic import BaseModel
+
+from core.k8sop.cache import Informer
+from core.k8sop.conf import settings
+from core.k8sop.ops.constants import (
+    HELMRELEASE_GROUP,
+    HELMRELEASE_PLURAL,
+    HELMRELEASE_VERSION,
+    TENANT_GROUP,
+    TENANT_PLURAL,
+    TENANT_VERSION,
+)
+from core.tenant.models import Tenant
+from shared.k8sclient import AsyncClient
+
+logger = logging.getLogger(__name__)
+
+Status = Tenant.ResourceStatus
+
+
+class ObservedStatus(BaseModel):
+    status: Status
+    message: str = ""
+    transitioned_at: datetime | None = None
+
+
+def helmrelease_status(helmrelease: dict | None) -> ObservedStatus:
+    """
+    Map the flux HelmRelease conditions to a tenant status.
+    """
+    if helmrelease is None:
+        return ObservedStatus(
+            status=Status.PROVISIONING, message="HelmRelease not created yet"
+        )
+    state = helmrelease.get("status") or {}
+    conditions = {
+        condition["type"]: condition for condition in state.get("conditions") or []
+    }
+    ready = conditions.get("Ready")
+    if ready is None:
+        return ObservedStatus(
+            status=Status.PROVISIONING, message="HelmRelease not reconciled yet"
+        )
+
+    transitioned_at = parse_datetime(ready.get("lastTransitionTime") or "")
+    message = ready.get("message", "")
+    stalled = conditions.get("Stalled", {}).get("status") == "True"
+    if stalled or ready.get("reason", "").endswith("Failed"):
+        status = Status.FAILED
+    elif ready["status"] == "True" and state.get(
+        "observedGeneration", 0
+    ) >= helmrelease["metadata"].get("generation", 0):
+        # a Ready condition from before the last spec change is stale
+        status = Status.READY
+    else:
+        status = Status.PROVISIONING
+    return ObservedStatus(
+        status=status, message=message, transitioned_at=transitioned_at
+    )
+
+
+def chunks(items, size: int):
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class StatusSync:
+    """
+    Watches Tenant CRs and HelmReleases in every namespace and writes the
+    observed tenant status into the database, in batches.
+    Changed tenants are flushed every `sync_flush_interval` seconds, every tenant
+    is recomputed after a relist and every `sync_resync_interval` seconds.
+    """
+
+    def __init__(self, client: AsyncClient):
+        self.tenants = Informer(
+            "tenants",
+            partial(
+                client.crd.list_cluster_custom_object,
+                TENANT_GROUP,
+                TENANT_VERSION,
+                TENANT_PLURAL,
+            ),
+            indexers={"name": lambda obj: obj["metadata"]["name"]},
+        )
+        self.helmreleases = Informer(
+            "helmreleases",
+            partial(
+                client.crd.list_cluster_custom_object,
+                HELMRELEASE_GROUP,
+                HELMRELEASE_VERSION,
+                HELMRELEASE_PLURAL,
+            ),
+            indexers={"tenant": lambda obj: obj.get("spec", {}).get("releaseName")},
+        )
+        self.tenants.add_listener(
+            partial(self.changed, lambda obj: obj["metadata"]["name"])
+        )
+        self.helmreleases.add_listener(
+            partial(self.changed, lambda obj: obj.get("spec", {}).get("releaseName"))
+        )
+        self.dirty: set[str] = set()
+        self.resync = True
+
+    def changed(self, tenant_name, event_type: str, obj: dict | None):
+        if obj is None:
+            # relisted, deletions in between were not seen
+            self.resync = True
+        elif name := tenant_name(obj):
+            self.dirty.add(name)
+
+    def observe(self, name: str) -> ObservedStatus:
+        crs = self.tenants.by_index("name", name)
+        if not crs:
+            return ObservedStatus(status=Status.NOT_CREATED)
+        if crs[0]["metadata"].get("deletionTimestamp"):
+            return ObservedStatus(
+                status=Status.PROVISIONING, message="Tenant is being deleted"
+            )
+        helmreleases = self.helmreleases.by_index("tenant", name)
+        return helmrelease_status(helmreleases[0] if helmreleases else None)
+
+    def snapshot(self, names) -> dict[str, ObservedStatus]:
+        # computed on the event loop, the informers are not thread safe
+        return {name: self.observe(name) for name in names}
+
+    def write(self, observed: dict[str, ObservedStatus], full: bool) -> int:
+        """
+        Persist the observed status of changed tenants with bulk_update.
+        On a full pass rows without a Tenant CR are marked not_created.
+        """
+        close_old_connections()
+        fields = ["resource_status", "status_message", "status_transitioned_at"]
+        queryset = Tenant.objects.only("pk", "name", *fields).order_by("pk")
+        if full:
+            batches = [queryset.iterator(chunk_size=settings.sync_batch_size)]
+        else:
+            batches = (
+                queryset.filter(name__in=names)
+                for names in chunks(observed, settings.sync_batch_size)
+            )
+
+        now = timezone.now()
+        updated = 0
+        changed: list[Tenant] = []
+        for rows in batches:
+            for tenant in rows:
+                state = observed.get(tenant.name) or ObservedStatus(
+                    status=Status.NOT_CREATED
+                )
+                transitioned = tenant.resource_status != state.status
+                if (
+                    not transitioned
+                    and tenant.status_message == state.message
+                    and tenant.status_transitioned_at is not None
+                ):
+                    continue
+                if transitioned or tenant.status_transitioned_at is None:
+                    tenant.status_transitioned_at = state.transitioned_at or now
+                tenant.resource_status = state.status
+                tenant.status_message = state.message
+                changed.append(tenant)
+                if len(changed) >= settings.sync_batch_size:
+                    updated += Tenant.objects.bulk_update(changed, fields)
+                    changed = []
+        if changed:
+            updated += Tenant.objects.bulk_update(changed, fields)
+        return updated
+
+    async def flush(self):
+        full = self.resync
+        if full:
+            self.resync = False
+            self.dirty.clear()
+            observed = self.snapshot(list(self.tenants.indices["name"]))
+        elif self.dirty:
+            observed = self.snapshot(self.dirty)
+            self.dirty = set()
+        else:
+            return
+        try:
+            updated = await sync_to_async(self.write)(observed, full)
+        except Exception as e:
+            logger.error(
+                "Status sync failed to write %d tenant(s): %s", len(observed), e
+            )
+            if full:
+                self.resync = True
+            else:
+                self.dirty.update(observed)
+            return
+        if updated:
+            logger.info("Status sync updated %d tenant(s)", updated)
+
+    async def run(self):
+        informers = [self.tenants, self.helmreleases]
+        tasks = [
+            asyncio.create_task(informer.run(), name=f"sync-{informer.name}")
+            for informer in informers
+        ]
+        try:
+            await asyncio.gather(*(informer.synced.wait() for informer in informers))
+            loop = asyncio.get_running_loop()
+            last_resync = loop.time()
+            while True:
+                if loop.time() - last_resync >= settings.sync_resync_interval:
+                    self.resync = True
+                if self.resync:
+                    last_resync = loop.time()
+                await self.flush()
+                await asyncio.sleep(settings.sync_flush_interval)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
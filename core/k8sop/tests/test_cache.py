@@ -0,0 +1,127 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase, mock
+
+from core.k8sop import cache as cache_module
+from core.k8sop.cache import Informer, by_namespace
+
+
+def obj(name: str, version: str, namespace: str = "acme", **spec) -> dict:
+    return {
+        "metadata": {"name": name, "namespace": namespace, "resourceVersion": version},
+        "spec": spec,
+    }
+
+
+class FakeResponse:
+    def __init__(self, page: dict, status: int = 200):
+        self.page = page
+        self.status = status
+        self.reason = "error"
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def json(self) -> dict:
+        return self.page
+
+
+class FakeWatch:
+    def __init__(self, events: list[dict]):
+        self.events = events
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def stream(self, *args, **kwargs):
+        for event in self.events:
+            yield event
+
+
+class InformerTests(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.list_call = mock.AsyncMock()
+        self.informer = Informer(
+            "things",
+            self.list_call,
+            indexers={
+                "namespace": by_namespace,
+                "owner": lambda obj: obj["spec"].get("owner"),
+            },
+        )
+
+    def test_indexes_follow_updates_and_removals(self):
+        self.informer.upsert(obj("a", "1", owner="x"))
+        self.informer.upsert(obj("b", "2", owner="x"))
+        self.informer.upsert(obj("a", "3", owner="y"))
+        self.assertEqual(
+            [item["metadata"]["name"] for item in self.informer.by_index("owner", "x")],
+            ["b"],
+        )
+        self.assertEqual(self.informer.get("acme", "a")["spec"], {"owner": "y"})
+        self.informer.remove(obj("b", "4"))
+        self.assertEqual(self.informer.by_index("owner", "x"), [])
+        self.assertEqual(len(self.informer.by_index("namespace", "acme")), 1)
+
+    def test_older_versions_never_replace_newer_ones(self):
+        self.informer.upsert(obj("a", "10", owner="new"))
+        self.informer.upsert(obj("a", "9", owner="old"))
+        self.assertEqual(self.informer.get("acme", "a")["spec"], {"owner": "new"})
+        self.assertEqual(self.informer.by_index("owner", "old"), [])
+        # the same version again is the watch echoing a write-through
+        self.informer.upsert(obj("a", "10", owner="echo"))
+        self.assertEqual(self.informer.get("acme", "a")["spec"], {"owner": "echo"})
+
+    def test_non_numeric_versions_are_not_compared(self):
+        self.informer.upsert(obj("a", "b2", owner="first"))
+        self.informer.upsert(obj("a", "a1", owner="second"))
+        self.assertEqual(self.informer.get("acme", "a")["spec"], {"owner": "second"})
+
+    async def test_relist_pages_through_and_replaces_the_store(self):
+        self.informer.upsert(obj("gone", "1"))
+        self.list_call.side_effect = [
+            FakeResponse({"items": [obj("a", "5")], "metadata": {"continue": "t"}}),
+            FakeResponse(
+                {"items": [obj("b", "6")], "metadata": {"resourceVersion": "7"}}
+            ),
+        ]
+        await self.informer.relist()
+        self.assertEqual(sorted(self.informer.store), ["acme/a", "acme/b"])
+        self.assertEqual(self.informer.resource_version, "7")
+        self.assertTrue(self.informer.synced.is_set())
+        self.assertEqual(self.list_call.call_args_list[1].kwargs["_continue"], "t")
+
+    async def test_follow_applies_watch_events(self):
+        self.informer.upsert(obj("a", "1"))
+        self.informer.upsert(obj("b", "1"))
+        events = [
+            {"type": "MODIFIED", "raw_object": obj("a", "2", owner="x")},
+            {"type": "DELETED", "raw_object": obj("b", "3")},
+            {"type": "BOOKMARK", "raw_object": {"metadata": {"resourceVersion": "4"}}},
+        ]
+        seen = []
+        self.informer.add_listener(lambda event_type, obj: seen.append(event_type))
+        with mock.patch.object(
+            cache_module.watch, "Watch", lambda return_type: FakeWatch(events)
+        ):
+            await self.informer.follow()
+        self.assertEqual(list(self.informer.store), ["acme/a"])
+        self.assertEqual(self.informer.resource_version, "4")
+        self.assertEqual(seen, ["MODIFIED", "DELETED"])
+
+    async def test_wait_removed(self):
+        self.informer.upsert(obj("a", "1"))
+        waiter = asyncio.create_task(self.informer.wait_removed("acme", "a", 1))
+        await asyncio.sleep(0)
+        self.informer.remove(obj("a", "2"))
+        await waiter
+        self.assertEqual(self.informer.removal_waiters, {})
+        await self.informer.wait_removed("acme", "missing", 1)
+        self.informer.upsert(obj("b", "1"))
+        with self.assertRaises(TimeoutError):
+            await self.informer.wait_removed("acme", "b", 0.01)
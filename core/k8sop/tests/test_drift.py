@@ -0,0 +1,179 @@
+import io
+import json
+from unittest import mock
+
+from django.test import TestCase
+
+from core.k8sop import drift
+from core.k8sop.conf import settings
+from core.k8sop.ops import release
+from core.k8sop.ops.constants import HELMRELEASE_GROUP, TENANT_GROUP
+from core.k8sop.render import tenant_spec
+from core.tenant.dto import TenantCrd
+from core.tenant.models import Tenant
+from tests.factories import make_tenant
+
+
+class FakeCluster:
+    """Paginated cluster wide LISTs of Tenant CRs and HelmReleases."""
+
+    def __init__(self):
+        self.objects: dict[str, list[dict]] = {TENANT_GROUP: [], HELMRELEASE_GROUP: []}
+        self.crd = mock.Mock()
+        self.crd.list_cluster_custom_object = self.list
+
+    def list(self, group, version, plural, limit, _continue=None):
+        start = int(_continue or 0)
+        items = self.objects[group][start : start + limit]
+        more = start + limit < len(self.objects[group])
+        return {
+            "items": items,
+            "metadata": {"continue": str(start + limit) if more else None},
+        }
+
+    def add_cr(self, tenant: Tenant, **spec) -> dict:
+        cr = TenantCrd.create_from_model(tenant).model_dump()
+        cr["spec"].update(spec)
+        self.objects[TENANT_GROUP].append(cr)
+        return cr
+
+    def add_release(
+        self, tenant: Tenant, generation: int = 1, observed: int = 1, **spec
+    ) -> dict:
+        helmrelease = release.build_helmrelease(
+            tenant_spec(tenant).model_copy(update=spec)
+        )
+        helmrelease["metadata"]["generation"] = generation
+        helmrelease["status"] = {"observedGeneration": observed}
+        self.objects[HELMRELEASE_GROUP].append(helmrelease)
+        return helmrelease
+
+
+@mock.patch.object(settings, "cache_list_page_size", 2)
+class DriftReportTests(TestCase):
+    def setUp(self):
+        self.cluster = FakeCluster()
+        self.report = drift.DriftReport(self.cluster)
+
+    def provisioned(self, name: str, **fields) -> Tenant:
+        return make_tenant(
+            name,
+            backend_image="edu-app:1",
+            resource_status=Tenant.ResourceStatus.READY,
+            **fields,
+        )
+
+    def compare(self, tenant: Tenant) -> drift.TenantDrift:
+        self.report.load()
+        return self.report.compare(tenant)
+
+    def test_matching_tenants_have_no_drift(self):
+        # the api server drops the null configMapReference the admin sends
+        tenant = self.provisioned("acme")
+        cr = self.cluster.add_cr(tenant)
+        del cr["spec"]["configMapReference"]
+        self.cluster.add_release(tenant)
+        self.assertEqual(self.compare(tenant).drift, [])
+
+    def test_provisioned_tenants_without_a_cr(self):
+        tenant = self.provisioned("acme")
+        self.assertEqual(self.compare(tenant).drift, [drift.MISSING_CR])
+        not_created = make_tenant("globex", backend_image="edu-app:1")
+        self.assertEqual(self.report.compare(not_created).drift, [])
+
+    def test_spec_mismatch_lists_every_field(self):
+        tenant = self.provisioned("acme")
+        self.cluster.add_cr(tenant, backendImage="edu-app:0", dbVolumeSize="2Gi")
+        self.cluster.add_release(tenant)
+        report = self.compare(tenant)
+        self.assertEqual(report.drift, [drift.SPEC_MISMATCH])
+        self.assertEqual(
+            report.diffs,
+            {
+                "backendImage": {"db": "edu-app:1", "cluster": "edu-app:0"},
+                "dbVolumeSize": {"db": "1Gi", "cluster": "2Gi"},
+            },
+        )
+
+    def test_cr_only_fields_are_not_a_mismatch(self):
+        tenant = self.provisioned("acme")
+        self.cluster.add_cr(tenant, addedByTheCrd="default")
+        self.cluster.add_release(tenant)
+        self.assertEqual(self.compare(tenant).drift, [])
+
+    def test_missing_release(self):
+        tenant = self.provisioned("acme")
+        self.cluster.add_cr(tenant)
+        self.assertEqual(self.compare(tenant).drift, [drift.MISSING_RELEASE])
+
+    def test_stale_image_chart_and_release(self):
+        tenant = self.provisioned("acme", chart_version="1.4.1")
+        self.cluster.add_cr(tenant)
+        self.cluster.add_release(
+            tenant,
+            generation=3,
+            observed=2,
+            backendImage="edu-app:0",
+            chartVersion="1.3.0",
+        )
+        report = self.compare(tenant)
+        self.assertEqual(
+            report.drift,
+            [drift.STALE_IMAGE, drift.STALE_CHART, drift.STALE_RELEASE],
+        )
+        self.assertEqual(
+            report.diffs["chartVersion"], {"db": "1.4.1", "cluster": "1.3.0"}
+        )
+        self.assertEqual(report.diffs["observedGeneration"], {"db": 3, "cluster": 2})
+
+    def test_rows_that_cant_be_rendered(self):
+        tenant = self.provisioned("acme")
+        tenant.backend_image = None
+        self.assertEqual(self.compare(tenant).drift, [drift.RENDER_ERROR])
+
+    def test_run_reports_drift_and_orphans(self):
+        acme, globex = self.provisioned("acme"), self.provisioned("globex")
+        for tenant in (acme, globex):
+            self.cluster.add_cr(tenant)
+        self.cluster.add_release(acme)
+        self.cluster.add_release(globex, backendImage="edu-app:0")
+        # left in the cluster after the row was deleted
+        gone = Tenant(
+            name="initech",
+            subdomain_prefix="initech",
+            tenant_namespace="initech",
+            db_volume_size="1Gi",
+            backend_image="edu-app:1",
+        )
+        self.cluster.add_cr(gone)
+        self.cluster.add_release(gone)
+        # flux runs other releases too
+        self.cluster.objects[HELMRELEASE_GROUP].append(
+            {
+                "metadata": {"namespace": "shared-db", "name": "shared-postgresql"},
+                "spec": {"chart": {"spec": {"chart": "postgresql"}}},
+            }
+        )
+        out = io.StringIO()
+        counts = self.report.run(Tenant.objects.order_by("name"), out)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(
+            [(line["tenant"], line["drift"]) for line in lines],
+            [
+                ("globex", [drift.STALE_IMAGE]),
+                ("initech", [drift.ORPHANED_CR]),
+                ("initech", [drift.ORPHANED_RELEASE]),
+            ],
+        )
+        self.assertEqual(
+            counts,
+            {
+                "tenants": 2,
+                "in_sync": 1,
+                drift.STALE_IMAGE: 1,
+                drift.ORPHANED_CR: 1,
+                drift.ORPHANED_RELEASE: 1,
+            },
+        )
+        # 3 Tenant CRs and 4 HelmReleases, 2 per page
+        self.assertEqual(self.report.api_calls, 2 + 2)
@@ -0,0 +1,66 @@
+import asyncio
+from types import SimpleNamespace
+from unittest import IsolatedAsyncioTestCase, TestCase, mock
+
+from core.k8sop import idle
+from core.k8sop.cache import Informer
+from core.k8sop.conf import settings
+from core.k8sop.ops import release
+from tests.factories import make_spec
+
+
+@mock.patch.object(settings, "idle_timeout", 900.0)
+class ScaleToZeroValuesTests(TestCase):
+    def test_rendered_for_charts_with_an_activator(self):
+        values = release.build_values(make_spec("acme", chartVersion="1.4.0"))
+        self.assertTrue(values["scaleToZero"]["enabled"])
+
+    def test_not_rendered_for_older_charts(self):
+        for chart_version in ("1.0.2", "1.3.0", ""):
+            values = release.build_values(make_spec("acme", chartVersion=chart_version))
+            self.assertNotIn("scaleToZero", values)
+
+
+@mock.patch.object(settings, "idle_timeout", 0.01)
+class IdleScalerTests(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.helmreleases = Informer("helmreleases", mock.AsyncMock())
+        self.helmreleases.synced.set()
+        patcher = mock.patch.object(
+            idle, "cache", SimpleNamespace(helmreleases=self.helmreleases)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            idle, "ingress_request_counts", mock.AsyncMock(return_value={})
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = mock.Mock()
+        self.client.apps.patch_namespaced_deployment_scale = mock.AsyncMock()
+        self.scaler = idle.IdleScaler(self.client, owns=lambda release: True)
+
+    def add_release(self, name: str, chart_version: str):
+        helmrelease = release.build_helmrelease(make_spec(name, chartVersion="1.4.0"))
+        # scaleToZero left on by an operator that didn't check the chart
+        helmrelease["spec"]["chart"]["spec"]["version"] = chart_version
+        self.helmreleases.upsert(helmrelease)
+
+    async def scan_idle(self) -> list[str]:
+        # the first scan only records the request counters
+        await self.scaler.scan()
+        await asyncio.sleep(0.02)
+        await self.scaler.scan()
+        calls = self.client.apps.patch_namespaced_deployment_scale.call_args_list
+        return sorted(call.kwargs["namespace"] for call in calls)
+
+    async def test_idle_tenants_are_scaled_to_zero(self):
+        self.add_release("acme", "1.4.0")
+        self.assertEqual(await self.scan_idle(), ["acme"])
+        self.assertIn(("acme", "acme"), self.scaler.idle)
+
+    async def test_tenants_on_charts_without_an_activator_are_never_scaled(self):
+        self.add_release("acme", "1.0.2")
+        self.add_release("globex", "1.4.1")
+        self.assertEqual(await self.scan_idle(), ["globex"])
+        self.assertNotIn(("acme", "acme"), self.scaler.idle)
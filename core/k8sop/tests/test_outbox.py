@@ -0,0 +1,202 @@
+import threading
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from kubernetes import client
+
+from core.k8sop import outbox
+from core.k8sop.models import ProvisioningJob
+from core.tenant.models import Tenant
+from tests.factories import make_tenant
+
+Action = ProvisioningJob.Action
+Status = ProvisioningJob.Status
+
+
+def api_error(status: int) -> client.rest.ApiException:
+    return client.rest.ApiException(status=status, reason="error")
+
+
+class EnqueueTests(TestCase):
+    def test_reuses_a_pending_job_of_the_same_action(self):
+        tenant = make_tenant("acme")
+        self.assertEqual(outbox.enqueue([tenant], Action.UPDATE), 1)
+        self.assertEqual(outbox.enqueue([tenant], Action.UPDATE), 0)
+        self.assertEqual(outbox.enqueue([tenant], Action.CREATE), 1)
+        self.assertEqual(ProvisioningJob.objects.count(), 2)
+
+    def test_delete_drops_pending_creates_and_updates(self):
+        tenant = make_tenant("acme")
+        outbox.enqueue([tenant], Action.CREATE)
+        outbox.enqueue([tenant], Action.UPDATE)
+        outbox.enqueue([Tenant(name="acme")], Action.DELETE)
+        job = ProvisioningJob.objects.get()
+        self.assertEqual((job.action, job.tenant), (Action.DELETE, None))
+
+    def test_delay_coalesces_changes_into_one_job(self):
+        tenant = make_tenant("acme")
+        before = timezone.now()
+        outbox.enqueue([tenant], Action.UPDATE, delay=30)
+        outbox.enqueue([tenant], Action.UPDATE, delay=30)
+        job = ProvisioningJob.objects.get()
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=30))
+        # not due before the debounce window is over
+        self.assertEqual(outbox.claim("worker", 10), [])
+
+
+class ClaimTests(TestCase):
+    def test_claims_one_due_job_per_tenant_in_order(self):
+        acme, globex = make_tenant("acme"), make_tenant("globex")
+        first = ProvisioningJob.objects.create(
+            tenant=acme, tenant_name="acme", action=Action.CREATE
+        )
+        ProvisioningJob.objects.create(
+            tenant=acme, tenant_name="acme", action=Action.UPDATE
+        )
+        other = ProvisioningJob.objects.create(
+            tenant=globex, tenant_name="globex", action=Action.CREATE
+        )
+        claimed = outbox.claim("worker", 10)
+        self.assertEqual([job.pk for job in claimed], [first.pk, other.pk])
+        first.refresh_from_db()
+        self.assertEqual(
+            (first.status, first.locked_by, first.attempts),
+            (Status.RUNNING, "worker", 1),
+        )
+
+    def test_skips_tenants_another_worker_is_busy_with(self):
+        acme = make_tenant("acme")
+        ProvisioningJob.objects.create(
+            tenant=acme,
+            tenant_name="acme",
+            action=Action.CREATE,
+            status=Status.RUNNING,
+            locked_at=timezone.now(),
+        )
+        ProvisioningJob.objects.create(
+            tenant=acme, tenant_name="acme", action=Action.UPDATE
+        )
+        self.assertEqual(outbox.claim("worker", 10), [])
+
+    @override_settings(OUTBOX_LEASE_SECONDS=60)
+    def test_reclaims_running_jobs_with_an_expired_lease(self):
+        acme = make_tenant("acme")
+        job = ProvisioningJob.objects.create(
+            tenant=acme,
+            tenant_name="acme",
+            action=Action.CREATE,
+            status=Status.RUNNING,
+            locked_by="dead-worker",
+            locked_at=timezone.now() - timedelta(seconds=61),
+            attempts=1,
+        )
+        [claimed] = outbox.claim("worker", 10)
+        self.assertEqual((claimed.pk, claimed.attempts), (job.pk, 2))
+
+    def test_respects_the_batch_size(self):
+        for name in ("a", "b", "c"):
+            outbox.enqueue([make_tenant(name)], Action.CREATE)
+        self.assertEqual(len(outbox.claim("worker", 2)), 2)
+        self.assertEqual(len(outbox.claim("worker", 2)), 1)
+
+
+@skipUnless(connection.vendor == "postgresql", "SKIP LOCKED needs Postgres")
+class ConcurrentClaimTests(TransactionTestCase):
+    def test_skips_rows_locked_by_another_worker(self):
+        for name in ("acme", "globex"):
+            outbox.enqueue([make_tenant(name)], Action.CREATE)
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            with transaction.atomic():
+                list(
+                    ProvisioningJob.objects.select_for_update().filter(
+                        tenant_name="acme"
+                    )
+                )
+                locked.set()
+                release.wait(10)
+            connection.close()
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        try:
+            locked.wait(10)
+            claimed = outbox.claim("worker", 10)
+        finally:
+            release.set()
+            holder.join()
+        self.assertEqual([job.tenant_name for job in claimed], ["globex"])
+
+
+class FinishTests(TestCase):
+    def setUp(self):
+        self.tenant = make_tenant("acme")
+        outbox.enqueue([self.tenant], Action.CREATE)
+
+    def run_claimed(self, operation) -> ProvisioningJob:
+        [job] = outbox.claim("worker", 10)
+        with mock.patch.dict(outbox.OPERATIONS, {job.action: operation}):
+            outbox.finish([job], [outbox.run_job(job)])
+        return job
+
+    def test_success_deletes_the_job_and_saves_the_tenant_status(self):
+        def create(tenant):
+            tenant.resource_status = Tenant.ResourceStatus.PROVISIONING
+
+        self.run_claimed(create)
+        self.assertFalse(ProvisioningJob.objects.exists())
+        self.tenant.refresh_from_db()
+        self.assertEqual(
+            self.tenant.resource_status, Tenant.ResourceStatus.PROVISIONING
+        )
+
+    def test_already_existing_cr_counts_as_created(self):
+        self.run_claimed(mock.Mock(side_effect=api_error(409)))
+        self.assertFalse(ProvisioningJob.objects.exists())
+
+    @override_settings(OUTBOX_RETRY_BASE_DELAY=10, OUTBOX_RETRY_MAX_DELAY=15)
+    def test_failure_is_retried_with_backoff(self):
+        before = timezone.now()
+        self.run_claimed(mock.Mock(side_effect=api_error(503)))
+        job = ProvisioningJob.objects.get()
+        self.assertEqual(
+            (job.status, job.locked_by, job.last_error),
+            (Status.PENDING, "", "503 error"),
+        )
+        self.assertLessEqual(job.run_after, timezone.now() + timedelta(seconds=10))
+        self.assertGreaterEqual(job.run_after, before)
+        # the backoff doubles per attempt, capped at the max delay
+        with mock.patch("random.uniform", side_effect=lambda low, high: high):
+            self.assertEqual(outbox.retry_delay(1), 10)
+            self.assertEqual(outbox.retry_delay(3), 15)
+
+    def test_permanent_errors_are_not_retried(self):
+        self.run_claimed(mock.Mock(side_effect=api_error(422)))
+        self.assertEqual(ProvisioningJob.objects.get().status, Status.FAILED)
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2, OUTBOX_RETRY_MAX_DELAY=0)
+    def test_gives_up_after_max_attempts(self):
+        failing = mock.Mock(side_effect=api_error(503))
+        self.run_claimed(failing)
+        self.assertEqual(ProvisioningJob.objects.get().status, Status.PENDING)
+        self.run_claimed(failing)
+        job = ProvisioningJob.objects.get()
+        self.assertEqual((job.status, job.attempts), (Status.FAILED, 2))
+
+
+class RunWorkerTests(TestCase):
+    def test_runs_every_due_job_once(self):
+        tenants = [make_tenant(name) for name in ("a", "b", "c")]
+        outbox.enqueue(tenants, Action.CREATE)
+        create = mock.Mock()
+        with mock.patch.dict(outbox.OPERATIONS, {Action.CREATE: create}):
+            outbox.run_worker("worker", threading.Event(), once=True)
+        self.assertEqual(
+            sorted(call.args[0].name for call in create.call_args_list),
+            ["a", "b", "c"],
+        )
+        self.assertFalse(ProvisioningJob.objects.exists())
@@ -0,0 +1,117 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase, mock
+
+from core.k8sop.ops import release
+from tests.factories import make_spec
+
+
+class Steps:
+    """Recording stand-ins for the provisioning steps, `failing` ones raise."""
+
+    def __init__(self, steps: release.Steps, failing=()):
+        self.failing = set(failing)
+        self.events: list[str] = []
+        self.patched = {
+            name: (needs, self.step(name)) for name, (needs, _) in steps.items()
+        }
+
+    def step(self, name: str):
+        async def run(tenant: release.Tenant):
+            self.events.append(f"start {name}")
+            # lets every step that is ready start before any finishes
+            await asyncio.sleep(0)
+            self.events.append(f"end {name}")
+            if name in self.failing:
+                raise RuntimeError(f"{name} is broken")
+
+        return run
+
+    def started(self) -> list[str]:
+        return [event[6:] for event in self.events if event.startswith("start ")]
+
+
+class CreateTenantTests(IsolatedAsyncioTestCase):
+    def patch(self, steps: release.Steps, failing=()) -> Steps:
+        fake = Steps(steps, failing)
+        patcher = mock.patch.dict(steps, fake.patched)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return fake
+
+    async def test_runs_every_step_once_dependencies_first(self):
+        steps = self.patch(release.PROVISION_STEPS)
+        completed = await release.create_tenant(make_spec("acme"))
+        self.assertEqual(completed, {"namespace", "pvc", "helmrelease"})
+        self.assertEqual(steps.events[:2], ["start namespace", "end namespace"])
+        # pvc and helmrelease only need the namespace and run together
+        self.assertEqual(sorted(steps.events[2:4]), ["start helmrelease", "start pvc"])
+
+    async def test_completed_steps_are_skipped(self):
+        steps = self.patch(release.PROVISION_STEPS)
+        completed = await release.create_tenant(
+            make_spec("acme"), completed=["namespace", "pvc", "unknown"]
+        )
+        self.assertEqual(steps.started(), ["helmrelease"])
+        self.assertEqual(completed, {"namespace", "pvc", "helmrelease"})
+
+    async def test_a_failed_step_keeps_the_progress_of_the_others(self):
+        steps = self.patch(release.PROVISION_STEPS, failing={"pvc"})
+        with (
+            self.assertLogs(release.logger, "ERROR"),
+            self.assertRaises(release.ProvisioningError) as caught,
+        ):
+            await release.create_tenant(make_spec("acme"))
+        # helmrelease ran next to the failing pvc step and is not lost
+        self.assertEqual(caught.exception.completed, {"namespace", "helmrelease"})
+        self.assertEqual(list(caught.exception.failed), ["pvc"])
+        self.assertIn("pvc: pvc is broken", str(caught.exception))
+        self.assertEqual(sorted(steps.started()), ["helmrelease", "namespace", "pvc"])
+
+    async def test_a_retry_resumes_after_the_failed_step(self):
+        self.patch(release.PROVISION_STEPS, failing={"namespace"})
+        with (
+            self.assertLogs(release.logger, "ERROR"),
+            self.assertRaises(release.ProvisioningError) as caught,
+        ):
+            await release.create_tenant(make_spec("acme"))
+        # nothing depending on the namespace was started
+        self.assertEqual(caught.exception.completed, set())
+
+        steps = self.patch(release.PROVISION_STEPS)
+        completed = await release.create_tenant(
+            make_spec("acme"), caught.exception.completed
+        )
+        self.assertEqual(sorted(steps.started()), ["helmrelease", "namespace", "pvc"])
+        self.assertEqual(completed, {"namespace", "pvc", "helmrelease"})
+
+        steps = self.patch(release.PROVISION_STEPS)
+        await release.create_tenant(make_spec("acme"), completed)
+        self.assertEqual(steps.started(), [])
+
+    async def test_shared_db_tenants_get_their_database_before_the_release(self):
+        steps = self.patch(release.SHARED_PROVISION_STEPS)
+        spec = make_spec("acme", dbMode="shared")
+        completed = await release.create_tenant(spec)
+        self.assertEqual(completed, {"namespace", "database", "helmrelease"})
+        self.assertEqual(
+            sorted(steps.events[:2]), ["start database", "start namespace"]
+        )
+        self.assertEqual(steps.events[-2:], ["start helmrelease", "end helmrelease"])
+
+    async def test_no_release_without_the_shared_database(self):
+        steps = self.patch(release.SHARED_PROVISION_STEPS, failing={"database"})
+        with (
+            self.assertLogs(release.logger, "ERROR"),
+            self.assertRaises(release.ProvisioningError) as caught,
+        ):
+            await release.create_tenant(make_spec("acme", dbMode="shared"))
+        self.assertEqual(caught.exception.completed, {"namespace"})
+        self.assertNotIn("helmrelease", steps.started())
+
+    async def test_cancellation_is_not_recorded_as_a_failed_step(self):
+        async def cancelled(tenant):
+            raise asyncio.CancelledError
+
+        with mock.patch.dict(release.PROVISION_STEPS, {"namespace": ((), cancelled)}):
+            with self.assertRaises(asyncio.CancelledError):
+                await release.create_tenant(make_spec("acme"))
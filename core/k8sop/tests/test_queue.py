@@ -0,0 +1,130 @@
+import asyncio
+import time
+from unittest import IsolatedAsyncioTestCase
+
+from core.k8sop.queue import RateLimiter, ReconcileQueue
+
+
+class ReconcileQueueTests(IsolatedAsyncioTestCase):
+    def make_queue(self, reconcile, workers: int = 4) -> ReconcileQueue:
+        queue = ReconcileQueue(
+            reconcile,
+            workers=workers,
+            limiter=RateLimiter(0, 1),
+            backoff_base=0.01,
+            backoff_max=0.05,
+        )
+        queue.start()
+        self.addAsyncCleanup(queue.stop)
+        return queue
+
+    async def drain(self, queue: ReconcileQueue):
+        async with asyncio.timeout(5):
+            while queue.depth or queue.in_flight:
+                await asyncio.sleep(0.005)
+
+    async def test_keeps_only_the_latest_item_per_key(self):
+        reconciled = []
+
+        async def reconcile(item):
+            reconciled.append(item)
+
+        queue = self.make_queue(reconcile)
+        for item in ("a1", "a2", "a3"):
+            queue.submit("a", item)
+        queue.submit("b", "b1")
+        await self.drain(queue)
+        self.assertEqual(sorted(reconciled), ["a3", "b1"])
+
+    async def test_items_submitted_while_running_are_reconciled_after(self):
+        reconciled, started, release = [], asyncio.Event(), asyncio.Event()
+
+        async def reconcile(item):
+            started.set()
+            await release.wait()
+            reconciled.append(item)
+
+        queue = self.make_queue(reconcile)
+        queue.submit("a", 1)
+        await started.wait()
+        queue.submit("a", 2)
+        queue.submit("a", 3)
+        release.set()
+        await self.drain(queue)
+        self.assertEqual(reconciled, [1, 3])
+
+    async def test_a_key_is_never_reconciled_twice_at_once(self):
+        running, overlaps = set(), []
+
+        async def reconcile(item):
+            key, _ = item
+            overlaps.append(key in running)
+            running.add(key)
+            await asyncio.sleep(0.01)
+            running.discard(key)
+
+        queue = self.make_queue(reconcile, workers=8)
+        for index in range(20):
+            queue.submit(f"t{index % 3}", (f"t{index % 3}", index))
+            await asyncio.sleep(0.002)
+        await self.drain(queue)
+        self.assertTrue(overlaps)
+        self.assertNotIn(True, overlaps)
+
+    async def test_failures_are_retried_with_backoff(self):
+        attempts = []
+
+        async def reconcile(item):
+            attempts.append(time.monotonic())
+            if len(attempts) < 3:
+                raise RuntimeError("api unavailable")
+
+        queue = self.make_queue(reconcile)
+        queue.submit("a", 1)
+        await self.drain(queue)
+        self.assertEqual(len(attempts), 3)
+        # 0.01s, then 0.02s
+        self.assertGreaterEqual(attempts[2] - attempts[1], 0.02)
+        self.assertEqual(queue.failures, {})
+
+    async def test_forget_drops_pending_and_backoff(self):
+        reconciled = []
+
+        async def reconcile(item):
+            reconciled.append(item)
+            raise RuntimeError("api unavailable")
+
+        queue = self.make_queue(reconcile)
+        queue.submit("a", 1)
+        async with asyncio.timeout(5):
+            while not queue.delayed:
+                await asyncio.sleep(0.005)
+        queue.forget("a")
+        await asyncio.sleep(0.1)
+        self.assertEqual((reconciled, queue.depth), ([1], 0))
+
+
+class RateLimiterTests(IsolatedAsyncioTestCase):
+    async def test_burst_then_refill_at_the_rate(self):
+        limiter = RateLimiter(rate=20, burst=2)
+        started = time.monotonic()
+        for _ in range(2):
+            await limiter.acquire()
+        self.assertLess(time.monotonic() - started, 0.02)
+        for _ in range(2):
+            await limiter.acquire()
+        # two more tokens at 20/s
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    async def test_tokens_never_exceed_the_burst(self):
+        limiter = RateLimiter(rate=1000, burst=3)
+        await asyncio.sleep(0.05)
+        await limiter.acquire()
+        self.assertLessEqual(limiter.tokens, 2)
+
+    async def test_non_positive_rate_disables_limiting(self):
+        limiter = RateLimiter(rate=0, burst=1)
+        started = time.monotonic()
+        for _ in range(100):
+            await limiter.acquire()
+        self.assertLess(time.monotonic() - started, 0.05)
@@ -0,0 +1,100 @@
+import io
+from contextlib import redirect_stdout
+import json
+
+import yaml
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from core.k8sop.ops import release
+from core.k8sop.render import render_tenants, tenant_spec
+from core.tenant.models import Tenant
+from tests.factories import make_tenant
+
+
+def kinds(manifests: list[dict]) -> list[str]:
+    return [manifest["kind"] for manifest in manifests]
+
+
+class RenderTenantsTests(TestCase):
+    def setUp(self):
+        make_tenant("acme", backend_image="edu-app:1", chart_version="1.4.1")
+        make_tenant(
+            "globex",
+            backend_image="edu-app:1",
+            chart_version="1.4.1",
+            min_replicas=2,
+            max_replicas=4,
+        )
+
+    def render(self, **kwargs) -> tuple[str, int, int]:
+        out = io.StringIO()
+        rendered, failed = render_tenants(Tenant.objects.order_by("pk"), out, **kwargs)
+        return out.getvalue(), rendered, failed
+
+    def test_jsonl_has_one_compact_document_per_line(self):
+        output, rendered, failed = self.render()
+        self.assertEqual((rendered, failed), (2, 0))
+        lines = output.splitlines()
+        self.assertNotIn(" ", lines[0])
+        manifests = [json.loads(line) for line in lines]
+        self.assertEqual(
+            kinds(manifests),
+            ["Namespace", "PersistentVolumeClaim", "HelmRelease"] * 2,
+        )
+
+    def test_manifests_match_what_the_operator_creates(self):
+        output, _, _ = self.render()
+        manifests = [json.loads(line) for line in output.splitlines()]
+        spec = tenant_spec(Tenant.objects.get(name="globex"))
+        self.assertEqual(manifests[3:], release.build_manifests(spec))
+        values = manifests[5]["spec"]["values"]
+        self.assertTrue(values["backendApp"]["autoscaling"]["enabled"])
+
+    def test_yaml_is_a_multi_document_stream(self):
+        output, _, _ = self.render(fmt="yaml")
+        manifests = list(yaml.safe_load_all(output))
+        self.assertEqual(len(manifests), 6)
+        self.assertEqual(manifests[2]["metadata"]["namespace"], "acme")
+
+    def test_helmrelease_only(self):
+        output, rendered, _ = self.render(helmrelease_only=True)
+        manifests = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual(rendered, 2)
+        self.assertEqual(kinds(manifests), ["HelmRelease", "HelmRelease"])
+
+    def test_rows_that_cant_be_rendered_are_skipped(self):
+        # saved past model validation, the operator would refuse the spec too
+        make_tenant(
+            "initech", backend_image="edu-app:1", min_replicas=3, max_replicas=2
+        )
+        with self.assertLogs("core.k8sop.render", "ERROR") as logs:
+            output, rendered, failed = self.render(helmrelease_only=True)
+        self.assertEqual((rendered, failed), (2, 1))
+        self.assertIn("initech", logs.output[0])
+        names = [json.loads(line)["metadata"]["name"] for line in output.splitlines()]
+        self.assertNotIn("initech", " ".join(names))
+
+
+class RenderCommandTests(TestCase):
+    def test_renders_the_selected_tenants(self):
+        make_tenant("acme", backend_image="edu-app:1")
+        make_tenant("globex", backend_image="edu-app:1")
+        out, err = io.StringIO(), io.StringIO()
+        # manifests are streamed to the process' stdout, not the command's
+        with redirect_stdout(out):
+            call_command("opertator", "render", "--tenant", "globex", stderr=err)
+        namespaces = [
+            json.loads(line)["metadata"]["name"]
+            for line in out.getvalue().splitlines()
+            if json.loads(line)["kind"] == "Namespace"
+        ]
+        self.assertEqual(namespaces, ["globex"])
+        self.assertIn("Rendered 1 tenant(s)", err.getvalue())
+
+    def test_fails_when_a_tenant_cant_be_rendered(self):
+        make_tenant("acme", backend_image="edu-app:1", min_replicas=3, max_replicas=2)
+        with self.assertLogs("core.k8sop.render", "ERROR"):
+            with self.assertRaisesMessage(CommandError, "1 tenant(s) could not"):
+                with redirect_stdout(io.StringIO()):
+                    call_command("opertator", "render")
@@ -0,0 +1,199 @@
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import TransactionTestCase
+
+from core.k8sop.conf import settings
+from core.k8sop.ops import release
+from core.k8sop.rollout import Rollout, RolloutError
+from core.tenant.models import Tenant
+from tests.factories import make_spec, make_tenant
+
+
+def helmrelease(
+    chart_version: str,
+    image: str,
+    generation: int = 1,
+    observed: int = 1,
+    ready: str = "True",
+    reason: str = "UpgradeSucceeded",
+) -> dict:
+    return {
+        "metadata": {"generation": generation},
+        "spec": {
+            "chart": {"spec": {"version": chart_version}},
+            "values": {"backendApp": {"image": image}},
+        },
+        "status": {
+            "observedGeneration": observed,
+            "conditions": [
+                {"type": "Ready", "status": ready, "reason": reason, "message": reason}
+            ],
+        },
+    }
+
+
+class FakeFlux:
+    """
+    The operator and flux in one: a patched Tenant CR becomes a HelmRelease
+    on the new chart version and image, Ready right away unless the tenant
+    is in `failing` and the version is `bad_version`.
+    """
+
+    def __init__(self, failing=(), bad_version: str = "1.4.1"):
+        self.failing = set(failing)
+        self.bad_version = bad_version
+        self.helmreleases: dict[str, dict] = {}
+        self.patches: list[tuple[str, dict]] = []
+
+    async def patch_tenant(self, *, name: str, body: dict, **kwargs):
+        spec = body["spec"]
+        self.patches.append((name, spec))
+        generation = self.helmreleases.get(name, {}).get("metadata", {})
+        generation = generation.get("generation", 0) + 1
+        failed = name in self.failing and spec["chartVersion"] == self.bad_version
+        self.helmreleases[name] = helmrelease(
+            spec["chartVersion"],
+            spec["backendImage"],
+            generation=generation,
+            observed=generation,
+            ready="False" if failed else "True",
+            reason="UpgradeFailed" if failed else "UpgradeSucceeded",
+        )
+
+    async def get_helmrelease(self, spec: release.Tenant) -> dict | None:
+        return self.helmreleases.get(spec.tenantName)
+
+
+@mock.patch.object(settings, "rollout_poll_interval", 0.0)
+class RolloutTests(TransactionTestCase):
+    def setUp(self):
+        self.tenants = [
+            make_tenant(
+                name,
+                chart_version="1.3.0",
+                backend_image="edu-app:1",
+                resource_status=Tenant.ResourceStatus.READY,
+            )
+            for name in ("a", "b", "c", "d")
+        ]
+
+    async def run_rollout(self, flux: FakeFlux, **options) -> dict[str, str]:
+        rollout = Rollout(
+            chart_version="1.4.1", image="edu-app:2", sizes="1,2", timeout=1, **options
+        )
+        rollout.get_helmrelease = flux.get_helmrelease
+        client = mock.Mock()
+        client.crd.patch_namespaced_custom_object = flux.patch_tenant
+        with mock.patch.object(release, "client", client):
+            results = await rollout.run(self.tenants)
+        self.assertEqual(
+            [progress.tenant for progress in results], ["a", "b", "c", "d"]
+        )
+        return {progress.tenant: progress.phase for progress in results}
+
+    def versions(self) -> dict[str, tuple[str, str]]:
+        return {
+            tenant.name: (tenant.chart_version, tenant.backend_image)
+            for tenant in Tenant.objects.order_by("name")
+        }
+
+    async def test_moves_every_tenant(self):
+        flux = FakeFlux()
+        phases = await self.run_rollout(flux)
+        self.assertEqual(set(phases.values()), {"ready"})
+        versions = await sync_to_async(self.versions)()
+        self.assertEqual(set(versions.values()), {("1.4.1", "edu-app:2")})
+
+    async def test_halts_and_rolls_back_when_too_many_fail(self):
+        flux = FakeFlux(failing={"b"})
+        phases = await self.run_rollout(flux)
+        # wave 1: a, wave 2: b and c, d never started
+        self.assertEqual(
+            phases,
+            {"a": "rolled_back", "b": "rolled_back", "c": "rolled_back", "d": "halted"},
+        )
+        versions = await sync_to_async(self.versions)()
+        self.assertEqual(set(versions.values()), {("1.3.0", "edu-app:1")})
+        self.assertEqual(
+            flux.patches[-1][1], {"chartVersion": "1.3.0", "backendImage": "edu-app:1"}
+        )
+        self.assertNotIn("d", [name for name, _ in flux.patches])
+
+    async def test_keeps_going_within_max_failures(self):
+        flux = FakeFlux(failing={"b"})
+        phases = await self.run_rollout(flux, max_failures=1)
+        self.assertEqual(
+            phases, {"a": "ready", "b": "failed", "c": "ready", "d": "ready"}
+        )
+
+    async def test_leaves_moved_tenants_without_rollback(self):
+        flux = FakeFlux(failing={"b"})
+        phases = await self.run_rollout(flux, rollback=False)
+        self.assertEqual(
+            phases, {"a": "ready", "b": "failed", "c": "ready", "d": "halted"}
+        )
+        versions = await sync_to_async(self.versions)()
+        self.assertEqual(versions["a"], ("1.4.1", "edu-app:2"))
+        self.assertEqual(versions["d"], ("1.3.0", "edu-app:1"))
+
+
+@mock.patch.object(settings, "rollout_poll_interval", 0.0)
+class WaitReadyTests(TransactionTestCase):
+    spec = make_spec("acme", chartVersion="1.4.1", backendImage="edu-app:2")
+
+    async def wait_ready(self, *states: dict | None, timeout: float = 0.2):
+        """Wait on a HelmRelease going through `states`, the last one stays."""
+        rollout = Rollout(timeout=timeout)
+        states = list(states)
+
+        async def get_helmrelease(spec):
+            return states.pop(0) if len(states) > 1 else states[0]
+
+        rollout.get_helmrelease = get_helmrelease
+        await rollout.wait_ready(self.spec)
+
+    async def test_ready_once_flux_runs_the_new_version_and_image(self):
+        await self.wait_ready(
+            None,
+            helmrelease("1.3.0", "edu-app:1"),
+            helmrelease("1.4.1", "edu-app:2", generation=2, observed=1),
+            helmrelease("1.4.1", "edu-app:2", generation=2, observed=2),
+        )
+
+    async def test_a_ready_release_on_the_old_version_is_not_ready(self):
+        for stale in (
+            helmrelease("1.3.0", "edu-app:2"),
+            helmrelease("1.4.1", "edu-app:1"),
+        ):
+            with self.assertRaises(TimeoutError):
+                await self.wait_ready(stale)
+
+    async def test_a_ready_condition_from_the_previous_generation_is_not_ready(self):
+        with self.assertRaises(TimeoutError):
+            await self.wait_ready(
+                helmrelease("1.4.1", "edu-app:2", generation=2, observed=1)
+            )
+
+    async def test_a_failed_upgrade_of_the_latest_generation_fails(self):
+        failed = helmrelease(
+            "1.4.1", "edu-app:2", ready="False", reason="UpgradeFailed"
+        )
+        with self.assertRaisesMessage(RolloutError, "UpgradeFailed"):
+            await self.wait_ready(failed)
+
+
+class RolloutFeatureTests(TransactionTestCase):
+    def setUp(self):
+        self.tenant = make_tenant(
+            "acme", db_mode=Tenant.DbMode.SHARED, chart_version="1.4.1"
+        )
+
+    async def test_tenants_the_chart_cant_run_fail_untouched(self):
+        rollout = Rollout(chart_version="1.2.0")
+        with mock.patch.object(rollout, "apply") as apply:
+            progress = await rollout.move(self.tenant, wave=1)
+        apply.assert_not_called()
+        self.assertEqual(progress.phase, "failed")
+        self.assertIn("shared_db needs 1.3.0", progress.error)
+        self.assertEqual(rollout.moved, [])
@@ -0,0 +1,79 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest import IsolatedAsyncioTestCase, TestCase, mock
+
+from core.k8sop.shards import ShardRing, owner
+
+KEYS = [f"tenant-{index}" for index in range(1000)]
+
+
+class OwnerTests(TestCase):
+    def test_same_owner_whatever_the_member_order(self):
+        members = ["op-a", "op-b", "op-c"]
+        for key in KEYS[:100]:
+            self.assertEqual(owner(members, key), owner(members[::-1], key))
+
+    def test_no_owner_without_members(self):
+        self.assertIsNone(owner([], "acme"))
+
+    def test_keys_are_spread_evenly(self):
+        members = ["op-a", "op-b", "op-c", "op-d"]
+        counts = Counter(owner(members, key) for key in KEYS)
+        self.assertEqual(set(counts), set(members))
+        for count in counts.values():
+            self.assertAlmostEqual(count, len(KEYS) / len(members), delta=60)
+
+    def test_a_join_only_moves_keys_to_the_new_member(self):
+        before, after = ["op-a", "op-b", "op-c"], ["op-a", "op-b", "op-c", "op-d"]
+        moved = [key for key in KEYS if owner(before, key) != owner(after, key)]
+        self.assertTrue(moved)
+        self.assertEqual({owner(after, key) for key in moved}, {"op-d"})
+
+    def test_a_leave_only_moves_the_keys_of_the_leaving_member(self):
+        before, after = ["op-a", "op-b", "op-c"], ["op-a", "op-c"]
+        moved = [key for key in KEYS if owner(before, key) != owner(after, key)]
+        self.assertEqual(moved, [key for key in KEYS if owner(before, key) == "op-b"])
+
+
+class ShardRingTests(IsolatedAsyncioTestCase):
+    def make_ring(self, identity: str, members: list[str]) -> ShardRing:
+        ring = ShardRing(mock.Mock(), identity, "tenant-system")
+        ring.members = members
+        return ring
+
+    def test_every_key_is_owned_by_exactly_one_replica(self):
+        members = ["op-a", "op-b", "op-c"]
+        rings = [self.make_ring(member, members) for member in members]
+        for key in KEYS[:100]:
+            self.assertEqual(sum(ring.owns(key) for ring in rings), 1)
+
+    def test_gained_keys_are_the_ones_taken_over_from_a_leaver(self):
+        previous = ["op-a", "op-b"]
+        ring = self.make_ring("op-a", ["op-a"])
+        gained = [key for key in KEYS if ring.gained(previous, key)]
+        self.assertEqual(
+            gained, [key for key in KEYS if owner(previous, key) == "op-b"]
+        )
+        # nothing is gained when the members did not change
+        self.assertFalse(any(ring.gained(["op-a"], key) for key in KEYS))
+
+    async def test_members_with_expired_leases_are_dropped(self):
+        now = datetime.now(timezone.utc)
+
+        def lease(holder: str, renewed_ago: int):
+            spec = SimpleNamespace(
+                holder_identity=holder,
+                renew_time=now - timedelta(seconds=renewed_ago),
+                lease_duration_seconds=15,
+            )
+            return SimpleNamespace(spec=spec)
+
+        ring = self.make_ring("op-a", [])
+        ring.client.coordination.list_namespaced_lease = mock.AsyncMock(
+            return_value=SimpleNamespace(
+                items=[lease("op-c", 5), lease("op-b", 60), lease("op-d", 0)]
+            )
+        )
+        # our own lease counts even when the listing missed it
+        self.assertEqual(await ring.live_members(), ["op-a", "op-c", "op-d"])
@@ -0,0 +1,158 @@
+from unittest import IsolatedAsyncioTestCase, TestCase, mock
+
+from psycopg import errors
+
+from core.k8sop.conf import settings
+from core.k8sop.ops import shared_db
+
+# postgres truncates identifiers to 63 bytes (NAMEDATALEN - 1)
+MAX_IDENTIFIER = 63
+
+
+@mock.patch.object(settings, "shared_db_password_key", "secret")
+class NamingTests(TestCase):
+    def test_names_are_valid_unquoted_identifiers(self):
+        for tenant in ("acme", "Acme Corp", 'x"; DROP DATABASE postgres; --', "ü" * 10):
+            name = shared_db.database_name(tenant)
+            self.assertRegex(name, r"^tenant_[a-z0-9_]+_[0-9a-f]{8}$")
+
+    def test_long_names_fit_the_identifier_limit(self):
+        name = shared_db.database_name("a" * 300)
+        self.assertEqual(len(name), MAX_IDENTIFIER - 1)
+        self.assertNotEqual(name, shared_db.database_name("a" * 301))
+
+    def test_names_differing_in_case_or_punctuation_stay_apart(self):
+        names = {
+            shared_db.database_name(tenant)
+            for tenant in ("acme", "ACME", "a-cme", "a.cme")
+        }
+        self.assertEqual(len(names), 4)
+
+    def test_passwords_are_stable_per_tenant_and_key(self):
+        password = shared_db.password("acme")
+        self.assertEqual(password, shared_db.password("acme"))
+        self.assertNotEqual(password, shared_db.password("globex"))
+        self.assertRegex(password, r"^[0-9a-f]{32}$")
+        with mock.patch.object(settings, "shared_db_password_key", "rotated"):
+            self.assertNotEqual(password, shared_db.password("acme"))
+
+    def test_no_password_without_a_key(self):
+        with mock.patch.object(settings, "shared_db_password_key", ""):
+            with self.assertRaisesRegex(ValueError, "PASSWORD_KEY is not set"):
+                shared_db.db_values("acme")
+
+    def test_backends_connect_through_the_pooler(self):
+        values = shared_db.db_values("acme")
+        name = shared_db.database_name("acme")
+        self.assertEqual(
+            values,
+            {
+                "host": settings.shared_db_host,
+                "port": settings.shared_db_port,
+                "username": name,
+                "password": shared_db.password("acme"),
+                "database": name,
+            },
+        )
+
+
+class FakeConnection:
+    """Records the statements, `roles` / `databases` are what already exists."""
+
+    def __init__(self, roles=(), databases=(), fail_with=None):
+        self.roles = set(roles)
+        self.databases = set(databases)
+        self.fail_with = fail_with or {}
+        self.statements: list[str] = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def execute(self, query, params=()):
+        statement = query if isinstance(query, str) else query.as_string(None)
+        self.statements.append(statement)
+        for prefix, error in self.fail_with.items():
+            if statement.startswith(prefix):
+                raise error
+        existing = {"pg_roles": self.roles, "pg_database": self.databases}
+        found = any(
+            table in statement and params[0] in names
+            for table, names in existing.items()
+        )
+        cursor = mock.Mock()
+        cursor.fetchone = mock.AsyncMock(return_value=(1,) if found else None)
+        return cursor
+
+    def ddl(self) -> list[str]:
+        # the statements without the existence checks
+        return [
+            statement
+            for statement in self.statements
+            if not statement.startswith("SELECT")
+        ]
+
+
+class ProvisioningTests(IsolatedAsyncioTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(settings, "shared_db_password_key", "secret")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.name = shared_db.database_name("acme")
+        self.password = shared_db.password("acme")
+
+    async def run_with(self, conn: FakeConnection, call):
+        with mock.patch.object(shared_db, "connect", mock.AsyncMock(return_value=conn)):
+            await call("acme")
+        return conn.ddl()
+
+    async def test_creates_the_role_and_database(self):
+        statements = await self.run_with(FakeConnection(), shared_db.ensure_database)
+        self.assertEqual(
+            statements,
+            [
+                f"CREATE ROLE \"{self.name}\" LOGIN PASSWORD '{self.password}'",
+                f'CREATE DATABASE "{self.name}" OWNER "{self.name}"',
+                f'REVOKE CONNECT ON DATABASE "{self.name}" FROM PUBLIC',
+            ],
+        )
+
+    async def test_reprovisioning_only_resets_the_password(self):
+        conn = FakeConnection(roles={self.name}, databases={self.name})
+        statements = await self.run_with(conn, shared_db.ensure_database)
+        self.assertEqual(
+            statements,
+            [
+                f"ALTER ROLE \"{self.name}\" LOGIN PASSWORD '{self.password}'",
+                f'REVOKE CONNECT ON DATABASE "{self.name}" FROM PUBLIC',
+            ],
+        )
+
+    async def test_objects_created_concurrently_are_not_an_error(self):
+        conn = FakeConnection(
+            fail_with={
+                "CREATE ROLE": errors.DuplicateObject(),
+                "CREATE DATABASE": errors.DuplicateDatabase(),
+            }
+        )
+        statements = await self.run_with(conn, shared_db.ensure_database)
+        self.assertTrue(statements[-1].startswith("REVOKE CONNECT"))
+
+    async def test_passwords_are_quoted_as_literals(self):
+        with mock.patch.object(shared_db, "password", return_value="it's"):
+            statements = await self.run_with(
+                FakeConnection(), shared_db.ensure_database
+            )
+        self.assertIn("PASSWORD 'it''s'", statements[0])
+
+    async def test_drop_closes_sessions_and_removes_the_role(self):
+        statements = await self.run_with(FakeConnection(), shared_db.drop_database)
+        self.assertEqual(
+            statements,
+            [
+                f'DROP DATABASE IF EXISTS "{self.name}" WITH (FORCE)',
+                f'DROP ROLE IF EXISTS "{self.name}"',
+            ],
+        )
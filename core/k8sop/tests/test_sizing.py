@@ -0,0 +1,97 @@
+from unittest import TestCase
+
+from pydantic import ValidationError
+
+from core.k8sop.ops import release
+from core.k8sop.ops.sizing import ComputeResources, TenantSizing
+from tests.factories import make_spec
+
+
+class TenantSizingTests(TestCase):
+    def test_defaults_render_a_single_replica_without_autoscaling(self):
+        values = TenantSizing().backend_values()
+        self.assertEqual(values["replicaCount"], 1)
+        self.assertFalse(values["autoscaling"]["enabled"])
+
+    def test_autoscaling_between_min_and_max_replicas(self):
+        sizing = TenantSizing(
+            minReplicas=2,
+            maxReplicas=5,
+            targetCPUUtilization=60,
+            targetMemoryUtilization=75,
+        )
+        values = sizing.backend_values()
+        self.assertEqual(values["replicaCount"], 2)
+        self.assertEqual(
+            values["autoscaling"],
+            {
+                "enabled": True,
+                "minReplicas": 2,
+                "maxReplicas": 5,
+                "targetCPUUtilizationPercentage": 60,
+                "targetMemoryUtilizationPercentage": 75,
+            },
+        )
+
+    def test_equal_min_and_max_replicas_pin_the_replica_count(self):
+        values = TenantSizing(minReplicas=3, maxReplicas=3).backend_values()
+        self.assertEqual(values["replicaCount"], 3)
+        self.assertFalse(values["autoscaling"]["enabled"])
+
+    def test_max_replicas_below_min_replicas_is_rejected(self):
+        with self.assertRaisesRegex(ValidationError, "maxReplicas must not be lower"):
+            TenantSizing(minReplicas=3, maxReplicas=2)
+
+    def test_utilization_targets_are_percentages(self):
+        for field, value in (
+            ("targetCPUUtilization", 0),
+            ("targetCPUUtilization", 101),
+            ("targetMemoryUtilization", 0),
+            ("minReplicas", 0),
+        ):
+            with self.subTest(field=field, value=value):
+                with self.assertRaises(ValidationError):
+                    TenantSizing(**{field: value})
+
+    def test_memory_limit_equals_the_request_and_cpu_is_unlimited(self):
+        resources = ComputeResources(cpu="500m", memory="1Gi").render()
+        self.assertEqual(
+            resources,
+            {
+                "requests": {"cpu": "500m", "memory": "1Gi"},
+                "limits": {"memory": "1Gi"},
+            },
+        )
+
+
+class SizingValuesTests(TestCase):
+    def test_backend_values_carry_the_sizing_profile(self):
+        spec = make_spec(
+            "acme",
+            sizing={
+                "minReplicas": 2,
+                "maxReplicas": 4,
+                "backend": {"cpu": "1", "memory": "2Gi"},
+            },
+        )
+        backend = release.build_values(spec)["backendApp"]
+        self.assertEqual(backend["image"], "edu-app:1")
+        self.assertEqual(backend["replicaCount"], 2)
+        self.assertTrue(backend["autoscaling"]["enabled"])
+        self.assertEqual(backend["autoscaling"]["maxReplicas"], 4)
+        self.assertEqual(backend["resources"]["limits"], {"memory": "2Gi"})
+
+    def test_postgres_resources_sit_next_to_its_volume(self):
+        spec = make_spec("acme", sizing={"postgres": {"cpu": "2", "memory": "4Gi"}})
+        primary = release.build_values(spec)["postgresql"]["primary"]
+        self.assertEqual(
+            primary["resources"]["requests"], {"cpu": "2", "memory": "4Gi"}
+        )
+        self.assertEqual(primary["size"], "1Gi")
+
+    def test_specs_without_sizing_get_the_defaults(self):
+        values = release.build_values(make_spec("acme"))
+        self.assertEqual(values["backendApp"]["replicaCount"], 1)
+        self.assertEqual(
+            values["postgresql"]["primary"]["resources"]["limits"], {"memory": "512Mi"}
+        )
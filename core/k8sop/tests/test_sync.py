@@ -0,0 +1,163 @@
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.test import TestCase
+
+from core.k8sop.sync import ObservedStatus, Status, StatusSync, helmrelease_status
+from core.tenant.models import Tenant
+from tests.factories import make_tenant
+
+TRANSITION = "2026-10-17T12:00:00Z"
+
+
+def helmrelease(
+    ready: str | None = "True",
+    reason: str = "UpgradeSucceeded",
+    generation: int = 1,
+    observed: int = 1,
+    stalled: bool = False,
+    name: str = "acme",
+) -> dict:
+    conditions = []
+    if ready is not None:
+        conditions.append(
+            {
+                "type": "Ready",
+                "status": ready,
+                "reason": reason,
+                "message": f"{reason} message",
+                "lastTransitionTime": TRANSITION,
+            }
+        )
+    if stalled:
+        conditions.append({"type": "Stalled", "status": "True"})
+    return {
+        "metadata": {
+            "name": f"{name}-release",
+            "namespace": name,
+            "generation": generation,
+            "resourceVersion": "1",
+        },
+        "spec": {"releaseName": name},
+        "status": {"observedGeneration": observed, "conditions": conditions},
+    }
+
+
+def tenant_cr(name: str, deleting: bool = False) -> dict:
+    metadata = {"name": name, "namespace": "tenant-system", "resourceVersion": "1"}
+    if deleting:
+        metadata["deletionTimestamp"] = TRANSITION
+    return {"metadata": metadata, "spec": {"tenantName": name}}
+
+
+class HelmReleaseStatusTests(TestCase):
+    def test_missing_or_unreconciled_releases_are_provisioning(self):
+        for hr in (None, helmrelease(ready=None)):
+            self.assertEqual(helmrelease_status(hr).status, Status.PROVISIONING)
+
+    def test_ready_release(self):
+        observed = helmrelease_status(helmrelease())
+        self.assertEqual(
+            observed,
+            ObservedStatus(
+                status=Status.READY,
+                message="UpgradeSucceeded message",
+                transitioned_at=datetime(2026, 10, 17, 12, tzinfo=timezone.utc),
+            ),
+        )
+
+    def test_ready_from_before_the_last_spec_change_is_stale(self):
+        stale = helmrelease(generation=2, observed=1)
+        self.assertEqual(helmrelease_status(stale).status, Status.PROVISIONING)
+
+    def test_failed_reasons_and_stalled_releases_fail(self):
+        for hr in (
+            helmrelease(ready="False", reason="InstallFailed"),
+            helmrelease(ready="False", reason="UpgradeFailed", generation=2),
+            helmrelease(ready="False", reason="Progressing", stalled=True),
+        ):
+            self.assertEqual(helmrelease_status(hr).status, Status.FAILED)
+
+    def test_not_ready_without_a_failure_is_provisioning(self):
+        progressing = helmrelease(ready="False", reason="Progressing")
+        self.assertEqual(helmrelease_status(progressing).status, Status.PROVISIONING)
+
+
+class StatusSyncTests(TestCase):
+    def setUp(self):
+        self.sync = StatusSync(mock.Mock())
+
+    def test_observes_tenants_from_their_cr_and_helmrelease(self):
+        self.sync.tenants.upsert(tenant_cr("acme"))
+        self.sync.tenants.upsert(tenant_cr("globex", deleting=True))
+        self.sync.helmreleases.upsert(helmrelease(name="acme"))
+        observed = self.sync.snapshot(["acme", "globex", "initech"])
+        self.assertEqual(
+            {name: state.status for name, state in observed.items()},
+            {
+                "acme": Status.READY,
+                "globex": Status.PROVISIONING,
+                "initech": Status.NOT_CREATED,
+            },
+        )
+        self.assertEqual(observed["globex"].message, "Tenant is being deleted")
+
+    def test_watch_events_mark_their_tenant_dirty(self):
+        self.sync.resync = False
+        self.sync.tenants.notify("MODIFIED", tenant_cr("acme"))
+        self.sync.helmreleases.notify("ADDED", helmrelease(name="globex"))
+        self.assertEqual(self.sync.dirty, {"acme", "globex"})
+        self.sync.helmreleases.notify("RELISTED", None)
+        self.assertTrue(self.sync.resync)
+
+    def test_writes_changed_tenants_only(self):
+        make_tenant("acme", resource_status=Status.PROVISIONING)
+        transitioned = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        make_tenant(
+            "globex",
+            resource_status=Status.READY,
+            status_message="ok",
+            status_transitioned_at=transitioned,
+        )
+        ready = helmrelease_status(helmrelease())
+        updated = self.sync.write(
+            {
+                "acme": ready,
+                "globex": ObservedStatus(status=Status.READY, message="ok"),
+            },
+            full=False,
+        )
+        self.assertEqual(updated, 1)
+        acme = Tenant.objects.get(name="acme")
+        self.assertEqual(
+            (acme.resource_status, acme.status_message, acme.status_transitioned_at),
+            (Status.READY, ready.message, ready.transitioned_at),
+        )
+        globex = Tenant.objects.get(name="globex")
+        self.assertEqual(globex.status_transitioned_at, transitioned)
+
+    def test_a_full_pass_marks_tenants_without_a_cr_not_created(self):
+        make_tenant("acme", resource_status=Status.READY)
+        make_tenant("globex", resource_status=Status.READY)
+        ready = ObservedStatus(status=Status.READY)
+        self.assertEqual(self.sync.write({"acme": ready}, full=True), 2)
+        self.assertEqual(
+            dict(Tenant.objects.values_list("name", "resource_status")),
+            {"acme": Status.READY, "globex": Status.NOT_CREATED},
+        )
+        # a partial write leaves tenants it didn't observe alone
+        Tenant.objects.filter(name="globex").update(resource_status=Status.READY)
+        self.sync.write({"acme": ready}, full=False)
+        self.assertEqual(
+            Tenant.objects.get(name="globex").resource_status, Status.READY
+        )
+
+    async def test_failed_writes_are_retried_on_the_next_flush(self):
+        self.sync.resync = False
+        self.sync.dirty = {"acme"}
+        with (
+            mock.patch.object(self.sync, "write", side_effect=RuntimeError("db down")),
+            self.assertLogs("core.k8sop.sync", "ERROR"),
+        ):
+            await self.sync.flush()
+        self.assertEqual(self.sync.dirty, {"acme"})
@@ -0,0 +1,159 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase, mock
+
+import kopf
+from kubernetes_asyncio.client.rest import ApiException
+from psycopg import OperationalError
+
+from core.k8sop.cache import Informer, TenantStateCache
+from core.k8sop.conf import settings
+from core.k8sop.ops import release, shared_db, teardown
+from core.k8sop.ops.constants import PVC_NAME
+from tests.bench.operator_bench import load_operator, tenant_spec
+from tests.factories import make_spec
+
+
+@mock.patch.object(settings, "teardown_poll_interval", 0.0)
+class TeardownTenantTests(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = mock.Mock()
+        # each object is still there on the first read, gone on the second
+        self.client.k8s.read_namespaced_persistent_volume_claim = mock.AsyncMock(
+            side_effect=[None, ApiException(status=404)]
+        )
+        self.client.k8s.read_namespace = mock.AsyncMock(
+            side_effect=[None, ApiException(status=404)]
+        )
+        self.delete_namespace = mock.AsyncMock(return_value=True)
+        self.drop_database = mock.AsyncMock()
+        for patcher in (
+            mock.patch.object(release, "client", self.client),
+            mock.patch.object(release, "delete_tenant_ns", self.delete_namespace),
+            mock.patch.object(shared_db, "drop_database", self.drop_database),
+            mock.patch.object(teardown, "cache", TenantStateCache()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.phases: list[str] = []
+
+    async def teardown(
+        self, spec=None, timeout: float = 1
+    ) -> teardown.TeardownProgress:
+        return await teardown.teardown_tenant(
+            spec or make_spec("acme"),
+            on_progress=lambda progress: self.phases.append(progress.phase),
+            timeout=timeout,
+        )
+
+    async def test_waits_for_the_pvc_then_the_namespace(self):
+        progress = await self.teardown()
+        self.assertTrue(progress.ok)
+        self.assertEqual(
+            self.phases, ["deleting", "terminating", "storage_released", "deleted"]
+        )
+        self.assertEqual(self.client.k8s.read_namespace.await_count, 2)
+        self.drop_database.assert_not_awaited()
+
+    async def test_follows_the_watch_cache_when_it_runs(self):
+        cache = TenantStateCache()
+        cache.namespaces = Informer("namespaces", mock.AsyncMock())
+        cache.pvcs = Informer("pvcs", mock.AsyncMock())
+        cache.tasks = [mock.Mock()]
+        pvc = {"metadata": {"namespace": "acme", "name": PVC_NAME}}
+        namespace = {"metadata": {"name": "acme"}}
+        for informer, obj in ((cache.pvcs, pvc), (cache.namespaces, namespace)):
+            informer.upsert(obj)
+            informer.synced.set()
+
+        async def terminate():
+            await asyncio.sleep(0.01)
+            cache.pvcs.remove(pvc)
+            await asyncio.sleep(0.01)
+            cache.namespaces.remove(namespace)
+
+        with mock.patch.object(teardown, "cache", cache):
+            _, progress = await asyncio.gather(terminate(), self.teardown())
+        self.assertTrue(progress.ok)
+        self.client.k8s.read_namespace.assert_not_awaited()
+
+    async def test_a_namespace_that_is_already_gone_is_done(self):
+        self.delete_namespace.return_value = False
+        progress = await self.teardown()
+        self.assertEqual(self.phases, ["deleting", "deleted"])
+        self.assertTrue(progress.ok)
+
+    async def test_times_out_naming_what_it_waited_for(self):
+        self.client.k8s.read_namespace = mock.AsyncMock(return_value=None)
+        progress = await self.teardown(timeout=0.05)
+        self.assertEqual(progress.phase, "failed")
+        self.assertEqual(progress.error, "namespace not gone after 0.05s")
+
+    async def test_api_errors_fail_the_tenant(self):
+        self.delete_namespace.side_effect = ApiException(status=403, reason="Forbidden")
+        progress = await self.teardown()
+        self.assertEqual((progress.phase, progress.error), ("failed", "403 Forbidden"))
+
+    async def test_shared_tenants_drop_their_database_once_the_namespace_is_gone(self):
+        progress = await self.teardown(make_spec("acme", dbMode="shared"))
+        self.assertTrue(progress.ok)
+        self.client.k8s.read_namespaced_persistent_volume_claim.assert_not_awaited()
+        self.drop_database.assert_awaited_once_with("acme")
+        self.assertEqual(
+            self.phases, ["deleting", "terminating", "storage_released", "deleted"]
+        )
+
+    async def test_a_failed_drop_fails_the_tenant(self):
+        self.drop_database.side_effect = OperationalError("connection refused")
+        progress = await self.teardown(make_spec("acme", dbMode="shared"))
+        self.assertEqual(progress.phase, "failed")
+        self.assertIn("connection refused", progress.error)
+
+
+class TeardownTenantsTests(IsolatedAsyncioTestCase):
+    async def test_waves_run_one_after_another_within_the_concurrency(self):
+        running, peak, events = set(), [0], []
+
+        async def fake_teardown(spec, on_progress, timeout):
+            running.add(spec.tenantName)
+            peak[0] = max(peak[0], len(running))
+            events.append(f"start {spec.tenantName}")
+            await asyncio.sleep(0.01)
+            running.discard(spec.tenantName)
+            events.append(f"end {spec.tenantName}")
+            return teardown.TeardownProgress(
+                tenant=spec.tenantName, namespace=spec.namespace, phase="deleted"
+            )
+
+        specs = [make_spec(f"t{index}") for index in range(5)]
+        with mock.patch.object(teardown, "teardown_tenant", fake_teardown):
+            results = await teardown.teardown_tenants(
+                specs, concurrency=2, wave_size=3, wave_pause=0
+            )
+        self.assertEqual(
+            [progress.tenant for progress in results], [f"t{i}" for i in range(5)]
+        )
+        self.assertEqual(peak[0], 2)
+        # the second wave starts once every tenant of the first is gone
+        first_wave_done = max(events.index(f"end t{i}") for i in range(3))
+        self.assertGreater(events.index("start t3"), first_wave_done)
+
+
+class DeleteHandlerTests(IsolatedAsyncioTestCase):
+    @mock.patch.object(settings, "teardown_retry_delay", 7.0)
+    async def test_failed_teardowns_are_retried_after_the_configured_delay(self):
+        operator = load_operator()
+        failed = teardown.TeardownProgress(
+            tenant="bench-00000", namespace="bench-00000", phase="failed"
+        )
+        with mock.patch.object(
+            teardown, "teardown_tenant", mock.AsyncMock(return_value=failed)
+        ):
+            with self.assertRaises(kopf.TemporaryError) as caught:
+                await operator.delete_tenant(
+                    spec=tenant_spec(0),
+                    name="bench-00000",
+                    meta={},
+                    status={},
+                    namespace="tenant-system",
+                )
+        self.assertEqual(caught.exception.delay, 7.0)
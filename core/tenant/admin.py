@@ -1,11 +1,16 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db import transaction
+from core.k8sop import outbox
+from core.k8sop.models import ProvisioningJob
 from .models import Tenant
-from .dto import TenantCrd
-from kubernetes import client, config
-from django.db.models import JSONField
+from .pagination import EstimatedCountPaginator
+from django.db.models import JSONField, OuterRef, Subquery
+from django.urls import reverse
 from django_json_widget.widgets import JSONEditorWidget
 import logging
 from django.utils.html import format_html
+from urllib.parse import urlencode
+from shared import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -18,99 +23,91 @@ class TenantAdmin(admin.ModelAdmin):
     list_display = (
         "name",
         "resource_status",
+        "provisioning_job",
+        "status_transitioned_at",
         "http_url",
         "subdomain_prefix",
         "db_volume_size",
+        "db_mode",
         "tenant_namespace",
         "backend_image",
-        "config_map_reference",
+        "chart_version",
         "created_at",
         "updated_at",
     )
     search_fields = ("name", "subdomain_prefix", "tenant_namespace")
-    list_filter = ("created_at", "updated_at")
+    list_filter = ("resource_status", "chart_version", "created_at", "updated_at")
+    readonly_fields = ("status_transitioned_at", "status_message")
+    # the changelist stays fast on large tables: no JSON column, no exact
+    # COUNT(*) of the whole table and no second count for the filtered total
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     actions = ["create_resource", "delete_resource", "update_resource"]
 
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        # actions are POSTed to the changelist and do need the JSON
+        match = request.resolver_match
+        if request.method == "GET" and match and match.url_name.endswith("_changelist"):
+            # the tenant's latest outbox job, one indexed subquery per column
+            jobs = ProvisioningJob.objects.filter(tenant_name=OuterRef("name")).order_by("-pk")
+            queryset = queryset.defer("config_map_reference").annotate(
+                job_action=Subquery(jobs.values("action")[:1]),
+                job_status=Subquery(jobs.values("status")[:1]),
+                job_error=Subquery(jobs.values("last_error")[:1]),
+            )
+        return queryset
+
     def http_url(self, obj):
         return format_html('<a href="http://{}" target="_blank">{}</a>', obj.domain, obj.domain)
 
-    def get_k8s_config(self):
-        try:
-            config.load_incluster_config()
-        except Exception:
-            config.load_kube_config()
-
-        return client.CustomObjectsApi()
+    @admin.display(description="provisioning")
+    def provisioning_job(self, obj):
+        # jobs are deleted once they succeed, no job means nothing is left to do
+        status = getattr(obj, "job_status", None)
+        if status is None:
+            return "-"
+        return format_html(
+            '<a href="{}?{}" title="{}">{} {}</a>',
+            reverse("admin:k8sop_provisioningjob_changelist"),
+            urlencode({"q": obj.name}),
+            obj.job_error,
+            obj.job_action,
+            status,
+        )
 
-    def create_k8s_resource(self, obj: Tenant):
-        crd_api = self.get_k8s_config()
-        tenant_crd: TenantCrd = TenantCrd.create_from_model(obj)
-        try:
-            response = crd_api.create_namespaced_custom_object(
-                group="saas.com",
-                version="v1",
-                namespace=tenant_crd.metadata.namespace,
-                plural="tenants",  # Must match the `plural` defined in CRD
-                body=tenant_crd.model_dump(),
+    def enqueue(self, request, queryset, action: str, verb: str):
+        # the worker (`manage.py opertator worker`) talks to the cluster
+        with transaction.atomic():
+            queued = outbox.enqueue(queryset, action)
+        self.message_user(
+            request,
+            format_html(
+                '{} tenant(s) queued to be {}, follow them under <a href="{}">provisioning jobs</a>.',
+                queued,
+                verb,
+                reverse("admin:k8sop_provisioningjob_changelist"),
+            ),
+            messages.SUCCESS,
+        )
+        failed = ProvisioningJob.objects.filter(
+            tenant_name__in=queryset.values("name"), status=ProvisioningJob.Status.FAILED
+        ).count()
+        if failed:
+            self.message_user(
+                request,
+                f"{failed} failed job(s) of the selected tenants need a retry.",
+                messages.WARNING,
             )
-            logger.info("Tenant CR created for tenant '%s'", obj.name)
-            logger.debug(response)
-            obj.resource_status = Tenant.ResourceStatus.READY
-        except client.rest.ApiException as e:
-            logger.error("Error creating Tenant CR for tenant '%s': %s", obj.name, e)
 
+    @metrics.track("admin", "create_resource")
     def create_resource(self, request, queryset):
-        for obj in queryset:
-            self.create_k8s_resource(obj)
-            obj.save()
+        self.enqueue(request, queryset, ProvisioningJob.Action.CREATE, "created")
 
+    @metrics.track("admin", "delete_resource")
     def delete_resource(self, request, queryset):
-        crd_api = self.get_k8s_config()
-
-        for obj in queryset:
-            try:
-                tenant_crd: TenantCrd = TenantCrd.create_from_model(obj)
-                crd_api.delete_namespaced_custom_object(
-                    group="saas.com",
-                    version="v1",
-                    namespace=tenant_crd.metadata.namespace,
-                    plural="tenants",
-                    name=obj.name,
-                )
-                logger.info("Tenant CR deleted for tenant '%s'", obj.name)
-                obj.resource_status = Tenant.ResourceStatus.NOT_CREATED
-            except client.rest.ApiException as e:
-                logger.error(
-                    "Error deleting Tenant CR for tenant '%s': %s", obj.name, e
-                )
-            obj.save()
+        self.enqueue(request, queryset, ProvisioningJob.Action.DELETE, "deleted")
 
+    @metrics.track("admin", "update_resource")
     def update_resource(self, request, queryset):
-        crd_api = self.get_k8s_config()
-
-        for obj in queryset:
-            try:
-                tenant_crd: TenantCrd = TenantCrd.create_from_model(obj)
-                existing_tenant_config = crd_api.get_namespaced_custom_object(
-                    group="saas.com",
-                    version="v1",
-                    namespace=tenant_crd.metadata.namespace,
-                    plural="tenants",
-                    name=tenant_crd.metadata.name,
-                )
-                existing_tenant_config["spec"] = tenant_crd.spec.model_dump()
-                print(tenant_crd)
-                crd_api.patch_namespaced_custom_object(
-                    group="saas.com",
-                    version="v1",
-                    namespace=tenant_crd.metadata.namespace,
-                    plural="tenants",
-                    name=obj.name,
-                    body=existing_tenant_config,
-                )
-                logger.info("Tenant CR updated for tenant '%s'", obj.name)
-            except client.rest.ApiException as e:
-                print(e)
-                logger.error(
-                    "Error updating Tenant CR for tenant '%s': %s", obj.name, e
-                )
+        self.enqueue(request, queryset, ProvisioningJob.Action.UPDATE, "updated")
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from core.k8sop.ops.sizing import ComputeResources, TenantSizing
 from .models import Tenant
 
 class TenantMeta(BaseModel):
@@ -10,8 +11,11 @@ class TenantSpec(BaseModel):
     domain: str
     dbVolumeSize: str
     tenantNamespace: str
-    configMapReference: dict
+    configMapReference: dict | None = None
     backendImage: str
+    sizing: TenantSizing = TenantSizing()
+    dbMode: str = "dedicated"
+    chartVersion: str = ""
 
 class TenantCrd(BaseModel):
     apiVersion: str = "saas.com/v1"
@@ -30,5 +34,15 @@ class TenantCrd(BaseModel):
                 tenantNamespace=tenant.tenant_namespace,
                 configMapReference=tenant.config_map_reference,
                 backendImage=tenant.backend_image,
+                dbMode=tenant.db_mode,
+                chartVersion=tenant.chart_version,
+                sizing=TenantSizing(
+                    minReplicas=tenant.min_replicas,
+                    maxReplicas=tenant.max_replicas,
+                    targetCPUUtilization=tenant.target_cpu_utilization,
+                    targetMemoryUtilization=tenant.target_memory_utilization,
+                    backend=ComputeResources(cpu=tenant.backend_cpu, memory=tenant.backend_memory),
+                    postgres=ComputeResources(cpu=tenant.db_cpu, memory=tenant.db_memory),
+                ),
             ),
         )
@@ -0,0 +1,36 @@
+# Generated by Django 6.1.2 on 2026-10-17 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tenant", "0003_tenant_backend_image"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tenant",
+            name="status_message",
+            field=models.TextField(blank=True, default=""),
+        ),
+        migrations.AddField(
+            model_name="tenant",
+            name="status_transitioned_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="tenant",
+            name="resource_status",
+            field=models.CharField(
+                choices=[
+                    ("not_created", "Not Created"),
+                    ("provisioning", "Provisioning"),
+                    ("ready", "Ready"),
+                    ("failed", "Failed"),
+                ],
+                default="not_created",
+                max_length=20,
+            ),
+        ),
+    ]
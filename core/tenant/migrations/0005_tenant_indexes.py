@@ -0,0 +1,30 @@
+# Generated by Django 6.1.2 on 2026-10-17 18:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tenant", "0004_tenant_status_sync"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="tenant",
+            index=models.Index(
+                fields=["resource_status"], name="tenant_resource_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tenant",
+            index=models.Index(fields=["created_at"], name="tenant_created_at_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="tenant",
+            index=models.Index(fields=["updated_at"], name="tenant_updated_at_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="tenant",
+            index=models.Index(fields=["name"], name="tenant_name_idx"),
+        ),
+    ]
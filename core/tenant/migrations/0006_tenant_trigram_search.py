@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# The admin searches with icontains, which Postgres runs as
+# UPPER(column::text) LIKE UPPER('%term%'). Trigram indexes on that expression
+# let those searches use an index. Other databases are left alone.
+SEARCH_COLUMNS = ("name", "subdomain_prefix", "tenant_namespace")
+
+
+def index_name(column: str) -> str:
+    return f"tenant_{column}_trgm_idx"
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name(column)} "
+            f"ON tenant_tenant USING gin ((UPPER({column}::text)) gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name(column)}")
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("tenant", "0005_tenant_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
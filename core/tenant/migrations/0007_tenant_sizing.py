@@ -0,0 +1,106 @@
+# Generated by Django 6.1.2 on 2026-10-17 18:19
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tenant", "0006_tenant_trigram_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tenant",
+            name="backend_cpu",
+            field=models.CharField(
+                default="250m",
+                max_length=10,
+                validators=[
+                    django.core.validators.RegexValidator(
+                        "^[0-9]+(\\.[0-9]+)?(m|k|M|G|T|Ki|Mi|Gi|Ti)?$",
+                        "Enter a kubernetes quantity, e.g. 250m or 512Mi.",
+                    )
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="tenant",
+            name="backend_memory",
+            field=models.CharField(
+                default="256Mi",
+                max_length=10,
+                validators=[
+                    django.core.validators.RegexValidator(
+                        "^[0-9]+(\\.[0-9]+)?(m|k|M|G|T|Ki|Mi|Gi|Ti)?$",
+                        "Enter a kubernetes quantity, e.g. 250m or 512Mi.",
+                    )
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="tenant",
+            name="db_cpu",
+            field=models.CharField(
+                default="250m",
+                max_length=10,
+                validators=[
+                    django.core.validators.RegexValidator(
+                        "^[0-9]+(\\.[0-9]+)?(m|k|M|G|T|Ki|Mi|Gi|Ti)?$",
+                        "Enter a kubernetes quantity, e.g. 250m or 512Mi.",
+                    )
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="tenant",
+            name="db_memory",
+            field=models.CharField(
+                default="512Mi",
+                max_length=10,
+                validators=[
+                    django.core.validators.RegexValidator(
+                        "^[0-9]+(\\.[0-9]+)?(m|k|M|G|T|Ki|Mi|Gi|Ti)?$",
+                        "Enter a kubernetes quantity, e.g. 250m or 512Mi.",
+                    )
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="tenant",
+            name="max_replicas",
+            field=models.PositiveSmallIntegerField(
+                default=1, validators=[django.core.validators.MinValueValidator(1)]
+            ),
+        ),
+        migrations.AddField(
+            model_name="tenant",
+            name="min_replicas",
+            field=models.PositiveSmallIntegerField(
+                default=1, validators=[django.core.validators.MinValueValidator(1)]
+            ),
+        ),
+        migrations.AddField(
+            model_name="tenant",
+            name="target_cpu_utilization",
+            field=models.PositiveSmallIntegerField(
+                default=80,
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(100),
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="tenant",
+            name="target_memory_utilization",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                null=True,
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(100),
+                ],
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.1.2 on 2026-10-17 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tenant", "0007_tenant_sizing"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tenant",
+            name="db_mode",
+            field=models.CharField(
+                choices=[("dedicated", "Dedicated"), ("shared", "Shared")],
+                default="dedicated",
+                max_length=10,
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.1.2 on 2026-10-17 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tenant", "0008_tenant_db_mode"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tenant",
+            name="chart_version",
+            field=models.CharField(blank=True, default="", max_length=20),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+from core.k8sop.ops.constants import DEFAULT_CHART_VERSION
+
+# Provisioned tenants run the chart version from before versions were pinned.
+# Pin them to it so they only move through `opertator rollout`, and queue an
+# update so their Tenant CRs carry the version as well. Tenants that run
+# nothing yet are provisioned like new ones, on the default version.
+PINNED_CHART_VERSION = "1.0.2"
+BATCH_SIZE = 1000
+
+
+def pin_chart_version(apps, schema_editor):
+    Tenant = apps.get_model("tenant", "Tenant")
+    ProvisioningJob = apps.get_model("k8sop", "ProvisioningJob")
+    unpinned = Tenant.objects.filter(chart_version="")
+    provisioned = unpinned.exclude(resource_status="not_created")
+    jobs = [
+        ProvisioningJob(tenant=tenant, tenant_name=tenant.name, action="update")
+        for tenant in provisioned.only("pk", "name").iterator(chunk_size=BATCH_SIZE)
+    ]
+    provisioned.update(chart_version=PINNED_CHART_VERSION)
+    unpinned.filter(resource_status="not_created").update(
+        chart_version=DEFAULT_CHART_VERSION
+    )
+    ProvisioningJob.objects.bulk_create(jobs, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("k8sop", "0001_provisioning_job"),
+        ("tenant", "0009_tenant_chart_version"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="tenant",
+            name="chart_version",
+            field=models.CharField(blank=True, default="1.4.0", max_length=20),
+        ),
+        migrations.RunPython(pin_chart_version, migrations.RunPython.noop),
+    ]
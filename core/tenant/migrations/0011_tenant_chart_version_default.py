@@ -0,0 +1,22 @@
+# Generated by Django 6.1.2 on 2026-10-17 18:54
+
+import core.tenant.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tenant", "0010_pin_chart_version"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="tenant",
+            name="chart_version",
+            field=models.CharField(
+                blank=True,
+                default=core.tenant.models.default_chart_version,
+                max_length=20,
+            ),
+        ),
+    ]
@@ -1,22 +1,98 @@
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
 from django.db import models
 
+from core.k8sop.ops.charts import chart_versions, check_features
+from core.k8sop.ops.constants import DEFAULT_CHART_VERSION
+
+# kubernetes resource quantity, e.g. 250m, 0.5, 512Mi, 2Gi
+quantity_validator = RegexValidator(
+    r'^[0-9]+(\.[0-9]+)?(m|k|M|G|T|Ki|Mi|Gi|Ti)?$', 'Enter a kubernetes quantity, e.g. 250m or 512Mi.'
+)
+percentage_validators = [MinValueValidator(1), MaxValueValidator(100)]
+# the sizing profile, rendered by tenant-stack 1.1.0 and later
+SIZING_FIELDS = (
+    'min_replicas', 'max_replicas', 'target_cpu_utilization', 'target_memory_utilization',
+    'backend_cpu', 'backend_memory', 'db_cpu', 'db_memory',
+)
+
+
+def default_chart_version():
+    # a callable, so bumping the chart doesn't need a migration
+    return DEFAULT_CHART_VERSION
+
 # Create your models here.
 class Tenant(models.Model):
     class ResourceStatus(models.TextChoices):
         NOT_CREATED = 'not_created'
+        PROVISIONING = 'provisioning'
         READY = 'ready'
+        FAILED = 'failed'
+
+    class DbMode(models.TextChoices):
+        DEDICATED = 'dedicated'
+        SHARED = 'shared'
     name = models.CharField(max_length=255)
     subdomain_prefix = models.CharField(max_length=255, unique=True)
     db_volume_size = models.CharField(max_length=10)
+    # dedicated: the chart's own postgres on a PVC, shared: a database in the shared cluster
+    db_mode = models.CharField(max_length=10, choices=DbMode.choices, default=DbMode.DEDICATED)
     tenant_namespace = models.CharField(max_length=50, unique=True)
     config_map_reference = models.JSONField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     resource_status = models.CharField(max_length=20, choices=ResourceStatus.choices, default=ResourceStatus.NOT_CREATED)
     backend_image = models.CharField(max_length=255, null=True, blank=True)
+    # tenant-stack version, moved by `manage.py opertator rollout`; blank runs the pre-pinning version
+    chart_version = models.CharField(max_length=20, blank=True, default=default_chart_version)
+    # observed by `manage.py opertator sync` from the Tenant CR and its HelmRelease
+    status_transitioned_at = models.DateTimeField(null=True, blank=True)
+    status_message = models.TextField(blank=True, default="")
+    # sizing profile: the backend is autoscaled between min and max replicas when they
+    # differ, cpu / memory are the backend and postgres requests (memory is also the limit)
+    min_replicas = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)])
+    max_replicas = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)])
+    target_cpu_utilization = models.PositiveSmallIntegerField(default=80, validators=percentage_validators)
+    target_memory_utilization = models.PositiveSmallIntegerField(null=True, blank=True, validators=percentage_validators)
+    backend_cpu = models.CharField(max_length=10, default='250m', validators=[quantity_validator])
+    backend_memory = models.CharField(max_length=10, default='256Mi', validators=[quantity_validator])
+    db_cpu = models.CharField(max_length=10, default='250m', validators=[quantity_validator])
+    db_memory = models.CharField(max_length=10, default='512Mi', validators=[quantity_validator])
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["resource_status"], name="tenant_resource_status_idx"),
+            models.Index(fields=["created_at"], name="tenant_created_at_idx"),
+            models.Index(fields=["updated_at"], name="tenant_updated_at_idx"),
+            models.Index(fields=["name"], name="tenant_name_idx"),
+        ]
 
     def __str__(self):
         return self.name
+
+    def clean(self):
+        if self.max_replicas is not None and self.min_replicas is not None and self.max_replicas < self.min_replicas:
+            raise ValidationError({'max_replicas': 'Must not be lower than min replicas.'})
+        if self.pk and self.resource_status != self.ResourceStatus.NOT_CREATED:
+            # the data is not moved between modes
+            provisioned_mode = Tenant.objects.filter(pk=self.pk).values_list('db_mode', flat=True).first()
+            if provisioned_mode and provisioned_mode != self.db_mode:
+                raise ValidationError({'db_mode': "Can't be changed once the tenant resources exist."})
+        if self.chart_version and self.chart_version not in chart_versions():
+            raise ValidationError({'chart_version': 'Not a tenant-stack version in index.yaml / chart-release/.'})
+        try:
+            check_features(self.chart_version, self.chart_features())
+        except ValueError as e:
+            raise ValidationError({'chart_version': str(e)})
+
+    def chart_features(self) -> set[str]:
+        """The tenant-stack features this tenant's values need, see core/k8sop/ops/charts.py."""
+        features = set()
+        if any(getattr(self, field) != self._meta.get_field(field).get_default() for field in SIZING_FIELDS):
+            features.add('sizing')
+        if self.db_mode == self.DbMode.SHARED:
+            features.add('shared_db')
+        return features
     
     @property
     def domain(self):
@@ -0,0 +1,93 @@
+import logging
+
+from kubernetes import client
+
+from core.k8sop.ops.constants import TENANT_GROUP, TENANT_PLURAL, TENANT_VERSION
+from shared.k8sclient import get_client
+from .dto import TenantCrd, TenantMeta
+from .models import Tenant
+
+logger = logging.getLogger(__name__)
+
+
+def create_tenant_cr(tenant: Tenant):
+    tenant_crd: TenantCrd = TenantCrd.create_from_model(tenant)
+    response = get_client().crd.create_namespaced_custom_object(
+        group=TENANT_GROUP,
+        version=TENANT_VERSION,
+        namespace=tenant_crd.metadata.namespace,
+        plural=TENANT_PLURAL,
+        body=tenant_crd.model_dump(),
+    )
+    logger.info("Tenant CR created for tenant '%s'", tenant.name)
+    logger.debug(response)
+    # `manage.py opertator sync` moves it on once the HelmRelease reports back
+    tenant.resource_status = Tenant.ResourceStatus.PROVISIONING
+
+
+def delete_tenant_cr(tenant: Tenant):
+    # only the name is needed, the row may already be gone
+    metadata = TenantMeta(name=tenant.name)
+    get_client().crd.delete_namespaced_custom_object(
+        group=TENANT_GROUP,
+        version=TENANT_VERSION,
+        namespace=metadata.namespace,
+        plural=TENANT_PLURAL,
+        name=tenant.name,
+    )
+    logger.info("Tenant CR deleted for tenant '%s'", tenant.name)
+    tenant.resource_status = Tenant.ResourceStatus.NOT_CREATED
+
+
+def spec_patch(desired: dict, current: dict, top_level: bool = True) -> dict:
+    """
+    Merge patch turning `current` into `desired`: changed fields only, nested
+    objects are diffed field by field and a null removes a field. Fields only
+    on the CR are kept at the top level, they are CRD defaults.
+    """
+    patch = {}
+    for field, value in desired.items():
+        old = current.get(field)
+        if isinstance(value, dict) and isinstance(old, dict):
+            nested = spec_patch(value, old, top_level=False)
+            if nested:
+                patch[field] = nested
+        elif value != old:
+            patch[field] = value
+    if not top_level:
+        patch.update({field: None for field in current.keys() - desired.keys()})
+    return patch
+
+
+def update_tenant_cr(tenant: Tenant):
+    tenant_crd: TenantCrd = TenantCrd.create_from_model(tenant)
+    crd = get_client().crd
+    current = crd.get_namespaced_custom_object(
+        group=TENANT_GROUP,
+        version=TENANT_VERSION,
+        namespace=tenant_crd.metadata.namespace,
+        plural=TENANT_PLURAL,
+        name=tenant_crd.metadata.name,
+    )
+    # only what changed, an untouched CR doesn't wake the operator
+    patch = spec_patch(tenant_crd.spec.model_dump(), current.get("spec") or {})
+    if not patch:
+        logger.info("Tenant CR of tenant '%s' is up to date", tenant.name)
+        return
+    crd.patch_namespaced_custom_object(
+        group=TENANT_GROUP,
+        version=TENANT_VERSION,
+        namespace=tenant_crd.metadata.namespace,
+        plural=TENANT_PLURAL,
+        name=tenant_crd.metadata.name,
+        body={"spec": patch},
+    )
+    logger.info(
+        "Tenant CR updated for tenant '%s': %s", tenant.name, ", ".join(sorted(patch))
+    )
+
+
+def describe_error(error: Exception) -> str:
+    if isinstance(error, client.rest.ApiException):
+        return f"{error.status} {error.reason}"
+    return str(error)
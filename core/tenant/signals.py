@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.k8sop import outbox
+from core.k8sop.models import ProvisioningJob
+
+from .models import Tenant
+
+# written back from the cluster, saving them has nothing to push
+STATUS_FIELDS = {"resource_status", "status_message", "status_transitioned_at"}
+
+
+@receiver(post_save, sender=Tenant)
+def enqueue_update(sender, instance: Tenant, created, update_fields=None, **kwargs):
+    if created or instance.resource_status == Tenant.ResourceStatus.NOT_CREATED:
+        return
+    if update_fields and set(update_fields) <= STATUS_FIELDS:
+        return
+    # saves within the debounce window share one job, the worker patches
+    # whatever differs from the CR by then
+    with transaction.atomic():
+        outbox.enqueue(
+            [instance],
+            ProvisioningJob.Action.UPDATE,
+            delay=settings.OUTBOX_DEBOUNCE_SECONDS,
+        )
+
+
+@receiver(post_delete, sender=Tenant)
+def enqueue_delete(sender, instance: Tenant, **kwargs):
+    if instance.resource_status == Tenant.ResourceStatus.NOT_CREATED:
+        return
+    with transaction.atomic():
+        outbox.enqueue([Tenant(name=instance.name)], ProvisioningJob.Action.DELETE)
@@ -1,3 +1,202 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.k8sop.models import ProvisioningJob
+from tests.factories import make_tenant
+from .dto import TenantCrd
+from .models import Tenant
+from .pagination import ESTIMATE_THRESHOLD, EstimatedCountPaginator
+from .resources import spec_patch, update_tenant_cr
+
+Action = ProvisioningJob.Action
+
+
+@override_settings(OUTBOX_DEBOUNCE_SECONDS=30)
+class SignalTests(TestCase):
+    def test_tenants_without_resources_are_not_synced(self):
+        tenant = make_tenant("acme")
+        tenant.backend_image = "edu-app:2"
+        tenant.save()
+        tenant.delete()
+        self.assertFalse(ProvisioningJob.objects.exists())
+
+    def test_saves_share_one_debounced_update(self):
+        tenant = make_tenant("acme", resource_status=Tenant.ResourceStatus.READY)
+        before = timezone.now()
+        for image in ("edu-app:2", "edu-app:3", "edu-app:4"):
+            tenant.backend_image = image
+            tenant.save()
+        job = ProvisioningJob.objects.get()
+        self.assertEqual((job.action, job.tenant), (Action.UPDATE, tenant))
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=30))
+
+    def test_status_writes_are_not_synced(self):
+        tenant = make_tenant("acme", resource_status=Tenant.ResourceStatus.READY)
+        tenant.status_message = "Release reconciliation succeeded"
+        tenant.save(update_fields=["resource_status", "status_message"])
+        self.assertFalse(ProvisioningJob.objects.exists())
+
+    def test_delete_replaces_the_pending_update(self):
+        tenant = make_tenant("acme", resource_status=Tenant.ResourceStatus.READY)
+        tenant.save()
+        tenant.delete()
+        job = ProvisioningJob.objects.get()
+        self.assertEqual(
+            (job.action, job.tenant, job.tenant_name), (Action.DELETE, None, "acme")
+        )
+
+
+class SpecPatchTests(TestCase):
+    current = {
+        "backendImage": "edu-app:1",
+        "resources": {"cpu": "100m", "memory": "128Mi"},
+        "scaleToZero": True,
+    }
+
+    def test_unchanged_spec_gives_an_empty_patch(self):
+        desired = dict(self.current)
+        self.assertEqual(spec_patch(desired, self.current), {})
+
+    def test_only_changed_fields_are_patched(self):
+        desired = {**self.current, "backendImage": "edu-app:2"}
+        self.assertEqual(
+            spec_patch(desired, self.current), {"backendImage": "edu-app:2"}
+        )
+
+    def test_nested_objects_are_diffed_field_by_field(self):
+        desired = {**self.current, "resources": {"cpu": "200m", "memory": "128Mi"}}
+        self.assertEqual(
+            spec_patch(desired, self.current), {"resources": {"cpu": "200m"}}
+        )
+
+    def test_nested_fields_removed_from_the_spec_are_nulled(self):
+        desired = {**self.current, "resources": {"cpu": "100m"}}
+        self.assertEqual(
+            spec_patch(desired, self.current), {"resources": {"memory": None}}
+        )
+
+    def test_unset_fields_are_nulled(self):
+        desired = {**self.current, "resources": None}
+        self.assertEqual(spec_patch(desired, self.current), {"resources": None})
+
+    def test_fields_only_on_the_cr_are_kept(self):
+        desired = {"backendImage": "edu-app:1", "resources": self.current["resources"]}
+        self.assertEqual(spec_patch(desired, self.current), {})
+
+
+class UpdateTenantCrTests(TestCase):
+    def setUp(self):
+        self.tenant = make_tenant("acme", backend_image="edu-app:1")
+        patcher = mock.patch("core.tenant.resources.get_client")
+        self.crd = patcher.start().return_value.crd
+        self.addCleanup(patcher.stop)
+        spec = TenantCrd.create_from_model(self.tenant).spec.model_dump()
+        self.crd.get_namespaced_custom_object.return_value = {"spec": spec}
+
+    def test_an_up_to_date_cr_is_not_patched(self):
+        update_tenant_cr(self.tenant)
+        self.crd.patch_namespaced_custom_object.assert_not_called()
+
+    def test_only_the_changed_fields_are_sent(self):
+        self.tenant.backend_image = "edu-app:2"
+        update_tenant_cr(self.tenant)
+        body = self.crd.patch_namespaced_custom_object.call_args.kwargs["body"]
+        self.assertEqual(body, {"spec": {"backendImage": "edu-app:2"}})
+
+
+class ChartVersionValidationTests(TestCase):
+    def assert_invalid(self, tenant: Tenant, message: str):
+        with self.assertRaisesMessage(ValidationError, message):
+            tenant.full_clean()
+
+    def test_unknown_versions_are_refused(self):
+        tenant = make_tenant("acme", chart_version="9.9.9")
+        self.assert_invalid(tenant, "Not a tenant-stack version")
+
+    def test_default_tenants_run_on_any_version(self):
+        for chart_version in ("", "1.0.2", "1.4.1"):
+            make_tenant(f"t{chart_version}", chart_version=chart_version).full_clean()
+
+    def test_shared_databases_need_1_3_0(self):
+        tenant = make_tenant(
+            "acme", db_mode=Tenant.DbMode.SHARED, chart_version="1.2.0"
+        )
+        self.assert_invalid(tenant, "shared_db needs 1.3.0 or later")
+        tenant.chart_version = "1.3.0"
+        tenant.full_clean()
+
+    def test_sizing_profiles_need_1_1_0(self):
+        tenant = make_tenant("acme", max_replicas=3, chart_version="")
+        self.assert_invalid(tenant, "tenant-stack 1.0.2 can't run this tenant")
+        tenant.chart_version = "1.1.0"
+        tenant.full_clean()
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        for name in ("acme", "globex", "initech"):
+            make_tenant(name)
+
+    def paginate(self, queryset, reltuples: int | None):
+        """A paginator whose database reports `reltuples` as the planner estimate."""
+        connection = mock.MagicMock(vendor="postgresql")
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = None if reltuples is None else (reltuples,)
+        patcher = mock.patch(
+            "core.tenant.pagination.connections", {queryset.db: connection}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return EstimatedCountPaginator(queryset, 25), cursor
+
+    def test_large_unfiltered_tables_use_the_planner_estimate(self):
+        paginator, cursor = self.paginate(Tenant.objects.order_by("name"), 250_000)
+        self.assertEqual(paginator.count, 250_000)
+        self.assertEqual(paginator.num_pages, 10_000)
+        self.assertEqual(cursor.execute.call_args.args[1], [Tenant._meta.db_table])
+
+    def test_small_tables_are_counted_exactly(self):
+        paginator, _ = self.paginate(
+            Tenant.objects.order_by("name"), ESTIMATE_THRESHOLD - 1
+        )
+        self.assertEqual(paginator.count, 3)
+
+    def test_unanalyzed_tables_are_counted_exactly(self):
+        for reltuples in (-1, None):
+            paginator, _ = self.paginate(Tenant.objects.order_by("name"), reltuples)
+            self.assertEqual(paginator.count, 3)
+
+    def test_filtered_querysets_are_counted_exactly(self):
+        queryset = Tenant.objects.filter(name__startswith="a").order_by("name")
+        paginator, cursor = self.paginate(queryset, 250_000)
+        self.assertEqual(paginator.count, 1)
+        cursor.execute.assert_not_called()
+
+    def test_other_databases_are_counted_exactly(self):
+        self.assertEqual(
+            EstimatedCountPaginator(Tenant.objects.order_by("name"), 25).count, 3
+        )
+
+
+class TenantChangelistTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_superuser("admin", "admin@example.com", "admin")
+        self.client.force_login(user)
+
+    def test_rows_show_the_latest_job_without_the_json_column(self):
+        tenant = make_tenant("acme", config_map_reference={"name": "acme-config"})
+        ProvisioningJob.objects.create(
+            tenant=tenant, tenant_name="acme", action=Action.CREATE
+        )
+        response = self.client.get(reverse("admin:tenant_tenant_changelist"))
+        self.assertContains(response, "acme")
+        self.assertContains(response, f"{Action.CREATE} ")
+        row = response.context["cl"].result_list[0]
+        self.assertEqual(row.job_action, Action.CREATE)
+        self.assertIn("config_map_reference", row.get_deferred_fields())
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+
+
+def pending_migrations() -> bool:
+    """
+    True while migrations (or database cache tables) are not applied yet.
+    Costs a read of the migration files and one or two queries.
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    executor = MigrationExecutor(connection)
+    if executor.migration_plan(executor.loader.graph.leaf_nodes()):
+        return True
+    cache_tables = {
+        cache["LOCATION"]
+        for cache in settings.CACHES.values()
+        if cache["BACKEND"].endswith("DatabaseCache")
+    }
+    return bool(cache_tables - set(connection.introspection.table_names()))
+
+
+class HealthCheckMiddleware:
+    """
+    Answers the kubelet readiness probe (/readyz) ahead of every other
+    middleware, so the pod ip it uses as Host doesn't have to be in
+    ALLOWED_HOSTS and the answer is never cached. Ready once the database
+    is migrated.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.ready = False
+
+    def __call__(self, request):
+        if request.path == "/readyz":
+            return self.readiness()
+        return self.get_response(request)
+
+    def readiness(self):
+        # applied migrations don't go away, only checked until they are
+        if not self.ready:
+            try:
+                self.ready = not pending_migrations()
+            except DatabaseError as e:
+                return HttpResponse(f"database unavailable: {e}", status=503)
+        if not self.ready:
+            return HttpResponse("migrations pending", status=503)
+        return HttpResponse("ok")
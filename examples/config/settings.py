@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from decouple import config
 from pathlib import Path
+import hashlib
+import json
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -49,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # readiness probe, must stay first
+    "config.health.HealthCheckMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -104,6 +108,43 @@ else:
     raise ValueError("DBENGINE not supported")
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# local memory (per process) by default. `db` keeps it in the tenant database so every
+# pod of the tenant shares it (needs `manage.py createcachetable`, run by the entrypoint),
+# `redis` uses CACHE_LOCATION (needs the `redis` package). any backend path works too.
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "db": "django.core.cache.backends.db.DatabaseCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+}
+CACHE_BACKEND = config("CACHE_BACKEND", default="locmem", cast=str)
+CACHE_LOCATIONS = {"db": "tenant_cache", "redis": "redis://localhost:6379/0"}
+# seconds the home page and its fragments are cached, 0 disables
+CACHE_VIEW_TTL = config("CACHE_VIEW_TTL", default=60, cast=int)
+CACHE_FRAGMENT_TTL = config("CACHE_FRAGMENT_TTL", default=300, cast=int)
+# entries are versioned by the tenant config, a config change makes every
+# entry written before it unreachable, even in a cache shared across restarts
+TENANT_CONFIG_VERSION = int(
+    hashlib.sha256(
+        json.dumps([SCHOOL_NAME, PREMIUM_TENANT, STUDENTS, ALLOWED_HOSTS]).encode()
+    ).hexdigest()[:8],
+    16,
+)
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+        "LOCATION": config(
+            "CACHE_LOCATION", default=CACHE_LOCATIONS.get(CACHE_BACKEND, ""), cast=str
+        ),
+        "KEY_PREFIX": config("CACHE_KEY_PREFIX", default="", cast=str),
+        "VERSION": TENANT_CONFIG_VERSION,
+        "TIMEOUT": CACHE_FRAGMENT_TTL,
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
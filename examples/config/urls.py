@@ -19,8 +19,11 @@ from django.contrib import admin
 from django.urls import path
 from django.shortcuts import render
 from django.conf import settings
+from django.views.decorators.cache import cache_page
 
 
+# the cache key is built from the full url, so every tenant host is cached separately
+@cache_page(settings.CACHE_VIEW_TTL)
 def home(request):
     context = {
         "school_name": settings.SCHOOL_NAME,
@@ -29,6 +32,7 @@ def home(request):
             "students": settings.STUDENTS,
             "allowed_hosts": settings.ALLOWED_HOSTS,
         },
+        "fragment_ttl": settings.CACHE_FRAGMENT_TTL,
     }
     return render(request, "index.html", context)
 
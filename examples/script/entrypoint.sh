@@ -2,6 +2,7 @@
 echo "=======LOAD MODULE========"
 echo $DJANGO_SETTINGS_MODULE
 echo "=========================="
-python manage.py migrate
+# skips when nothing is pending, only one replica migrates at a time
+python script/migrate.py
 touch /var/run/supervisor.sock && chmod 777 /var/run/supervisor.sock
 supervisord -c /app/supervisor.conf -n
\ No newline at end of file
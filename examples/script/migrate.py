@@ -0,0 +1,61 @@
+"""
+Apply pending migrations on container start, once per tenant database.
+
+Exits right away when nothing is pending. On Postgres only the replica holding
+the advisory lock migrates; the others wait for the lock and check again once
+they get it. If the holder dies its lock is released, so the next replica
+takes over the migrations instead of starting on an unmigrated database.
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from config.health import pending_migrations  # noqa: E402
+
+# any constant works, advisory locks are scoped to the current database
+MIGRATION_LOCK_ID = 7_243_100_001
+
+
+def migrate():
+    call_command("migrate", interactive=False, verbosity=1)
+    call_command("createcachetable")
+
+
+def main():
+    started = time.monotonic()
+    if not pending_migrations():
+        print("Migrations up to date")
+        return
+    if connection.vendor != "postgresql":
+        migrate()
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [MIGRATION_LOCK_ID])
+        if not cursor.fetchone()[0]:
+            print("Another replica is migrating, waiting for it")
+            cursor.execute("SELECT pg_advisory_lock(%s)", [MIGRATION_LOCK_ID])
+        try:
+            # the previous lock holder may have applied everything already
+            if pending_migrations():
+                migrate()
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [MIGRATION_LOCK_ID])
+    print(f"Migrations done in {time.monotonic() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
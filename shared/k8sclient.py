@@ -1,24 +1,176 @@
-from kubernetes import client, config
+import asyncio
 import logging
+import socket
+import threading
+
+import urllib3
+from kubernetes import client, config
+from kubernetes_asyncio import client as async_client
+from kubernetes_asyncio import config as async_config
+from urllib3.connection import HTTPConnection
+
+from shared.metrics import instrument_rest_client
+from shared.settings import EnvSettings
+
 logger = logging.getLogger(__name__)
 
+
+class ClientSettings(EnvSettings):
+    """
+    Connection tunables shared by every kubernetes client in the process.
+    Every field can be overridden with a ``K8S_<FIELD_NAME>`` env var.
+    """
+
+    env_prefix = "K8S_"
+
+    # max connections kept open to the api server
+    pool_maxsize: int = 50
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    keep_alive: bool = True
+    # kubeconfig file to load instead of the default location
+    kubeconfig: str | None = None
+
+
 class Client:
     k8s: client.CoreV1Api
     crd: client.CustomObjectsApi
 
-    def __initialize_config(self):
+    def __initialize_config(self) -> client.Configuration:
+        configuration = client.Configuration()
+        # both loaders install a refresh hook, so expiring tokens are
+        # re-read on the long lived configuration instead of reloading it
         try:
-            config.load_incluster_config()
+            config.load_incluster_config(client_configuration=configuration)
             logger.debug("Loaded incluster config")
+            return configuration
+        except config.ConfigException:
+            ...
+        try:
+            config.load_kube_config(
+                config_file=self.settings.kubeconfig,
+                client_configuration=configuration,
+            )
         except Exception:
+            logger.error("Failed to load kube config")
+            raise
+        return configuration
+
+    def __init__(self, settings: ClientSettings | None = None):
+        self.settings = settings or ClientSettings.from_env()
+        configuration = self.__initialize_config()
+        configuration.connection_pool_maxsize = self.settings.pool_maxsize
+        self.api = client.ApiClient(configuration)
+        pool_kw = self.api.rest_client.pool_manager.connection_pool_kw
+        pool_kw["timeout"] = urllib3.Timeout(
+            connect=self.settings.connect_timeout, read=self.settings.read_timeout
+        )
+        if self.settings.keep_alive:
+            pool_kw["socket_options"] = HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            ]
+        instrument_rest_client(self.api.rest_client, "sync")
+        self.k8s = client.CoreV1Api(self.api)
+        self.crd = client.CustomObjectsApi(self.api)
+
+
+class AsyncClient:
+    """
+    asyncio counterpart of `Client` used by the operator handlers.
+    Config is loaded on `connect()` because it has to run inside the event loop.
+    """
+
+    api: async_client.ApiClient | None
+    k8s: async_client.CoreV1Api
+    crd: async_client.CustomObjectsApi
+
+    async def __initialize_config(self) -> async_client.Configuration:
+        configuration = async_client.Configuration()
+        try:
+            async_config.load_incluster_config(client_configuration=configuration)
+            logger.debug("Loaded incluster config")
+            return configuration
+        except async_config.ConfigException:
             ...
         try:
-            config.load_kube_config()
+            loader = await async_config.load_kube_config(
+                config_file=self.settings.kubeconfig,
+                client_configuration=configuration,
+            )
         except Exception:
             logger.error("Failed to load kube config")
             raise
+        # exec / gcp credentials expire and are not refreshed per request
+        self._refresher = asyncio.create_task(
+            async_config.refresh_token(loader, configuration)
+        )
+        return configuration
+
+    def __init__(self, settings: ClientSettings | None = None):
+        self.settings = settings or ClientSettings.from_env()
+        self.api = None
+        self._refresher = None
+
+    async def connect(self):
+        if self.api is not None:
+            return
+        configuration = await self.__initialize_config()
+        configuration.connection_pool_maxsize = self.settings.pool_maxsize
+        self.api = async_client.ApiClient(configuration)
+        self.__apply_default_timeout(self.api.rest_client)
+        instrument_rest_client(self.api.rest_client, "async")
+        self.k8s = async_client.CoreV1Api(self.api)
+        self.crd = async_client.CustomObjectsApi(self.api)
+        self.coordination = async_client.CoordinationV1Api(self.api)
+        self.apps = async_client.AppsV1Api(self.api)
+
+    def __apply_default_timeout(self, rest_client):
+        # aiohttp requests have no timeout unless one is passed per call
+        request = rest_client.request
+        default_timeout = (self.settings.connect_timeout, self.settings.read_timeout)
+
+        async def request_with_timeout(*args, _request_timeout=None, **kwargs):
+            return await request(
+                *args, _request_timeout=_request_timeout or default_timeout, **kwargs
+            )
+
+        rest_client.request = request_with_timeout
+
+    async def close(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+        if self.api is None:
+            return
+        await self.api.close()
+        self.api = None
+
+
+_lock = threading.Lock()
+_client: Client | None = None
+_async_client: AsyncClient | None = None
+
+
+def get_client() -> Client:
+    """
+    Process-wide blocking client, created on first use.
+    Reusing it keeps TLS connections to the api server alive between calls.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = Client()
+    return _client
+
 
-    def __init__(self):
-        self.__initialize_config()
-        self.k8s = client.CoreV1Api()
-        self.crd = client.CustomObjectsApi()
+def get_async_client() -> AsyncClient:
+    """
+    Process-wide asyncio client. `connect()` it from the running event loop.
+    """
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                _async_client = AsyncClient()
+    return _async_client
@@ -0,0 +1,162 @@
+import functools
+import inspect
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from prometheus_client import Counter, Gauge, Histogram
+
+API_REQUESTS = Counter(
+    "k8s_api_requests_total",
+    "Kubernetes api requests",
+    ["client", "verb", "resource", "code"],
+)
+API_LATENCY = Histogram(
+    "k8s_api_request_duration_seconds",
+    "Kubernetes api request latency, up to the response headers for watches",
+    ["client", "verb", "resource"],
+)
+HANDLER_DURATION = Histogram(
+    "tenant_handler_duration_seconds",
+    "Tenant handler / admin action duration",
+    ["component", "event", "outcome"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+HANDLERS_IN_FLIGHT = Gauge(
+    "tenant_handlers_in_flight",
+    "Tenant handlers / admin actions currently running",
+    ["component", "event"],
+)
+QUEUE_DEPTH = Gauge(
+    "tenant_reconcile_queue_depth",
+    "Tenants waiting in the update work queue",
+)
+QUEUE_IN_FLIGHT = Gauge(
+    "tenant_reconcile_queue_in_flight",
+    "Tenants being reconciled by the update work queue",
+)
+SHARD_MEMBERS = Gauge(
+    "tenant_operator_shard_members",
+    "Operator replicas sharing the tenants, as seen by this replica",
+)
+IDLE_TENANTS = Gauge(
+    "tenant_idle_scaled_to_zero",
+    "Tenants this operator replica scaled to zero for inactivity",
+)
+
+VERBS = {"POST": "create", "PUT": "update", "PATCH": "patch", "DELETE": "delete"}
+
+
+def api_labels(method: str, url: str, query_params=None) -> tuple[str, str]:
+    """
+    Map a request to a (verb, resource) pair, e.g. ("list", "helmreleases")
+    or ("patch", "deployments/scale"). Names are dropped to keep cardinality low.
+    """
+    parts = urlsplit(url)
+    query = dict(query_params or ())
+    query.update((key, values[-1]) for key, values in parse_qs(parts.query).items())
+    segments = [segment for segment in parts.path.split("/") if segment]
+    # /api/<version>/... or /apis/<group>/<version>/...
+    rest = segments[2:] if segments[:1] == ["api"] else segments[3:]
+    if len(rest) >= 3 and rest[0] == "namespaces":
+        rest = rest[2:]
+    resource = rest[0] if rest else "unknown"
+    if len(rest) >= 3:
+        resource = f"{resource}/{rest[2]}"
+    if method.upper() != "GET":
+        verb = VERBS.get(method.upper(), method.lower())
+    elif str(query.get("watch", "")).lower() == "true":
+        verb = "watch"
+    else:
+        verb = "get" if len(rest) >= 2 else "list"
+    return verb, resource
+
+
+def status_code(response) -> str:
+    return str(getattr(response, "status", "error"))
+
+
+def instrument_rest_client(rest_client, client: str):
+    """
+    Count and time every request made through a kubernetes(-asyncio) rest client.
+    """
+    request = rest_client.request
+
+    def observe(method, url, query_params, started, code):
+        verb, resource = api_labels(method, url, query_params)
+        API_LATENCY.labels(client, verb, resource).observe(
+            time.perf_counter() - started
+        )
+        API_REQUESTS.labels(client, verb, resource, code).inc()
+
+    if inspect.iscoroutinefunction(request):
+
+        async def instrumented(method, url, query_params=None, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                response = await request(method, url, query_params, *args, **kwargs)
+            except Exception as e:
+                observe(method, url, query_params, started, status_code(e))
+                raise
+            observe(method, url, query_params, started, status_code(response))
+            return response
+
+    else:
+
+        def instrumented(method, url, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                response = request(method, url, *args, **kwargs)
+            except Exception as e:
+                observe(method, url, None, started, status_code(e))
+                raise
+            observe(method, url, None, started, status_code(response))
+            return response
+
+    rest_client.request = instrumented
+
+
+def track(component: str, event: str):
+    """
+    Decorator recording duration, outcome and concurrency of a handler or action.
+    Works on both plain and async functions.
+    """
+
+    def decorator(func):
+        in_flight = HANDLERS_IN_FLIGHT.labels(component, event)
+
+        def observe(started, outcome):
+            HANDLER_DURATION.labels(component, event, outcome).observe(
+                time.perf_counter() - started
+            )
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                with in_flight.track_inprogress():
+                    try:
+                        result = await func(*args, **kwargs)
+                    except BaseException:
+                        observe(started, "error")
+                        raise
+                observe(started, "success")
+                return result
+
+        else:
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                with in_flight.track_inprogress():
+                    try:
+                        result = func(*args, **kwargs)
+                    except BaseException:
+                        observe(started, "error")
+                        raise
+                observe(started, "success")
+                return result
+
+        return wrapper
+
+    return decorator
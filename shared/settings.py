@@ -0,0 +1,21 @@
+import os
+from typing import ClassVar
+
+from pydantic import BaseModel
+
+
+class EnvSettings(BaseModel):
+    """
+    Settings model whose fields can be overridden with ``<env_prefix><FIELD_NAME>`` env vars.
+    """
+
+    env_prefix: ClassVar[str] = ""
+
+    @classmethod
+    def from_env(cls):
+        overrides = {
+            name: os.environ[f"{cls.env_prefix}{name.upper()}"]
+            for name in cls.model_fields
+            if f"{cls.env_prefix}{name.upper()}" in os.environ
+        }
+        return cls.model_validate(overrides)
@@ -0,0 +1,155 @@
+from types import SimpleNamespace
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from prometheus_client import REGISTRY
+
+from shared import metrics
+
+HOST = "https://kubernetes.default.svc"
+
+
+class ApiLabelsTests(TestCase):
+    def test_requests_map_to_a_verb_and_resource(self):
+        cases = [
+            ("GET", "/api/v1/namespaces", None, ("list", "namespaces")),
+            ("GET", "/api/v1/namespaces/acme", None, ("get", "namespaces")),
+            (
+                "GET",
+                "/apis/helm.toolkit.fluxcd.io/v2/namespaces/acme/helmreleases",
+                None,
+                ("list", "helmreleases"),
+            ),
+            (
+                "GET",
+                "/apis/helm.toolkit.fluxcd.io/v2/helmreleases",
+                None,
+                ("list", "helmreleases"),
+            ),
+            (
+                "PATCH",
+                "/apis/helm.toolkit.fluxcd.io/v2/namespaces/acme/helmreleases/acme",
+                None,
+                ("patch", "helmreleases"),
+            ),
+            (
+                "PATCH",
+                "/apis/apps/v1/namespaces/acme/deployments/backend/scale",
+                None,
+                ("patch", "deployments/scale"),
+            ),
+            ("POST", "/api/v1/namespaces", None, ("create", "namespaces")),
+            ("PUT", "/api/v1/namespaces/acme", None, ("update", "namespaces")),
+            ("DELETE", "/api/v1/namespaces/acme", None, ("delete", "namespaces")),
+            ("OPTIONS", "/api/v1/namespaces", None, ("options", "namespaces")),
+            ("GET", "/version", None, ("list", "unknown")),
+        ]
+        for method, path, query_params, expected in cases:
+            with self.subTest(method=method, path=path):
+                self.assertEqual(
+                    metrics.api_labels(method, HOST + path, query_params), expected
+                )
+
+    def test_watches_are_told_apart_from_lists(self):
+        path = f"{HOST}/apis/saas.com/v1/tenants"
+        self.assertEqual(
+            metrics.api_labels("GET", path, [("watch", True)]), ("watch", "tenants")
+        )
+        self.assertEqual(
+            metrics.api_labels("GET", f"{path}?watch=true&resourceVersion=5"),
+            ("watch", "tenants"),
+        )
+        self.assertEqual(
+            metrics.api_labels("GET", path, {"watch": False, "limit": 500}),
+            ("list", "tenants"),
+        )
+
+    def test_object_names_never_become_labels(self):
+        labels = {
+            metrics.api_labels("GET", f"{HOST}/api/v1/namespaces/{name}/secrets/{name}")
+            for name in ("acme", "globex", "initech")
+        }
+        self.assertEqual(labels, {("get", "secrets")})
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def api_error(status: int) -> Exception:
+    error = Exception("api error")
+    error.status = status
+    return error
+
+
+class InstrumentRestClientTests(IsolatedAsyncioTestCase):
+    async def test_async_requests_are_counted_by_status(self):
+        async def request(method, url, query_params=None, **kwargs):
+            if url.endswith("missing"):
+                raise api_error(404)
+            return SimpleNamespace(status=200)
+
+        rest_client = SimpleNamespace(request=request)
+        metrics.instrument_rest_client(rest_client, "test-async")
+        await rest_client.request("GET", f"{HOST}/api/v1/namespaces/acme")
+        with self.assertRaises(Exception):
+            await rest_client.request("GET", f"{HOST}/api/v1/namespaces/missing")
+
+        labels = dict(client="test-async", verb="get", resource="namespaces")
+        self.assertEqual(sample("k8s_api_requests_total", **labels, code="200"), 1)
+        self.assertEqual(sample("k8s_api_requests_total", **labels, code="404"), 1)
+        self.assertEqual(sample("k8s_api_request_duration_seconds_count", **labels), 2)
+
+    def test_sync_requests_are_counted(self):
+        rest_client = SimpleNamespace(
+            request=lambda method, url, *args, **kwargs: SimpleNamespace(status=201)
+        )
+        metrics.instrument_rest_client(rest_client, "test-sync")
+        rest_client.request("POST", f"{HOST}/api/v1/namespaces")
+        self.assertEqual(
+            sample(
+                "k8s_api_requests_total",
+                client="test-sync",
+                verb="create",
+                resource="namespaces",
+                code="201",
+            ),
+            1,
+        )
+
+
+class TrackTests(IsolatedAsyncioTestCase):
+    def test_outcomes_are_recorded_per_call(self):
+        @metrics.track("test", "sync")
+        def handler(fail: bool):
+            if fail:
+                raise ValueError("boom")
+
+        handler(False)
+        with self.assertRaises(ValueError):
+            handler(True)
+        for outcome in ("success", "error"):
+            self.assertEqual(
+                sample(
+                    "tenant_handler_duration_seconds_count",
+                    component="test",
+                    event="sync",
+                    outcome=outcome,
+                ),
+                1,
+            )
+
+    async def test_async_handlers_are_in_flight_while_running(self):
+        labels = dict(component="test", event="async")
+
+        @metrics.track("test", "async")
+        async def handler():
+            return sample("tenant_handlers_in_flight", **labels)
+
+        self.assertEqual(await handler(), 1)
+        self.assertEqual(sample("tenant_handlers_in_flight", **labels), 0)
+        self.assertEqual(
+            sample(
+                "tenant_handler_duration_seconds_count", **labels, outcome="success"
+            ),
+            1,
+        )
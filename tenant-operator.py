@@ -1,29 +1,201 @@
+import asyncio
+import socket
+
 import kopf
-from core.k8sop.ops import release
+from kubernetes_asyncio.client.rest import ApiException
+from prometheus_client import start_http_server
+from core.k8sop.activator import Activator
+from core.k8sop.cache import cache
+from core.k8sop.conf import settings
+from core.k8sop.idle import IdleScaler
+from core.k8sop.ops import release, teardown
+from core.k8sop.ops.constants import TENANT_GROUP, TENANT_PLURAL, TENANT_VERSION
+from core.k8sop.ops.retry import with_retries
+from core.k8sop.queue import RateLimiter, ReconcileQueue
+from core.k8sop.shards import ShardRing
+from shared import metrics
 import logging
 
 logger = logging.getLogger(__name__)
 
+# caps how many tenants are reconciled at once across all handlers
+reconcile_slots = asyncio.Semaphore(settings.max_concurrency)
+# caps how many tenant namespaces are terminating at once
+teardown_slots = asyncio.Semaphore(settings.teardown_concurrency)
+
+
+@metrics.track("operator", "reconcile")
+async def reconcile_update(tenant: release.Tenant):
+    async with reconcile_slots:
+        await release.update_tenant_release(tenant)
+
+
+# update events are coalesced per tenant, only the latest spec is reconciled
+update_queue: ReconcileQueue[release.Tenant] = ReconcileQueue(
+    reconcile_update,
+    workers=settings.max_concurrency,
+    limiter=RateLimiter(settings.reconcile_rate, settings.reconcile_burst),
+    backoff_base=settings.reconcile_backoff_base,
+    backoff_max=settings.reconcile_backoff_max,
+)
+metrics.QUEUE_DEPTH.set_function(lambda: update_queue.depth)
+metrics.QUEUE_IN_FLIGHT.set_function(lambda: update_queue.in_flight)
+
+# set on startup when OPERATOR_SHARD_ENABLED, None runs every tenant here
+ring: ShardRing | None = None
+# who owns a tenant, informational
+OWNER_ANNOTATION = "saas.com/shard-owner"
+
+
+def owns(name, **kwargs) -> bool:
+    return ring is None or ring.owns(name)
+
+
+# scale to zero, set on startup when OPERATOR_IDLE_TIMEOUT > 0
+scaler: IdleScaler | None = None
+activator: Activator | None = None
+
 
-@kopf.on.create("tenants")
-def create_tenant(spec, name, meta, status, **kwargs):
+async def touch(tenant: dict):
+    metadata = tenant["metadata"]
+    annotations = {OWNER_ANNOTATION: ring.identity}
+    async with reconcile_slots:
+        try:
+            await with_retries(
+                lambda: release.client.crd.patch_namespaced_custom_object(
+                    group=TENANT_GROUP,
+                    version=TENANT_VERSION,
+                    namespace=metadata["namespace"],
+                    plural=TENANT_PLURAL,
+                    name=metadata["name"],
+                    body={"metadata": {"annotations": annotations}},
+                    _content_type="application/merge-patch+json",
+                ),
+                attempts=settings.apply_retries,
+                base_delay=settings.retry_base_delay,
+            )
+        except ApiException as e:
+            if e.status != 404:
+                logger.error(f"Failed to adopt tenant {metadata['name']}: {e}")
+
+
+async def adopt_tenants(previous: list[str], members: list[str]):
+    """
+    kopf only calls handlers on events, so tenants that moved to this replica
+    are annotated with their new owner: the change is an event that resumes
+    whatever the old owner left unfinished (create retries, deletions).
+    """
+    tenants = await release.client.crd.list_cluster_custom_object(
+        TENANT_GROUP, TENANT_VERSION, TENANT_PLURAL
+    )
+    gained = [
+        tenant
+        for tenant in tenants["items"]
+        if ring.gained(previous, tenant["metadata"]["name"])
+    ]
+    logger.info(f"Adopting {len(gained)} tenant(s) after a rebalance")
+    await asyncio.gather(*(touch(tenant) for tenant in gained))
+
+
+@kopf.on.startup()
+async def startup(**kwargs):
+    global ring, scaler, activator
+    if settings.metrics_port:
+        start_http_server(settings.metrics_port)
+    await release.client.connect()
+    await cache.start(release.client)
+    update_queue.start()
+    if settings.shard_enabled:
+        # replicas split the tenants themselves instead of kopf's active/standby peering
+        kwargs["settings"].peering.standalone = True
+        identity = settings.shard_identity or socket.gethostname()
+        ring = ShardRing(
+            release.client, identity.lower(), settings.shard_namespace, adopt_tenants
+        )
+        await ring.join()
+        metrics.SHARD_MEMBERS.set_function(lambda: len(ring.members))
+    if settings.idle_timeout > 0:
+        # every replica serves the activator, idle tenants are scaled by their owner
+        scaler = IdleScaler(release.client, owns)
+        activator = Activator(scaler)
+        await scaler.start()
+        await activator.start()
+        metrics.IDLE_TENANTS.set_function(lambda: len(scaler.idle))
+
+
+@kopf.on.cleanup()
+async def cleanup(**kwargs):
+    if activator is not None:
+        await activator.stop()
+        await scaler.stop()
+    if ring is not None:
+        await ring.leave()
+    await update_queue.stop()
+    await cache.stop()
+    await release.client.close()
+
+
+@kopf.on.create("tenants", when=owns)
+@metrics.track("operator", "create")
+async def create_tenant(spec, name, meta, status, patch, **kwargs):
     logger.info(f"Resource {name} was created")
     tenant = release.Tenant.model_validate(spec)
     logger.info(f"Spec: {tenant}")
-    release.create_tenant(tenant)
+    # steps finished by an earlier attempt are not run again
+    completed = (status.get("provisioning") or {}).get("completed", [])
+    try:
+        async with reconcile_slots:
+            completed = await release.create_tenant(tenant, completed)
+    except release.ProvisioningError as e:
+        patch.status["provisioning"] = {
+            "completed": sorted(e.completed),
+            "failed": {step: str(error) for step, error in e.failed.items()},
+        }
+        raise kopf.TemporaryError(
+            f"Provisioning of {name} failed: {e}", delay=settings.provision_retry_delay
+        )
+    patch.status["provisioning"] = {"completed": sorted(completed), "failed": None}
 
 
-@kopf.on.delete("tenants")
-def delete_tenant(spec, name, meta, status, namespace, **kwargs):
+@kopf.on.delete("tenants", when=owns)
+@metrics.track("operator", "delete")
+async def delete_tenant(spec, name, meta, status, namespace, **kwargs):
     logger.info(f"spec {spec} was deleted")
     tenant = release.Tenant.model_validate(spec)
-    release.delete_tenant_ns(tenant)
+    update_queue.forget(name)
+    async with teardown_slots:
+        progress = await teardown.teardown_tenant(tenant)
+    if not progress.ok:
+        raise kopf.TemporaryError(
+            f"Teardown of {name} failed: {progress.error}",
+            delay=settings.teardown_retry_delay,
+        )
     logger.info(f"Resource {name} was deleted in ns {namespace} and tenant {tenant}")
 
 
-@kopf.on.update("tenants")
-def update_tenant(spec, name, meta, status, **kwargs):
+@kopf.on.update("tenants", when=owns)
+@metrics.track("operator", "update")
+async def update_tenant(spec, name, meta, status, **kwargs):
     logger.info(f"Resource {name} was updated")
     tenant = release.Tenant.model_validate(spec)
     logger.info(f"Spec: {tenant}")
-    release.update_tenant_release(tenant)
+    update_queue.submit(name, tenant)
+
+
+@kopf.on.resume("tenants", when=owns)
+async def resume_tenant(spec, name, **kwargs):
+    """
+    Updates are handled once queued, so those still queued or backing off
+    when the operator stopped are lost with the queue. On startup every
+    tenant whose HelmRelease doesn't match its spec is queued again; tenants
+    adopted from another shard get an update event from `adopt_tenants`.
+    """
+    tenant = release.Tenant.model_validate(spec)
+    helmrelease = release.build_helmrelease(tenant)
+    current = await release.current_spec_hash(tenant)
+    # no HelmRelease yet: the create handler resumes the provisioning itself
+    if current is None:
+        return
+    if current != helmrelease["metadata"]["annotations"][release.SPEC_HASH_ANNOTATION]:
+        logger.info(f"Resource {name} has an unapplied update, requeueing")
+        update_queue.submit(name, tenant)
@@ -0,0 +1,353 @@
+"""
+In-process stand-in for the kubernetes api server, good enough for the operator.
+
+Serves the REST paths the operator uses (core and custom resources: get, list,
+create, apply / merge patch, delete and watch with bookmarks) from memory, with
+configurable latency and error injection on every non-watch request.
+"""
+
+import asyncio
+import copy
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+MUTATING = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def merge_patch(target, patch):
+    """RFC 7386 json merge patch."""
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def matches_selectors(obj: dict, field_selector: str, label_selector: str) -> bool:
+    metadata = obj["metadata"]
+    for term in filter(None, field_selector.split(",")):
+        field, _, value = term.partition("=")
+        actual = {
+            "metadata.name": metadata.get("name"),
+            "metadata.namespace": metadata.get("namespace"),
+        }.get(field)
+        if actual != value.lstrip("="):
+            return False
+    labels = metadata.get("labels") or {}
+    for term in filter(None, label_selector.split(",")):
+        if "=" in term:
+            key, _, value = term.partition("=")
+            if labels.get(key.rstrip("!")) != value.lstrip("="):
+                return False
+        elif term not in labels:
+            return False
+    return True
+
+
+class FakeKubeApi:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        termination_delay: float = 0.0,
+        bookmark_interval: float = 1.0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.termination_delay = termination_delay
+        self.bookmark_interval = bookmark_interval
+        # collection ("group/plural") -> "namespace/name" -> object
+        self.objects: dict[str, dict[str, dict]] = {}
+        self.resource_version = 0
+        self.watchers: set[tuple[str, asyncio.Queue]] = set()
+        self.requests: dict[str, int] = {}
+        self.runner: web.AppRunner | None = None
+        self.url = ""
+
+    # -- store --
+
+    def next_version(self) -> str:
+        self.resource_version += 1
+        return str(self.resource_version)
+
+    def notify(self, collection: str, event_type: str, obj: dict):
+        for watched, queue in self.watchers:
+            if watched == collection:
+                queue.put_nowait({"type": event_type, "object": copy.deepcopy(obj)})
+
+    def store(self, collection: str, obj: dict, event_type: str) -> dict:
+        metadata = obj["metadata"]
+        metadata["resourceVersion"] = self.next_version()
+        key = f"{metadata.get('namespace') or ''}/{metadata['name']}"
+        self.objects.setdefault(collection, {})[key] = obj
+        self.notify(collection, event_type, obj)
+        return obj
+
+    def remove(self, collection: str, key: str):
+        obj = self.objects.get(collection, {}).pop(key, None)
+        if obj is not None:
+            obj["metadata"]["resourceVersion"] = self.next_version()
+            self.notify(collection, "DELETED", obj)
+        return obj
+
+    def create(self, collection: str, obj: dict) -> dict:
+        metadata = obj["metadata"]
+        metadata.setdefault("uid", str(uuid.uuid4()))
+        metadata.setdefault(
+            "creationTimestamp",
+            datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        )
+        if collection == "core/namespaces":
+            obj["status"] = {"phase": "Active"}
+        return self.store(collection, obj, "ADDED")
+
+    async def terminate_namespace(self, name: str):
+        await asyncio.sleep(self.termination_delay)
+        for collection, objects in self.objects.items():
+            for key in [key for key in objects if key.startswith(f"{name}/")]:
+                self.remove(collection, key)
+        self.remove("core/namespaces", f"/{name}")
+
+    # -- http --
+
+    @staticmethod
+    def error(status: int, reason: str, message: str = "") -> web.Response:
+        return web.json_response(
+            {
+                "kind": "Status",
+                "apiVersion": "v1",
+                "status": "Failure",
+                "reason": reason,
+                "message": message or reason,
+                "code": status,
+            },
+            status=status,
+        )
+
+    @web.middleware
+    async def inject_faults(self, request: web.Request, handler):
+        watching = request.query.get("watch", "").lower() == "true"
+        self.requests[request.method] = self.requests.get(request.method, 0) + 1
+        if not watching:
+            delay = self.latency + random.uniform(0, self.jitter)
+            if delay:
+                await asyncio.sleep(delay)
+            if request.method in MUTATING and random.random() < self.error_rate:
+                return self.error(self.error_status, "InjectedFault")
+        return await handler(request)
+
+    def route(
+        self, request: web.Request
+    ) -> tuple[str, str | None, str | None, str | None]:
+        info = request.match_info
+        group = info.get("group", "core")
+        plural = info["plural"]
+        namespace = info.get("namespace")
+        name = info.get("name") or info.get("namespace_or_name")
+        return f"{group}/{plural}", namespace, name, info.get("subresource")
+
+    async def handle_collection(self, request: web.Request) -> web.StreamResponse:
+        collection, namespace, _, _ = self.route(request)
+        if request.method == "POST":
+            obj = await request.json()
+            if namespace:
+                obj["metadata"].setdefault("namespace", namespace)
+            key = f"{namespace or ''}/{obj['metadata']['name']}"
+            if key in self.objects.get(collection, {}):
+                return self.error(409, "AlreadyExists", f"{key} already exists")
+            if namespace and f"/{namespace}" not in self.objects.get(
+                "core/namespaces", {}
+            ):
+                return self.error(404, "NotFound", f"namespace {namespace} not found")
+            return web.json_response(self.create(collection, obj), status=201)
+
+        field_selector = request.query.get("fieldSelector", "")
+        label_selector = request.query.get("labelSelector", "")
+        if request.query.get("watch", "").lower() == "true":
+            return await self.watch(
+                request, collection, namespace, field_selector, label_selector
+            )
+
+        items = [
+            obj
+            for key, obj in sorted(self.objects.get(collection, {}).items())
+            if (namespace is None or key.startswith(f"{namespace}/"))
+            and matches_selectors(obj, field_selector, label_selector)
+        ]
+        limit = int(request.query.get("limit") or 0)
+        offset = int(request.query.get("continue") or 0)
+        metadata = {"resourceVersion": str(self.resource_version)}
+        if limit:
+            if offset + limit < len(items):
+                metadata["continue"] = str(offset + limit)
+            items = items[offset : offset + limit]
+        return web.json_response(
+            {"kind": "List", "apiVersion": "v1", "metadata": metadata, "items": items}
+        )
+
+    async def watch(
+        self, request, collection, namespace, field_selector, label_selector
+    ):
+        since = int(request.query.get("resourceVersion") or 0)
+        timeout = float(request.query.get("timeoutSeconds") or 300)
+        bookmarks = request.query.get("allowWatchBookmarks", "").lower() == "true"
+        queue: asyncio.Queue = asyncio.Queue()
+        watcher = (collection, queue)
+        self.watchers.add(watcher)
+        response = web.StreamResponse()
+        await response.prepare(request)
+        # objects changed after the requested version are replayed first
+        for obj in self.objects.get(collection, {}).values():
+            if int(obj["metadata"]["resourceVersion"]) > since:
+                queue.put_nowait({"type": "MODIFIED", "object": copy.deepcopy(obj)})
+        deadline = time.monotonic() + timeout
+        try:
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), min(remaining, self.bookmark_interval)
+                    )
+                except asyncio.TimeoutError:
+                    if bookmarks:
+                        event = {
+                            "type": "BOOKMARK",
+                            "object": {
+                                "metadata": {
+                                    "resourceVersion": str(self.resource_version)
+                                }
+                            },
+                        }
+                    else:
+                        continue
+                else:
+                    obj = event["object"]
+                    if namespace and obj["metadata"].get("namespace") != namespace:
+                        continue
+                    if not matches_selectors(obj, field_selector, label_selector):
+                        continue
+                await response.write(json.dumps(event).encode() + b"\n")
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            self.watchers.discard(watcher)
+        return response
+
+    async def handle_object(self, request: web.Request) -> web.Response:
+        collection, namespace, name, subresource = self.route(request)
+        key = f"{namespace or ''}/{name}"
+        existing = self.objects.get(collection, {}).get(key)
+
+        if request.method == "GET":
+            if existing is None:
+                return self.error(404, "NotFound", f"{collection} {key} not found")
+            return web.json_response(existing)
+
+        if request.method == "DELETE":
+            if existing is None:
+                return self.error(404, "NotFound", f"{collection} {key} not found")
+            if collection == "core/namespaces":
+                if existing["metadata"].get("deletionTimestamp") is None:
+                    existing["metadata"]["deletionTimestamp"] = datetime.now(
+                        timezone.utc
+                    ).strftime("%Y-%m-%dT%H:%M:%SZ")
+                    existing["status"] = {"phase": "Terminating"}
+                    self.store(collection, existing, "MODIFIED")
+                    asyncio.get_running_loop().create_task(
+                        self.terminate_namespace(name)
+                    )
+                return web.json_response(existing, status=202)
+            self.remove(collection, key)
+            return web.json_response({"kind": "Status", "status": "Success"})
+
+        body = await request.json()
+        if request.method == "PUT":
+            if existing is None:
+                return self.error(404, "NotFound", f"{collection} {key} not found")
+            sent_version = body["metadata"].get("resourceVersion")
+            if sent_version and sent_version != existing["metadata"]["resourceVersion"]:
+                return self.error(409, "Conflict", "the object has been modified")
+            body["metadata"] = merge_patch(existing["metadata"], body["metadata"])
+            return web.json_response(self.store(collection, body, "MODIFIED"))
+
+        # PATCH: apply creates missing objects, merge patch requires them
+        content_type = request.headers.get("Content-Type", "")
+        if subresource == "scale":
+            if existing is None:
+                return self.error(404, "NotFound", f"{collection} {key} not found")
+            existing.setdefault("spec", {})["replicas"] = body["spec"]["replicas"]
+            self.store(collection, existing, "MODIFIED")
+            return web.json_response(
+                {"kind": "Scale", "spec": {"replicas": existing["spec"]["replicas"]}}
+            )
+        if existing is None:
+            if "apply-patch" not in content_type:
+                return self.error(404, "NotFound", f"{collection} {key} not found")
+            body.setdefault("metadata", {}).update(name=name, namespace=namespace)
+            return web.json_response(self.create(collection, body), status=201)
+        patched = merge_patch(existing, body)
+        patched["metadata"]["resourceVersion"] = existing["metadata"]["resourceVersion"]
+        if patched == existing:
+            return web.json_response(existing)
+        return web.json_response(self.store(collection, patched, "MODIFIED"))
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.inject_faults])
+        for prefix in ("/api/{version}", "/apis/{group}/{version}"):
+            app.router.add_route(
+                "*", prefix + "/namespaces/{namespace}/{plural}", self.handle_collection
+            )
+            app.router.add_route(
+                "*",
+                prefix + "/namespaces/{namespace}/{plural}/{name}",
+                self.handle_object,
+            )
+            app.router.add_route(
+                "*",
+                prefix + "/namespaces/{namespace}/{plural}/{name}/{subresource}",
+                self.handle_object,
+            )
+            app.router.add_route("*", prefix + "/{plural}", self.handle_collection)
+            app.router.add_route(
+                "*", prefix + "/{plural}/{namespace_or_name}", self.handle_object
+            )
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self.runner = web.AppRunner(self.app(), handle_signals=False)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    def write_kubeconfig(self, path: str):
+        kubeconfig = {
+            "apiVersion": "v1",
+            "kind": "Config",
+            "clusters": [{"name": "fake", "cluster": {"server": self.url}}],
+            "users": [{"name": "fake", "user": {"token": "fake"}}],
+            "contexts": [
+                {"name": "fake", "context": {"cluster": "fake", "user": "fake"}}
+            ],
+            "current-context": "fake",
+        }
+        with open(path, "w") as f:
+            json.dump(kubeconfig, f)
@@ -0,0 +1,253 @@
+"""
+Operator throughput benchmark against an in-process fake kubernetes api.
+
+Drives the real kopf handlers from `tenant-operator.py` (and through them
+`core/k8sop/ops/release.py` and the asyncio client) for N tenants and reports
+create / update / delete throughput and latency percentiles.
+
+    python -m tests.bench.operator_bench --tenants 500 --latency 0.02 --error-rate 0.01
+    python -m tests.bench.operator_bench --tenants 500 --save bench.json
+    python -m tests.bench.operator_bench --tenants 500 --baseline bench.json
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import kopf
+
+from tests.bench.fake_k8s import FakeKubeApi
+
+ROOT = Path(__file__).resolve().parents[2]
+PHASES = ("create", "update", "delete")
+
+
+def load_operator():
+    """Import tenant-operator.py (not a valid module name) as `tenant_operator`."""
+    spec = importlib.util.spec_from_file_location(
+        "tenant_operator", ROOT / "tenant-operator.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def tenant_spec(index: int, image: str = "edu-app:latest") -> dict:
+    name = f"bench-{index:05d}"
+    return {
+        "tenantName": name,
+        "domain": f"{name}.localhost",
+        "dbVolumeSize": "1Gi",
+        "tenantNamespace": name,
+        "backendImage": image,
+        "configMapReference": {
+            "refName": f"{name}-config",
+            "values": {"DJANGO_SETTINGS_MODULE": "config.settings.development"},
+        },
+    }
+
+
+def summarize(latencies: list[float], failed: int, seconds: float) -> dict:
+    ops = len(latencies) + failed
+    summary = {
+        "ops": ops,
+        "failed": failed,
+        "seconds": round(seconds, 3),
+        "throughput": round(ops / seconds, 1) if seconds else 0.0,
+    }
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        summary.update(
+            p50_ms=round(cuts[49] * 1000, 1),
+            p95_ms=round(cuts[94] * 1000, 1),
+            p99_ms=round(cuts[98] * 1000, 1),
+        )
+    return summary
+
+
+async def timed(call) -> float | None:
+    started = time.perf_counter()
+    try:
+        await call
+    except Exception as e:
+        logging.getLogger(__name__).debug("call failed: %r", e)
+        return None
+    return time.perf_counter() - started
+
+
+async def run_handlers(handler, specs: list[dict]) -> dict:
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            timed(
+                handler(
+                    spec=spec,
+                    name=spec["tenantName"],
+                    meta={},
+                    status={},
+                    patch=kopf.Patch(),
+                    namespace="tenant-system",
+                )
+            )
+            for spec in specs
+        )
+    )
+    latencies = [result for result in results if result is not None]
+    return summarize(
+        latencies, len(results) - len(latencies), time.perf_counter() - started
+    )
+
+
+async def run_updates(operator, specs: list[dict], bursts: int, timeout: float) -> dict:
+    """
+    Send `bursts` update events per tenant and wait for the work queue to drain.
+    Latency is measured from the first event of a tenant to its last reconcile.
+    """
+    queue = operator.update_queue
+    submitted: dict[str, float] = {}
+    finished: dict[str, float] = {}
+    reconcile = queue.reconcile
+
+    async def timed_reconcile(tenant):
+        await reconcile(tenant)
+        finished[tenant.tenantName] = time.perf_counter()
+
+    queue.reconcile = timed_reconcile
+    started = time.perf_counter()
+    for burst in range(bursts):
+        for spec in specs:
+            submitted.setdefault(spec["tenantName"], time.perf_counter())
+            updated = {**spec, "backendImage": f"edu-app:bench-{burst}"}
+            await operator.update_tenant(
+                spec=updated, name=spec["tenantName"], meta={}, status={}
+            )
+    deadline = started + timeout
+    while (queue.depth or queue.in_flight) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    seconds = time.perf_counter() - started
+    queue.reconcile = reconcile
+
+    latencies = [finished[name] - submitted[name] for name in finished]
+    return summarize(latencies, len(submitted) - len(finished), seconds)
+
+
+async def bench(args) -> dict:
+    fake = FakeKubeApi(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        termination_delay=args.termination_delay,
+    )
+    await fake.start()
+    kubeconfig = tempfile.NamedTemporaryFile("w", suffix=".kubeconfig", delete=False)
+    fake.write_kubeconfig(kubeconfig.name)
+
+    # settings are read at import time
+    os.environ["K8S_KUBECONFIG"] = kubeconfig.name
+    os.environ["K8S_POOL_MAXSIZE"] = str(args.concurrency)
+    os.environ["OPERATOR_MAX_CONCURRENCY"] = str(args.concurrency)
+    os.environ["OPERATOR_RECONCILE_RATE"] = str(args.rate)
+    os.environ["OPERATOR_RETRY_BASE_DELAY"] = "0.01"
+    os.environ["OPERATOR_RECONCILE_BACKOFF_BASE"] = "0.05"
+    os.environ.setdefault("OPERATOR_METRICS_PORT", "0")
+    operator = load_operator()
+
+    specs = [tenant_spec(index) for index in range(args.tenants)]
+    results = {}
+    await operator.startup()
+    try:
+        results["create"] = await run_handlers(operator.create_tenant, specs)
+        results["update"] = await run_updates(
+            operator, specs, args.bursts, args.timeout
+        )
+        results["delete"] = await run_handlers(operator.delete_tenant, specs)
+    finally:
+        await operator.cleanup()
+        await fake.stop()
+        os.unlink(kubeconfig.name)
+    results["api_requests"] = dict(sorted(fake.requests.items()))
+    return results
+
+
+def report(results: dict, baseline: dict | None):
+    columns = ("ops", "failed", "seconds", "throughput", "p50_ms", "p95_ms", "p99_ms")
+    print(f"{'phase':<8}" + "".join(f"{column:>12}" for column in columns))
+    for phase in PHASES:
+        row = results[phase]
+        print(
+            f"{phase:<8}" + "".join(f"{row.get(column, '-'):>12}" for column in columns)
+        )
+        if baseline and phase in baseline:
+            deltas = []
+            for column in columns[2:]:
+                before, after = baseline[phase].get(column), row.get(column)
+                if before and after is not None:
+                    deltas.append(f"{(after - before) / before * 100:+.1f}%")
+                else:
+                    deltas.append("-")
+            print(
+                f"{'  vs base':<8}"
+                + " " * 24
+                + "".join(f"{delta:>12}" for delta in deltas)
+            )
+    print("api requests:", results["api_requests"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tenants", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument(
+        "--bursts", type=int, default=3, help="update events per tenant"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=0, help="reconciles per second, 0 is unlimited"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.01, help="seconds added to every api call"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.005, help="random extra latency in seconds"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="fraction of writes that fail"
+    )
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument(
+        "--termination-delay",
+        type=float,
+        default=0.0,
+        help="seconds a deleted namespace stays terminating",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=300,
+        help="max seconds to wait for the update queue",
+    )
+    parser.add_argument("--save", help="write the results as json")
+    parser.add_argument("--baseline", help="compare against results saved with --save")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = asyncio.run(bench(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
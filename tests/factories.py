@@ -0,0 +1,29 @@
+from core.k8sop.ops import release
+from core.k8sop.ops.constants import DEFAULT_CHART_VERSION
+from core.tenant.models import Tenant
+
+
+def make_tenant(name: str, **fields) -> Tenant:
+    """A saved tenant, every required field derived from `name`."""
+    return Tenant.objects.create(
+        name=name,
+        subdomain_prefix=name,
+        db_volume_size="1Gi",
+        tenant_namespace=name,
+        **fields,
+    )
+
+
+def make_spec(name: str, **fields) -> release.Tenant:
+    """The spec the operator gets from a tenant's CR."""
+    return release.Tenant.model_validate(
+        {
+            "tenantName": name,
+            "domain": f"{name}.localhost",
+            "dbVolumeSize": "1Gi",
+            "tenantNamespace": name,
+            "backendImage": "edu-app:1",
+            "chartVersion": DEFAULT_CHART_VERSION,
+            **fields,
+        }
+    )